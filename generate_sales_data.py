@@ -1,16 +1,21 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import random
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-# Set random seed for reproducibility
-np.random.seed(42)
-random.seed(42)
+# Default seed for reproducibility
+DEFAULT_SEED = 42
+
+# Rows generated (and written) per chunk; bounds memory regardless of --rows
+DEFAULT_CHUNK_SIZE = 1_000_000
 
 # Generate dates for 2 years (2023-2024)
-start_date = datetime(2023, 1, 1)
-end_date = datetime(2024, 12, 31)
-date_range = pd.date_range(start_date, end_date, freq='D')
+START_DATE = '2023-01-01'
+END_DATE = '2024-12-31'
+date_range = np.arange(np.datetime64(START_DATE), np.datetime64(END_DATE) + 1)
 
 # Product categories and products
 products_data = {
@@ -33,107 +38,259 @@ price_ranges = {
 # Regions
 regions = ['Jakarta', 'Surabaya', 'Bandung', 'Medan', 'Semarang', 'Makassar']
 
-# Customer segments
+# Customer segments (60% Regular, 30% Premium, 10% VIP)
 customer_segments = ['Regular', 'Premium', 'VIP']
+segment_weights = [60, 30, 10]
+
+# Discount choices per segment, drawn uniformly
+segment_discounts = {
+    'Regular': [0, 0, 0],
+    'Premium': [0, 5, 10],
+    'VIP': [10, 15, 20]
+}
+
+# Payment methods
+payment_methods = ['Credit Card', 'Debit Card', 'E-Wallet', 'Bank Transfer', 'Cash']
+payment_weights = [30, 25, 25, 15, 5]
+
+# Holiday seasons and mid-year sale sell 1.5x the usual quantity
+seasonal_months = [11, 12, 6, 7]
+
+FIRST_ORDER_ID = 1000
+FIRST_CUSTOMER_ID = 1001
+
+COLUMNS = ['Order_ID', 'Date', 'Customer_ID', 'Customer_Segment', 'Region', 'Category',
+           'Product', 'Quantity', 'Unit_Price', 'Total_Sales', 'Discount_Percent',
+           'Discount_Amount', 'Final_Price', 'Payment_Method']
+
+# Lookup tables used by the vectorized generator
+categories = list(products_data.keys())
+all_products = [product for category in categories for product in products_data[category]]
+products_per_category = len(products_data[categories[0]])
+price_low = np.array([price_ranges[c][0] for c in categories], dtype=np.float64)
+price_high = np.array([price_ranges[c][1] for c in categories], dtype=np.float64)
+discount_table = np.array([segment_discounts[s] for s in customer_segments], dtype=np.int64)
+date_months = date_range.astype('datetime64[M]').astype(np.int64) % 12 + 1
+date_multiplier = np.where(np.isin(date_months, seasonal_months), 1.5, 1.0)
+
+
+def _root_rng(seed):
+    return np.random.default_rng(np.random.SeedSequence(seed))
+
+
+def _block_rng(seed, block):
+    # Every block gets its own stream derived from the root seed, so a block's
+    # rows depend only on (seed, block) and not on which blocks ran before it.
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+
+
+def plan_dataset(num_rows=None, seed=DEFAULT_SEED):
+    """Draw the dataset size and the number of orders on each day."""
+    rng = _root_rng(seed)
+    # Generate 3000-5000 transactions; always drawn so the day plan for a seed
+    # does not depend on whether the size was given explicitly
+    default_rows = int(rng.integers(3000, 5000, endpoint=True))
+    if num_rows is None:
+        num_rows = default_rows
+    elif num_rows < 1:
+        raise ValueError(f"num_rows must be at least 1, got {num_rows}")
+    day_counts = rng.multinomial(num_rows, np.full(len(date_range), 1.0 / len(date_range)))
+    return num_rows, np.cumsum(day_counts)
+
+
+def _choice(rng, size, weights):
+    cdf = np.cumsum(weights, dtype=np.float64)
+    return np.searchsorted(cdf / cdf[-1], rng.random(size), side='right')
+
+
+def generate_block(block, day_ends, num_rows, seed=DEFAULT_SEED, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generate rows [block * chunk_size, (block + 1) * chunk_size) as a DataFrame.
+
+    Rows come out sorted by date because the per-day order counts are fixed up
+    front by plan_dataset; Order_IDs follow the global row number.
+    """
+    start = block * chunk_size
+    stop = min(start + chunk_size, num_rows)
+    size = stop - start
+    rng = _block_rng(seed, block)
+
+    rows = np.arange(start, stop, dtype=np.int64)
+    day_index = np.searchsorted(day_ends, rows, side='right')
 
-# Generate sales data
-sales_records = []
-order_id = 1000
-
-# Generate 3000-5000 transactions
-num_transactions = random.randint(3000, 5000)
-
-for _ in range(num_transactions):
-    # Random date with higher probability on weekends and certain months
-    date = random.choice(date_range)
-    
-    # Add some seasonality - more sales in certain months
-    month = date.month
-    if month in [11, 12, 6, 7]:  # Holiday seasons and mid-year sale
-        quantity_multiplier = 1.5
-    else:
-        quantity_multiplier = 1.0
-    
     # Select random category and product
-    category = random.choice(list(products_data.keys()))
-    product = random.choice(products_data[category])
-    
+    category = rng.integers(0, len(categories), size)
+    product = category * products_per_category + rng.integers(0, products_per_category, size)
+
     # Generate price with some variation
-    min_price, max_price = price_ranges[category]
-    base_price = random.uniform(min_price, max_price)
-    price = round(base_price, 2)
-    
-    # Generate quantity (with higher probability for lower quantities)
-    quantity = int(np.random.exponential(2) + 1)
-    quantity = min(quantity, 10)  # Cap at 10
-    quantity = int(quantity * quantity_multiplier)
-    quantity = max(1, quantity)
-    
-    # Calculate total
-    total_sales = round(price * quantity, 2)
-    
-    # Random region
-    region = random.choice(regions)
-    
-    # Customer segment (weighted)
-    customer_segment = random.choices(
-        customer_segments, 
-        weights=[60, 30, 10]  # 60% Regular, 30% Premium, 10% VIP
-    )[0]
-    
+    low = price_low[category]
+    price = np.round(low + (price_high[category] - low) * rng.random(size), 2)
+
+    # Generate quantity (with higher probability for lower quantities), capped at 10
+    quantity = np.minimum((rng.exponential(2, size) + 1).astype(np.int64), 10)
+    quantity = np.maximum((quantity * date_multiplier[day_index]).astype(np.int64), 1)
+
+    total_sales = np.round(price * quantity, 2)
+
+    region = rng.integers(0, len(regions), size)
+    segment = _choice(rng, size, segment_weights)
+
     # Apply discount based on segment
-    discount = 0
-    if customer_segment == 'Premium':
-        discount = random.choice([0, 5, 10])
-    elif customer_segment == 'VIP':
-        discount = random.choice([10, 15, 20])
-    
-    discount_amount = round(total_sales * (discount / 100), 2)
-    final_price = round(total_sales - discount_amount, 2)
-    
-    # Payment method
-    payment_method = random.choices(
-        ['Credit Card', 'Debit Card', 'E-Wallet', 'Bank Transfer', 'Cash'],
-        weights=[30, 25, 25, 15, 5]
-    )[0]
-    
+    discount = discount_table[segment, rng.integers(0, discount_table.shape[1], size)]
+    discount_amount = np.round(total_sales * (discount / 100), 2)
+    final_price = np.round(total_sales - discount_amount, 2)
+
+    payment = _choice(rng, size, payment_weights)
+
     # Customer ID (simulate returning customers)
-    customer_id = random.randint(1001, 1001 + num_transactions // 3)
-    
-    sales_records.append({
-        'Order_ID': f'ORD{order_id}',
-        'Date': date.strftime('%Y-%m-%d'),
-        'Customer_ID': f'CUST{customer_id}',
-        'Customer_Segment': customer_segment,
-        'Region': region,
-        'Category': category,
-        'Product': product,
+    customer_id = rng.integers(FIRST_CUSTOMER_ID, FIRST_CUSTOMER_ID + num_rows // 3, size, endpoint=True)
+
+    return pd.DataFrame({
+        'Order_ID': 'ORD' + pd.Series(rows + FIRST_ORDER_ID).astype(str),
+        'Date': np.datetime_as_string(date_range[day_index], unit='D'),
+        'Customer_ID': 'CUST' + pd.Series(customer_id).astype(str),
+        'Customer_Segment': pd.Categorical.from_codes(segment, customer_segments),
+        'Region': pd.Categorical.from_codes(region, regions),
+        'Category': pd.Categorical.from_codes(category, categories),
+        'Product': pd.Categorical.from_codes(product, all_products),
         'Quantity': quantity,
         'Unit_Price': price,
         'Total_Sales': total_sales,
         'Discount_Percent': discount,
         'Discount_Amount': discount_amount,
         'Final_Price': final_price,
-        'Payment_Method': payment_method
-    })
-    
-    order_id += 1
-
-# Create DataFrame
-df = pd.DataFrame(sales_records)
-
-# Sort by date
-df = df.sort_values('Date').reset_index(drop=True)
-
-# Save to CSV
-df.to_csv('/home/claude/sales_data.csv', index=False)
-
-print(f"Dataset generated successfully!")
-print(f"Total transactions: {len(df)}")
-print(f"\nDataset Info:")
-print(df.info())
-print(f"\nFirst few rows:")
-print(df.head())
-print(f"\nBasic Statistics:")
-print(df.describe())
-print(f"\nData saved to: sales_data.csv")
+        'Payment_Method': pd.Categorical.from_codes(payment, payment_methods)
+    }, columns=COLUMNS)
+
+
+def _write_blocks(path, blocks, day_ends, num_rows, seed, chunk_size):
+    first_chunk = None
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        for block in blocks:
+            chunk = generate_block(block, day_ends, num_rows, seed, chunk_size)
+            chunk.to_csv(f, header=(first_chunk is None), index=False)
+            rows += len(chunk)
+            if first_chunk is None:
+                first_chunk = chunk
+    return rows, first_chunk
+
+
+def generate_sales_data(output='sales_data.csv', num_rows=None, seed=DEFAULT_SEED,
+                        chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write a synthetic sales dataset to `output` one chunk at a time.
+
+    Returns the number of rows written and the first chunk, for display.
+    """
+    num_rows, day_ends = plan_dataset(num_rows, seed)
+    num_blocks = -(-num_rows // chunk_size)
+    _, first_chunk = _write_blocks(output, range(num_blocks), day_ends, num_rows, seed, chunk_size)
+    return num_rows, first_chunk
+
+
+def _generate_shard(path, blocks, num_rows, seed, chunk_size):
+    # Runs in a worker process; the day plan is cheap to redraw from the seed
+    _, day_ends = plan_dataset(num_rows, seed)
+    rows, first_chunk = _write_blocks(path, blocks, day_ends, num_rows, seed, chunk_size)
+    return {
+        'file': os.path.basename(path),
+        'rows': rows,
+        'first_order_id': f'ORD{FIRST_ORDER_ID + blocks[0] * chunk_size}',
+        'last_order_id': f'ORD{FIRST_ORDER_ID + blocks[0] * chunk_size + rows - 1}',
+        'start_date': first_chunk['Date'].iloc[0],
+        'end_date': np.datetime_as_string(
+            date_range[np.searchsorted(day_ends, blocks[0] * chunk_size + rows - 1, side='right')], unit='D'),
+        'bytes': os.path.getsize(path)
+    }
+
+
+def generate_sharded_sales_data(output_dir, num_rows=None, seed=DEFAULT_SEED,
+                                chunk_size=DEFAULT_CHUNK_SIZE, num_shards=None, workers=None):
+    """Write the dataset as one CSV partition per shard plus manifest.json.
+
+    Shards are contiguous runs of chunks, so the rows, Order_IDs and seed
+    streams are the same as generate_sales_data with the same arguments; the
+    partitions concatenated in manifest order equal the single-file output
+    regardless of how many workers produced them.
+    """
+    workers = workers or os.cpu_count() or 1
+    num_rows, _ = plan_dataset(num_rows, seed)
+    num_blocks = -(-num_rows // chunk_size)
+    num_shards = max(1, min(num_shards or workers, num_blocks))
+    shard_blocks = [list(blocks) for blocks in np.array_split(np.arange(num_blocks), num_shards)]
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, f'part-{i:05d}.csv') for i in range(num_shards)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_generate_shard, path, [int(b) for b in blocks], num_rows, seed, chunk_size)
+                   for path, blocks in zip(paths, shard_blocks)]
+        shards = [future.result() for future in futures]
+
+    manifest = {
+        'seed': seed,
+        'rows': num_rows,
+        'chunk_size': chunk_size,
+        'columns': COLUMNS,
+        'start_date': START_DATE,
+        'end_date': END_DATE,
+        'shards': shards
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic sales transaction dataset.')
+    parser.add_argument('--rows', type=int, default=None,
+                        help='number of transactions (default: random between 3000 and 5000)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='random seed')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='rows generated and written per chunk')
+    parser.add_argument('--output', default='sales_data.csv', help='output CSV path')
+    parser.add_argument('--output-dir', default=None,
+                        help='write one CSV partition per shard plus manifest.json into this directory')
+    parser.add_argument('--shards', type=int, default=None,
+                        help='number of partitions in --output-dir mode (default: one per worker)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes in --output-dir mode (default: all cores)')
+    args = parser.parse_args()
+    if args.rows is not None and args.rows < 1:
+        parser.error('--rows must be at least 1')
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be at least 1')
+
+    start_time = time.perf_counter()
+    if args.output_dir:
+        manifest = generate_sharded_sales_data(args.output_dir, args.rows, args.seed, args.chunk_size,
+                                               args.shards, args.workers)
+        elapsed = time.perf_counter() - start_time
+        total_bytes = sum(shard['bytes'] for shard in manifest['shards'])
+
+        print(f"Dataset generated successfully!")
+        print(f"Total transactions: {manifest['rows']:,}")
+        print(f"Generation time: {elapsed:.2f}s")
+        print(f"\nPartitions:")
+        for shard in manifest['shards']:
+            print(f"  {shard['file']}: {shard['rows']:,} rows "
+                  f"({shard['first_order_id']} - {shard['last_order_id']}, "
+                  f"{shard['start_date']} to {shard['end_date']})")
+        print(f"\nData saved to: {args.output_dir} ({total_bytes / 1e6:,.1f} MB, manifest.json)")
+        return
+
+    num_rows, df = generate_sales_data(args.output, args.rows, args.seed, args.chunk_size)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Dataset generated successfully!")
+    print(f"Total transactions: {num_rows:,}")
+    print(f"Generation time: {elapsed:.2f}s")
+    print(f"\nFirst few rows:")
+    print(df.head())
+    print(f"\nBasic Statistics (first chunk):")
+    print(df.describe())
+    print(f"\nData saved to: {args.output} ({os.path.getsize(args.output) / 1e6:,.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
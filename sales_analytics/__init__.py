@@ -0,0 +1,22 @@
+"""Sales data analysis library.
+
+The aggregation and reporting functions can be used in-process without side
+effects; matplotlib and seaborn are only imported by sales_analytics.charts.
+The command line entry point is `python -m sales_analytics`.
+"""
+from .aggregation import SalesAggregates, StreamingAggregator, aggregate_sales, aggregate_sales_stream
+from .binary_store import open_binary_store, write_binary_store
+from .benchmark import compare_results, run_benchmark
+from .calendar_dim import CalendarDimension, calendar_for, date_features
+from .cube import SalesCube
+from .customers import CustomerIndex, build_customer_index
+from .exports import analysis_tables, export_all
+from .incremental import refresh_aggregates
+from .ingest import FileCollection
+from .parallel import aggregate_sales_parallel
+from .report import export_tables, format_sketch_summary, format_summary, summary_metrics, summary_tables
+from .server import ReportService, serve
+from .sketches import GroupedHyperLogLog, HeavyHitters, HyperLogLog, QuantileSketch, SalesSketches, sketch_sales
+from .storage import convert_csv_to_dataset, iter_sales_data, load_sales_data
+from .timeseries import DailySeries, daily_series, daily_series_stream
+from .validation import SalesValidator, load_reference
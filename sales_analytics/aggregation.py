@@ -0,0 +1,318 @@
+import pandas as pd
+import numpy as np
+from .calendar_dim import DAY_ORDER, MONTH_NAMES, date_codes
+from .cube import CATEGORICAL_DIMENSIONS, SalesCube
+from .instrument import stage
+
+# Report dimensions. Every report table is a query on the rollup cube in
+# cube.py (revenue in exact cents, units sold and order count); distinct
+# customers, which do not add up across cells, are tracked per customer for
+# the dimensions in DISTINCT_DIMENSIONS.
+DATE_DIMENSIONS = ['Year', 'Quarter', 'Month', 'Day_of_Week', 'Day_Month']
+DIMENSIONS = CATEGORICAL_DIMENSIONS + DATE_DIMENSIONS
+DISTINCT_DIMENSIONS = ['Customer_Segment']
+
+# Cube dimensions each report table groups by, where it is not just the table name
+TABLE_GROUPS = {
+    'Quarter': ['Year', 'Quarter'],
+    'Month': ['Year', 'Month'],
+    'Day_Month': ['Day_of_Week', 'Month']
+}
+
+# Only the columns the report and charts use are read
+ANALYSIS_COLUMNS = ['Order_ID', 'Date', 'Customer_ID', 'Customer_Segment', 'Region', 'Category',
+                    'Product', 'Quantity', 'Total_Sales', 'Discount_Amount', 'Final_Price', 'Payment_Method']
+
+
+def _dimension_codes(df, dim, dates):
+    """Dense integer codes for one dimension plus the labels they index."""
+    if dim in CATEGORICAL_DIMENSIONS:
+        column = df[dim]
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype('category')
+        return column.cat.codes.to_numpy().astype(np.int64), pd.Index(column.cat.categories, name=dim)
+
+    if dim == 'Day_of_Week':
+        return dates['day_of_week'], pd.Index(DAY_ORDER, name=dim)
+    if dim == 'Day_Month':
+        codes = dates['day_of_week'] * 12 + dates['month'] - 1
+        labels = pd.MultiIndex.from_product([DAY_ORDER, range(1, 13)], names=['Day_of_Week', 'Month'])
+        return codes, labels
+
+    if dim == 'Year':
+        keys = dates['year']
+    elif dim == 'Quarter':
+        keys = dates['year'] * 4 + dates['quarter'] - 1
+    else:
+        keys = dates['month_index']
+    first = int(keys.min()) if len(keys) else 0
+    span = np.arange(first, first + (int(keys.max()) - first + 1 if len(keys) else 0))
+    if dim == 'Year':
+        labels = pd.Index(span, name='Year')
+    elif dim == 'Quarter':
+        labels = pd.MultiIndex.from_arrays([span // 4, span % 4 + 1], names=['Year', 'Quarter'])
+    else:
+        labels = pd.MultiIndex.from_arrays([span // 12 + 1970, span % 12 + 1], names=['Year', 'Month'])
+    return keys - first, labels
+
+
+def _sorted_union(left, right):
+    # Both sides are already sorted and unique; a sort plus adjacent-duplicate
+    # drop is several times faster than np.union1d on millions of IDs
+    ids = np.sort(np.concatenate([left, right]), kind='stable')
+    if len(ids) > 1:
+        ids = ids[np.concatenate([[True], ids[1:] != ids[:-1]])]
+    return ids
+
+
+def _scatter_add(target, rows, columns, values):
+    # rows and columns are unique; np.ix_ is much slower than plain row
+    # indexing, so it is only used when the labels are not already aligned
+    if len(columns) == target.shape[1] and (columns == np.arange(len(columns))).all():
+        target[rows] += values
+    else:
+        target[np.ix_(rows, columns)] += values
+
+
+class CustomerState:
+    """Per-customer state: order counts plus, per dimension, how many orders
+    each customer placed under each label (a customers x labels matrix).
+
+    ids are the sorted customer IDs. Two states over disjoint transactions
+    merge exactly by adding, after aligning both sides on the union of their
+    IDs and labels, and a state can be subtracted from one that contains it.
+    """
+
+    def __init__(self, ids, orders, label_orders):
+        self.ids = ids
+        self.orders = orders
+        self.label_orders = label_orders  # dim -> (labels, int32 matrix)
+
+    @classmethod
+    def from_codes(cls, customers, dimension_codes):
+        customer_codes, ids = pd.factorize(customers, sort=True)
+        ids = np.asarray(ids)
+        orders = np.bincount(customer_codes, minlength=len(ids)).astype(np.int64)
+        label_orders = {}
+        for dim, (codes, labels) in dimension_codes.items():
+            matrix = np.bincount(customer_codes * len(labels) + codes, minlength=len(ids) * len(labels))
+            label_orders[dim] = (labels, matrix.reshape(len(ids), len(labels)).astype(np.int32))
+        return cls(ids, orders, label_orders)
+
+    def _combine(self, other, sign):
+        ids = _sorted_union(self.ids, other.ids)
+        left = np.searchsorted(ids, self.ids)
+        right = np.searchsorted(ids, other.ids)
+        orders = np.zeros(len(ids), dtype=np.int64)
+        orders[left] += self.orders
+        orders[right] += sign * other.orders
+        label_orders = {}
+        for dim, (labels, matrix) in self.label_orders.items():
+            if dim not in other.label_orders:
+                continue
+            other_labels, other_matrix = other.label_orders[dim]
+            union = labels.append(other_labels).unique()
+            combined = np.zeros((len(ids), len(union)), dtype=np.int32)
+            _scatter_add(combined, left, union.get_indexer(labels), matrix)
+            _scatter_add(combined, right, union.get_indexer(other_labels), sign * other_matrix)
+            label_orders[dim] = (union, combined)
+        # Customers whose orders were all subtracted away are dropped
+        keep = orders != 0
+        if not keep.all():
+            ids, orders = ids[keep], orders[keep]
+            label_orders = {dim: (labels, matrix[keep]) for dim, (labels, matrix) in label_orders.items()}
+        return CustomerState(ids, orders, label_orders)
+
+    def merge(self, other):
+        return self._combine(other, 1)
+
+    def subtract(self, other):
+        return self._combine(other, -1)
+
+    def distinct_counts(self, dim):
+        """Number of distinct customers per label of dim."""
+        labels, matrix = self.label_orders[dim]
+        return pd.Series(np.count_nonzero(matrix, axis=0), index=labels, dtype=np.int64)
+
+
+class SalesAggregates:
+    """Additive report aggregates over a set of transactions.
+
+    Built in one pass over the frame: a SalesCube of the additive measures
+    plus per-customer state keyed by customer ID. Both are exact integer sums,
+    so aggregates of disjoint sets of transactions can be merged.
+    """
+
+    def __init__(self, cube, customers, start_date, end_date):
+        self.cube = cube
+        self.customers = customers
+        self.start_date = start_date
+        self.end_date = end_date
+
+    @classmethod
+    def from_frame(cls, df, distinct_dimensions=DISTINCT_DIMENSIONS):
+        dates = date_codes(df['Date'])
+        customers = CustomerState.from_codes(df['Customer_ID'].to_numpy(),
+                                             {dim: _dimension_codes(df, dim, dates) for dim in distinct_dimensions})
+        start_date = df['Date'].min() if len(df) else None
+        end_date = df['Date'].max() if len(df) else None
+        return cls(SalesCube.from_frame(df, dates), customers, start_date, end_date)
+
+    def merge(self, other):
+        """Aggregates of the union of two disjoint sets of transactions."""
+        start_dates = [d for d in (self.start_date, other.start_date) if d is not None]
+        end_dates = [d for d in (self.end_date, other.end_date) if d is not None]
+        return SalesAggregates(self.cube.merge(other.cube), self.customers.merge(other.customers),
+                               min(start_dates) if start_dates else None,
+                               max(end_dates) if end_dates else None)
+
+    def subtract(self, other):
+        """Aggregates with the transactions of other (a subset) taken out.
+
+        The date range is left as is; callers that remove whole days at the
+        edges of the range should set start_date/end_date themselves.
+        """
+        return SalesAggregates(self.cube.subtract(other.cube), self.customers.subtract(other.customers),
+                               self.start_date, self.end_date)
+
+    # Totals
+
+    @property
+    def total_revenue(self):
+        return self.cube.totals()['Final_Price']
+
+    @property
+    def total_orders(self):
+        return self.cube.totals()['Orders']
+
+    @property
+    def total_units(self):
+        return self.cube.totals()['Quantity']
+
+    @property
+    def total_customers(self):
+        return len(self.customers.ids)
+
+    @property
+    def customer_orders(self):
+        """Orders per customer, indexed by Customer_ID."""
+        return pd.Series(self.customers.orders, index=pd.Index(self.customers.ids, name='Customer_ID'),
+                         name='Orders')
+
+    @property
+    def repeat_rate(self):
+        """Percentage of customers with more than one order."""
+        return np.count_nonzero(self.customers.orders > 1) / max(self.total_customers, 1) * 100
+
+    # Tables
+
+    def table(self, dim):
+        """Revenue, Units, Orders (and Customers where tracked) per value of dim."""
+        counts = self.cube.query(TABLE_GROUPS.get(dim, [dim]))
+        table = pd.DataFrame({
+            'Revenue': counts['Final_Price'],
+            'Units': counts['Quantity'],
+            'Orders': counts['Orders']
+        }, index=counts.index)
+        if dim in self.customers.label_orders:
+            customers = self.customers.distinct_counts(dim)
+            table['Customers'] = customers.reindex(table.index, fill_value=0).astype(np.int64)
+        return table
+
+    def revenue(self, dim):
+        return self.table(dim)['Revenue']
+
+    def monthly(self):
+        """Revenue per calendar month in date order, with month names."""
+        table = self.table('Month').reset_index()
+        table.insert(2, 'Month_Name', [MONTH_NAMES[m - 1] for m in table['Month']])
+        return table
+
+
+class StreamingAggregator:
+    """Folds chunks of transactions into running aggregates.
+
+    The cube of each chunk is small and merged by label. Per-customer
+    state is a CustomerState over the customers seen so far, sorted by ID:
+    a chunk's new customers are inserted and its counts added at their
+    searchsorted positions, so memory depends on the number of customers,
+    never on the number of rows or the range of the customer codes.
+    """
+
+    def __init__(self, distinct_dimensions=DISTINCT_DIMENSIONS):
+        self.distinct_dimensions = list(distinct_dimensions)
+        self.cube = None
+        self.customers = CustomerState(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                                       {dim: (pd.Index([], name=dim), np.zeros((0, 0), dtype=np.int32))
+                                        for dim in self.distinct_dimensions})
+        self.start_date = None
+        self.end_date = None
+        self.rows = 0
+
+    def add(self, df):
+        if not len(df):
+            return self
+        with stage('aggregate.chunk', rows_in=len(df)):
+            return self._add(df)
+
+    def _add_customers(self, chunk):
+        columns = {dim: self.customers.label_orders[dim][0].get_indexer(labels)
+                   for dim, (labels, _) in chunk.label_orders.items()}
+        if any((found < 0).any() for found in columns.values()):
+            # A new label widens the matrices; rare, so a full merge will do
+            self.customers = self.customers.merge(chunk)
+            return
+        state = self.customers
+        rows = np.searchsorted(state.ids, chunk.ids)
+        known = rows < len(state.ids)
+        known[known] = state.ids[rows[known]] == chunk.ids[known]
+        if not known.all():
+            # Insert the new customers with no orders yet, keeping ids sorted
+            at = rows[~known]
+            state.ids = np.insert(state.ids, at, chunk.ids[~known])
+            state.orders = np.insert(state.orders, at, 0)
+            state.label_orders = {dim: (labels, np.insert(matrix, at, 0, axis=0))
+                                  for dim, (labels, matrix) in state.label_orders.items()}
+            rows = np.searchsorted(state.ids, chunk.ids)
+        state.orders[rows] += chunk.orders
+        for dim, (_, matrix) in chunk.label_orders.items():
+            _scatter_add(state.label_orders[dim][1], rows, columns[dim], matrix)
+
+    def _add(self, df):
+        customers = df['Customer_ID'].to_numpy()
+        if not np.issubdtype(customers.dtype, np.integer):
+            raise TypeError("streaming aggregation needs integer Customer_ID codes; "
+                            "load chunks with the compact schema")
+
+        dates = date_codes(df['Date'])
+        cube = SalesCube.from_frame(df, dates)
+        self.cube = cube if self.cube is None else self.cube.merge(cube)
+        self._add_customers(CustomerState.from_codes(
+            customers, {dim: _dimension_codes(df, dim, dates) for dim in self.distinct_dimensions}))
+
+        start, end = df['Date'].min(), df['Date'].max()
+        self.start_date = start if self.start_date is None else min(self.start_date, start)
+        self.end_date = end if self.end_date is None else max(self.end_date, end)
+        self.rows += len(df)
+        return self
+
+    def result(self):
+        # Without a single row the cube is empty, like aggregate_sales on an empty frame
+        cube = self.cube if self.cube is not None else SalesCube.empty()
+        return SalesAggregates(cube, self.customers, self.start_date, self.end_date)
+
+
+def aggregate_sales(df, distinct_dimensions=DISTINCT_DIMENSIONS):
+    """Compute every report table for df in a single pass."""
+    with stage('aggregate', rows_in=len(df)) as aggregate:
+        agg = SalesAggregates.from_frame(df, distinct_dimensions)
+        aggregate.set(rows_out=len(agg.cube.cells))
+    return agg
+
+
+def aggregate_sales_stream(chunks, distinct_dimensions=DISTINCT_DIMENSIONS):
+    """Compute every report table from an iterable of frames, one chunk at a time."""
+    aggregator = StreamingAggregator(distinct_dimensions)
+    for chunk in chunks:
+        aggregator.add(chunk)
+    return aggregator.result()
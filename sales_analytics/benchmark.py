@@ -0,0 +1,274 @@
+import pandas as pd
+import numpy as np
+import gc
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from .aggregation import ANALYSIS_COLUMNS, aggregate_sales
+from .binary_store import write_binary_store
+from .calendar_dim import date_features
+from .instrument import current_rss, peak_rss, reset_peak_rss
+from .report import SUMMARY_SECTIONS, format_summary
+from .storage import _csv_dtypes, _parse_dates, convert_csv_to_dataset, load_sales_data
+
+# Benchmark harness: generates datasets of increasing size with
+# generate_sales_data.py and times every stage of the pipeline on each one
+# (load, date parsing and derived columns, the one-pass aggregation, every
+# summary section and every figure), recording wall and CPU seconds and the
+# peak resident memory of the stage. Results are written as JSON, and
+# compare_results flags stages that got slower or bigger than a baseline.
+
+DEFAULT_SIZES = ['10K', '100K', '1M']
+DEFAULT_DATA_DIR = '.benchmark_data'
+DEFAULT_OUTPUT = 'benchmark.json'
+
+# A stage regresses when it is this much slower (or bigger) than the baseline
+# and the absolute change is above the noise floor
+DEFAULT_TIME_THRESHOLD = 0.25
+DEFAULT_MEMORY_THRESHOLD = 0.25
+DEFAULT_MIN_SECONDS = 0.05
+DEFAULT_MIN_MEMORY_MB = 16
+
+RESULT_VERSION = 1
+
+_SUFFIXES = {'K': 10**3, 'M': 10**6, 'B': 10**9}
+
+
+def parse_size(size):
+    """'10K' -> 10000, '1.5M' -> 1500000; plain integers pass through."""
+    size = str(size).strip().upper().replace('_', '').replace(',', '')
+    if size[-1:] in _SUFFIXES:
+        return int(float(size[:-1]) * _SUFFIXES[size[-1]])
+    return int(size)
+
+
+def format_size(rows):
+    for suffix, factor in sorted(_SUFFIXES.items(), key=lambda item: -item[1]):
+        if rows >= factor and rows % factor == 0:
+            return f'{rows // factor}{suffix}'
+    return str(rows)
+
+
+def measure(func, *args, **kwargs):
+    """Run func once; returns its result and the wall seconds, CPU seconds,
+    peak RSS during the call and how far that peak rose above the RSS at the
+    start (both in MB; the rise is None where the peak cannot be reset)."""
+    gc.collect()
+    resettable = reset_peak_rss()
+    rss_before = current_rss()
+    cpu_start = time.process_time()
+    start_time = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start_time
+    cpu_seconds = time.process_time() - cpu_start
+    peak = peak_rss()
+    return result, {
+        'seconds': seconds,
+        'cpu_seconds': cpu_seconds,
+        'peak_rss_mb': peak / 2**20,
+        'rss_growth_mb': (peak - rss_before) / 2**20 if resettable and rss_before is not None else None
+    }
+
+
+# Stages
+
+def derive_calendar(dates):
+    """The Year/Month/Month_Name/Day_of_Week/Quarter columns the original
+    scripts derived with the .dt accessor and strftime."""
+    return date_features(dates, ['Year', 'Month', 'Month_Name', 'Day_of_Week', 'Quarter'])
+
+
+def _dataset_path(data_dir, rows, seed):
+    return os.path.join(data_dir, f'sales_{format_size(rows)}_seed{seed}.csv')
+
+
+def ensure_dataset(rows, data_dir=DEFAULT_DATA_DIR, seed=None):
+    """Path of a generated CSV with rows transactions, generating it with
+    generate_sales_data.py the first time. Returns (path, seconds generating
+    or None if it already existed)."""
+    try:
+        from generate_sales_data import DEFAULT_SEED, generate_sales_data
+    except ImportError:
+        raise RuntimeError("the benchmark needs generate_sales_data.py; run it from the project directory")
+    seed = DEFAULT_SEED if seed is None else seed
+    path = _dataset_path(data_dir, rows, seed)
+    if os.path.exists(path):
+        return path, None
+    os.makedirs(data_dir, exist_ok=True)
+    start_time = time.perf_counter()
+    # Write then rename, so an interrupted run never leaves a short file behind
+    generate_sales_data(f'{path}.tmp', rows, seed)
+    os.replace(f'{path}.tmp', path)
+    return path, time.perf_counter() - start_time
+
+
+def _stages(csv_path, work_dir, render, dpi):
+    """(stage name, function) pairs in pipeline order; later stages use the
+    results of earlier ones through the shared state dict."""
+    state = {}
+    dataset_dir = os.path.join(work_dir, 'dataset')
+    store_dir = os.path.join(work_dir, 'store')
+
+    def read_csv():
+        state['raw'] = pd.read_csv(csv_path, usecols=ANALYSIS_COLUMNS,
+                                   dtype={col: dtype for col, dtype in _csv_dtypes().items()
+                                          if col in ANALYSIS_COLUMNS})
+
+    def parse_dates():
+        state['dates'] = _parse_dates(state.pop('raw')['Date'])
+
+    def derive():
+        derive_calendar(state.pop('dates'))
+
+    def load_total():
+        # The whole load_sales_data call: read, dates and compact schema
+        state['df'] = load_sales_data(csv_path, columns=ANALYSIS_COLUMNS)
+
+    def load_columnar():
+        load_sales_data(dataset_dir, columns=ANALYSIS_COLUMNS)
+
+    def load_mapped():
+        load_sales_data(store_dir, columns=ANALYSIS_COLUMNS)
+
+    def aggregate():
+        state['agg'] = aggregate_sales(state.pop('df'))
+
+    stages = [
+        ('load.csv_read', read_csv),
+        ('load.parse_dates', parse_dates),
+        ('load.derive_calendar', derive),
+        ('load.total', load_total),
+        ('convert.parquet', lambda: convert_csv_to_dataset(csv_path, dataset_dir, overwrite=True)),
+        ('load.columnar', load_columnar),
+        ('convert.store', lambda: write_binary_store(csv_path, store_dir, overwrite=True)),
+        ('load.mapped', load_mapped),
+        ('aggregate.one_pass', aggregate)
+    ]
+    stages += [(f'aggregate.{name}', lambda section=section: section(state['agg']))
+               for name, section in SUMMARY_SECTIONS.items()]
+    stages.append(('report.format', lambda: format_summary(state['agg'])))
+
+    if render:
+        from .charts import CHARTS, _setup_style, chart_inputs, render_chart
+
+        def inputs():
+            _setup_style()
+            state['inputs'] = chart_inputs(state['agg'])
+
+        stages.append(('render.inputs', inputs))
+        stages += [(f'render.{name}', lambda name=name, filename=filename:
+                    render_chart(name, state['inputs'][name], os.path.join(work_dir, filename), dpi))
+                   for name, (filename, _) in CHARTS.items()]
+    return stages
+
+
+def benchmark_size(rows, data_dir=DEFAULT_DATA_DIR, seed=None, repeat=1, render=True, dpi=None,
+                   progress=None):
+    """Stage results on a dataset of rows transactions, as a list of dicts.
+
+    With repeat > 1 the whole pipeline runs that many times and each stage
+    keeps its fastest run, memory figures included. progress, if given, is
+    called with each stage's result as the last run completes it.
+    """
+    csv_path, generate_seconds = ensure_dataset(rows, data_dir, seed)
+    if progress and generate_seconds is not None:
+        progress({'rows': rows, 'stage': 'generate', 'seconds': generate_seconds})
+
+    best = {}
+    for run in range(repeat):
+        work_dir = tempfile.mkdtemp(prefix='sales_benchmark_')
+        try:
+            for stage, func in _stages(csv_path, work_dir, render, dpi):
+                _, stats = measure(func)
+                if stage not in best or stats['seconds'] < best[stage]['seconds']:
+                    best[stage] = {'rows': rows, 'stage': stage, **stats}
+                if progress and run == repeat - 1:
+                    progress(best[stage])
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return list(best.values())
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, data_dir=DEFAULT_DATA_DIR, seed=None, repeat=1, render=True,
+                  dpi=None, progress=None):
+    """Benchmark every size (rows or '10K'-style strings), smallest first.
+
+    Returns the JSON-ready result document.
+    """
+    if render and dpi is None:
+        from .charts import DEFAULT_DPI
+        dpi = DEFAULT_DPI
+    results = []
+    for rows in sorted(parse_size(size) for size in sizes):
+        results += benchmark_size(rows, data_dir, seed, repeat, render, dpi, progress)
+    return {
+        'version': RESULT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'settings': {'repeat': repeat, 'render': render, 'dpi': dpi, 'seed': seed},
+        'results': results
+    }
+
+
+def save_results(document, path=DEFAULT_OUTPUT):
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        document = json.load(f)
+    if document.get('version') != RESULT_VERSION:
+        raise ValueError(f"{path} is not a benchmark result file of version {RESULT_VERSION}")
+    return document
+
+
+def results_frame(document):
+    """The results as a frame with one row per (rows, stage)."""
+    return pd.DataFrame(document['results'])
+
+
+def scaling_table(document, value='seconds'):
+    """value per stage (rows) and dataset size (columns), stages in pipeline order."""
+    frame = results_frame(document)
+    stages = list(dict.fromkeys(frame['stage']))
+    table = frame.pivot(index='stage', columns='rows', values=value).reindex(stages)
+    table.columns = [format_size(rows) for rows in table.columns]
+    return table
+
+
+def compare_results(current, baseline, time_threshold=DEFAULT_TIME_THRESHOLD,
+                    memory_threshold=DEFAULT_MEMORY_THRESHOLD, min_seconds=DEFAULT_MIN_SECONDS,
+                    min_memory_mb=DEFAULT_MIN_MEMORY_MB):
+    """Stage-by-stage comparison of two result documents.
+
+    Returns a frame with the baseline and current seconds and peak memory
+    of every (rows, stage) present in both, their ratios and a Status of
+    'regression', 'improved' or 'ok'. Changes smaller than min_seconds or
+    min_memory_mb are never flagged.
+    """
+    keys = ['rows', 'stage']
+    columns = keys + ['seconds', 'peak_rss_mb']
+    merged = results_frame(baseline)[columns].merge(results_frame(current)[columns], on=keys,
+                                                    suffixes=('_baseline', '_current'))
+    time_ratio = merged['seconds_current'] / merged['seconds_baseline']
+    time_change = merged['seconds_current'] - merged['seconds_baseline']
+    memory_ratio = merged['peak_rss_mb_current'] / merged['peak_rss_mb_baseline']
+    memory_change = merged['peak_rss_mb_current'] - merged['peak_rss_mb_baseline']
+
+    slower = (time_ratio > 1 + time_threshold) & (time_change > min_seconds)
+    bigger = (memory_ratio > 1 + memory_threshold) & (memory_change > min_memory_mb)
+    faster = (time_ratio < 1 / (1 + time_threshold)) & (-time_change > min_seconds)
+    merged['time_ratio'] = time_ratio.round(3)
+    merged['memory_ratio'] = memory_ratio.round(3)
+    merged['Status'] = np.select([slower | bigger, faster], ['regression', 'improved'], default='ok')
+    return merged
@@ -0,0 +1,283 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import shutil
+from .instrument import stage
+from .schema import ID_PREFIXES, INTEGER_COLUMNS, MONEY_COLUMNS, MONEY_DTYPE, apply_schema
+from .storage import (DEFAULT_CONVERT_CHUNK_SIZE, DEFAULT_SOURCE, _csv_dtypes, _date_bounds, _directory_bytes,
+                      _parse_dates, _staged_chunks)
+
+# Memory-mapped binary store: every column of the compact schema is written
+# as one raw fixed-width array (Date as datetime64[us], money as float32,
+# counts and ID codes as narrow ints and dimensions as codes into a
+# dictionary, as wide as pandas makes them), described by a small JSON header. Opening the store
+# maps the files instead of reading them and wraps the mappings in a frame
+# without copying, so a reload costs milliseconds whatever the row count,
+# only the pages a computation touches are read, and processes opening the
+# same store share one copy in the page cache.
+
+DEFAULT_STORE_DIR = 'sales_store'
+METADATA_FILE = 'store.json'
+STORE_FORMAT = 'sales-binary-store'
+STORE_VERSION = 1
+
+# Dimension codes while converting; a column with more distinct labels
+# cannot be stored
+CODE_DTYPE = np.dtype('int16')
+# The unit the CSV loader parses dates to
+DATE_DTYPE = np.dtype('datetime64[us]')
+# Candidates for ID codes, narrowest first
+INTEGER_DTYPES = [np.dtype(dtype) for dtype in ('int8', 'int16', 'int32', 'int64')]
+
+
+def is_binary_store(path):
+    return os.path.isfile(os.path.join(path, METADATA_FILE))
+
+
+def read_store_metadata(store_dir=DEFAULT_STORE_DIR):
+    with open(os.path.join(store_dir, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    if metadata.get('format') != STORE_FORMAT or metadata.get('version') != STORE_VERSION:
+        raise ValueError(f"{store_dir} is not a binary store of version {STORE_VERSION}")
+    return metadata
+
+
+def _store_dtype(col, values):
+    # Fixed per column, so every chunk lands in the same layout
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return CODE_DTYPE
+    if col == 'Date':
+        return DATE_DTYPE
+    if col in ID_PREFIXES:
+        return np.dtype('int64')
+    if col in INTEGER_COLUMNS:
+        return np.dtype(INTEGER_COLUMNS[col])
+    if col in MONEY_COLUMNS:
+        return np.dtype(MONEY_DTYPE)
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return np.dtype('int64')
+    if pd.api.types.is_float_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+        return np.dtype(values.dtype)
+    raise TypeError(f"{col}: no fixed-width store type for {values.dtype}")
+
+
+def _dimension_codes(values, labels):
+    # Codes of a chunk's categorical in the store-wide dictionary labels
+    # (label -> code, in first-seen order), adding labels it has not seen
+    categories = values.cat.categories
+    for label in categories:
+        if label not in labels:
+            labels[label] = len(labels)
+    if len(labels) > np.iinfo(CODE_DTYPE).max:
+        raise ValueError(f"{values.name}: too many distinct values for a dimension column")
+    mapping = np.array([labels[label] for label in categories] + [-1], dtype=CODE_DTYPE)
+    # Missing values have code -1, which picks the trailing -1
+    return mapping[values.cat.codes.to_numpy()]
+
+
+def _sort_dictionary(path, labels, block_rows=DEFAULT_CONVERT_CHUNK_SIZE):
+    # Rewrite a code file so its dictionary is sorted, as the loaders return it
+    first_seen = list(labels)
+    categories = sorted(first_seen)
+    if categories != first_seen and os.path.getsize(path):
+        position = {label: code for code, label in enumerate(categories)}
+        mapping = np.array([position[label] for label in first_seen] + [-1], dtype=CODE_DTYPE)
+        codes = np.memmap(path, dtype=CODE_DTYPE, mode='r+')
+        for start in range(0, len(codes), block_rows):
+            codes[start:start + block_rows] = mapping[codes[start:start + block_rows]]
+        codes.flush()
+        del codes
+    return categories
+
+
+def _rewrite_as(path, dtype, narrow, block_rows=DEFAULT_CONVERT_CHUNK_SIZE):
+    # Rewrite a file of dtype values as narrow values
+    if narrow == dtype or not os.path.getsize(path):
+        return dtype
+    values = np.memmap(path, dtype=dtype, mode='r')
+    with open(path + '.tmp', 'wb') as f:
+        for start in range(0, len(values), block_rows):
+            values[start:start + block_rows].astype(narrow).tofile(f)
+    del values
+    os.replace(path + '.tmp', path)
+    return narrow
+
+
+def _narrow_integers(path, dtype, low, high):
+    # Rewrite an int64 file with the narrowest integer type holding low..high,
+    # like the downcast the CSV loader applies to ID codes
+    narrow = next(candidate for candidate in INTEGER_DTYPES
+                  if np.iinfo(candidate).min <= low and high <= np.iinfo(candidate).max)
+    return _rewrite_as(path, dtype, narrow)
+
+
+def _code_dtype(labels):
+    # The dtype pandas gives the codes of a categorical with this many
+    # labels; codes stored in any other dtype are copied by from_codes
+    return pd.Categorical.from_codes(np.zeros(0, dtype=CODE_DTYPE), categories=pd.RangeIndex(labels),
+                                     validate=False).codes.dtype
+
+
+def write_binary_store(csv_path=DEFAULT_SOURCE, store_dir=DEFAULT_STORE_DIR,
+                       chunk_size=DEFAULT_CONVERT_CHUNK_SIZE, overwrite=False):
+    """Convert a transaction CSV into a memory-mapped binary store.
+
+    The CSV is streamed in chunks converted to the compact schema and
+    appended to one file per column, so memory use is bounded by chunk_size.
+    The header is written last: an interrupted conversion never leaves a
+    directory that looks like a complete store. Returns the number of rows.
+    """
+    if os.path.exists(store_dir):
+        if not overwrite:
+            raise FileExistsError(f"{store_dir} already exists; pass overwrite=True to replace it")
+        shutil.rmtree(store_dir)
+    os.makedirs(store_dir)
+
+    files = {}
+    dtypes = {}
+    dictionaries = {}
+    ranges = {}
+    rows = 0
+    sorted_by_date = True
+    last_date = None
+    with stage('store.write', source=csv_path) as write:
+        try:
+            reader = _staged_chunks(pd.read_csv(csv_path, dtype=_csv_dtypes(), chunksize=chunk_size),
+                                    'store.read_csv')
+            for chunk in reader:
+                chunk['Date'] = _parse_dates(chunk['Date'])
+                chunk = apply_schema(chunk)
+
+                # Sorted stores answer date ranges with a binary search
+                dates = chunk['Date'].to_numpy()
+                if sorted_by_date and len(dates):
+                    sorted_by_date = ((last_date is None or dates[0] >= last_date)
+                                      and not (dates[1:] < dates[:-1]).any())
+                    last_date = dates[-1]
+
+                with stage('store.write_columns', rows_in=len(chunk)):
+                    for col in chunk.columns:
+                        if col not in files:
+                            dtypes[col] = _store_dtype(col, chunk[col])
+                            files[col] = open(os.path.join(store_dir, f'{col}.bin'), 'wb')
+                            if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                                dictionaries[col] = {}
+                        if col in dictionaries:
+                            values = _dimension_codes(chunk[col], dictionaries[col])
+                        else:
+                            values = chunk[col].to_numpy().astype(dtypes[col], copy=False)
+                        if col in ID_PREFIXES and len(values):
+                            low, high = ranges.get(col, (values.min(), values.max()))
+                            ranges[col] = (min(low, values.min()), max(high, values.max()))
+                        np.ascontiguousarray(values).tofile(files[col])
+                rows += len(chunk)
+        finally:
+            for f in files.values():
+                f.close()
+
+        columns = []
+        for col, (low, high) in ranges.items():
+            dtypes[col] = _narrow_integers(os.path.join(store_dir, f'{col}.bin'), dtypes[col],
+                                           int(low), int(high))
+        for col, dtype in dtypes.items():
+            column = {'name': col, 'file': f'{col}.bin', 'dtype': dtype.str}
+            if col in dictionaries:
+                path = os.path.join(store_dir, column['file'])
+                column['categories'] = _sort_dictionary(path, dictionaries[col])
+                column['dtype'] = _rewrite_as(path, dtype, _code_dtype(len(column['categories']))).str
+            columns.append(column)
+        metadata = {
+            'format': STORE_FORMAT,
+            'version': STORE_VERSION,
+            'rows': rows,
+            'source': os.path.abspath(csv_path),
+            'sorted_by_date': sorted_by_date,
+            'columns': columns
+        }
+        with open(os.path.join(store_dir, METADATA_FILE + '.tmp'), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(os.path.join(store_dir, METADATA_FILE + '.tmp'), os.path.join(store_dir, METADATA_FILE))
+        write.set(rows_out=rows, bytes_written=_directory_bytes(store_dir))
+    return rows
+
+
+def _map_column(store_dir, column, rows):
+    # mode='c' maps copy-on-write: pages are shared with the page cache until
+    # something writes to them, and writes never reach the file. The mapping
+    # is handed out as a plain ndarray view, so results of operations on it
+    # are ordinary arrays rather than memmaps.
+    dtype = np.dtype(column['dtype'])
+    if not rows:
+        return np.zeros(0, dtype=dtype)
+    mapped = np.memmap(os.path.join(store_dir, column['file']), dtype=dtype, mode='c', shape=(rows,))
+    return mapped.view(np.ndarray)
+
+
+def _date_rows(dates, start, end, sorted_by_date):
+    # Rows in [start, end]: a slice (which keeps every column a view) when the
+    # store is in date order, otherwise the positions of the matching rows
+    start = start.to_datetime64() if start is not None else None
+    end = end.to_datetime64() if end is not None else None
+    if sorted_by_date:
+        first = np.searchsorted(dates, start, side='left') if start is not None else 0
+        last = np.searchsorted(dates, end, side='right') if end is not None else len(dates)
+        return slice(int(first), int(max(first, last)))
+    mask = np.ones(len(dates), dtype=bool)
+    if start is not None:
+        mask &= dates >= start
+    if end is not None:
+        mask &= dates <= end
+    return np.flatnonzero(mask)
+
+
+def open_binary_store(store_dir=DEFAULT_STORE_DIR, columns=None, start=None, end=None):
+    """Map a binary store as a compact-schema frame without reading it.
+
+    Every column is a view of its mapped file (categoricals wrap the mapped
+    codes), so only the files of the requested columns are opened and data
+    is paged in as it is used. start and end (inclusive, e.g. '2024-06')
+    restrict the rows by Date; on a date-ordered store that is a slice and
+    the columns stay views. Writing to the frame copies the pages written,
+    never the store.
+    """
+    start, end = _date_bounds(start, end)
+    return _open_store(store_dir, columns, start, end)
+
+
+def _open_store(store_dir, columns, start, end):
+    # open_binary_store with start and end already turned into Timestamps
+    metadata = read_store_metadata(store_dir)
+    stored = {column['name']: column for column in metadata['columns']}
+    if columns is not None:
+        missing = [col for col in columns if col not in stored]
+        if missing:
+            raise ValueError(f"{store_dir} has no column(s) {missing}")
+    names = [col for col in stored if columns is None or col in columns]
+    rows = metadata['rows']
+
+    selection = None
+    if start is not None or end is not None:
+        selection = _date_rows(_map_column(store_dir, stored['Date'], rows), start, end,
+                               metadata['sorted_by_date'])
+
+    data = {}
+    for col in names:
+        values = _map_column(store_dir, stored[col], rows)
+        if selection is not None:
+            values = values[selection]
+        if 'categories' in stored[col]:
+            values = pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(stored[col]['categories']),
+                                               validate=False)
+        data[col] = values
+    df = pd.DataFrame(data, copy=False)
+
+    # A date range may not use every label; trim those like the other loaders
+    if selection is not None:
+        for col in names:
+            if 'categories' in stored[col]:
+                codes = df[col].array.codes
+                used = np.bincount(codes[codes >= 0], minlength=len(stored[col]['categories']))
+                if not used.all():
+                    df[col] = df[col].cat.remove_unused_categories()
+    return df
@@ -0,0 +1,139 @@
+import pandas as pd
+import numpy as np
+import calendar
+
+# Calendar dimension: one row per day with every date attribute the reports
+# and charts use, computed once for the days the data covers. Transactions get
+# their attributes by integer indexing with their day number (days since
+# 1970-01-01) instead of per-row datetime arithmetic or strftime, and every
+# module shares the same table through calendar_for.
+
+MONTH_NAMES = list(calendar.month_name)[1:]
+MONTH_ABBRS = list(calendar.month_abbr)[1:]
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Attributes kept as int64 code arrays, as returned by codes()
+CODE_COLUMNS = ['year', 'month', 'quarter', 'month_index', 'day', 'day_of_week']
+
+# Columns of CalendarDimension.table
+CALENDAR_COLUMNS = ['Date', 'Year', 'Quarter', 'Month', 'Month_Name', 'Month_Abbr', 'Day', 'Day_of_Week',
+                    'Week', 'Year_Month', 'Year_Quarter', 'Is_Weekend']
+
+
+def day_numbers(dates):
+    """Days since 1970-01-01 of a datetime Series or array, as int64."""
+    values = dates.to_numpy() if hasattr(dates, 'to_numpy') else np.asarray(dates)
+    return values.astype('datetime64[D]').astype(np.int64)
+
+
+class CalendarDimension:
+    """Date attributes for every day from first to last (day numbers, inclusive).
+
+    Row i describes day first + i; keys() turns day numbers into those row
+    positions. codes() returns integer attribute arrays per transaction,
+    features() the readable columns (names as ordered categoricals).
+    """
+
+    def __init__(self, first, last):
+        self.first = int(first)
+        self.last = int(last)
+        days = np.arange(self.first, self.last + 1, dtype=np.int64)
+        dates = days.astype('datetime64[D]')
+        months = dates.astype('datetime64[M]')
+        month_index = months.astype(np.int64)
+        self._codes = {
+            'year': month_index // 12 + 1970,
+            'month': month_index % 12 + 1,
+            'quarter': month_index % 12 // 3 + 1,
+            'month_index': month_index,        # months since 1970-01
+            'day': (dates - months.astype('datetime64[D]')).astype(np.int64) + 1,
+            'day_of_week': (days + 3) % 7      # 1970-01-01 was a Thursday; Monday is 0
+        }
+        self._dates = dates
+        self._table = None
+
+    def __len__(self):
+        return self.last - self.first + 1
+
+    def covers(self, first, last):
+        return self.first <= first and last <= self.last
+
+    @property
+    def table(self):
+        """The dimension as a frame indexed by day number."""
+        if self._table is None:
+            codes = self._codes
+            year_month = [f'{year}-{month:02d}' for year, month in zip(codes['year'], codes['month'])]
+            year_quarter = [f'Q{quarter} {year}' for year, quarter in zip(codes['year'], codes['quarter'])]
+            self._table = pd.DataFrame({
+                'Date': self._dates.astype('datetime64[ns]'),
+                'Year': codes['year'].astype(np.int16),
+                'Quarter': codes['quarter'].astype(np.int8),
+                'Month': codes['month'].astype(np.int8),
+                'Month_Name': pd.Categorical.from_codes(codes['month'] - 1, MONTH_NAMES, ordered=True),
+                'Month_Abbr': pd.Categorical.from_codes(codes['month'] - 1, MONTH_ABBRS, ordered=True),
+                'Day': codes['day'].astype(np.int8),
+                'Day_of_Week': pd.Categorical.from_codes(codes['day_of_week'], DAY_ORDER, ordered=True),
+                'Week': pd.Index(self._dates).isocalendar()['week'].to_numpy().astype(np.int8),
+                'Year_Month': pd.Categorical(year_month, ordered=True),
+                'Year_Quarter': pd.Categorical(year_quarter, categories=list(dict.fromkeys(year_quarter)),
+                                               ordered=True),
+                'Is_Weekend': codes['day_of_week'] >= 5
+            }, index=pd.RangeIndex(self.first, self.last + 1, name='Day_Number'))
+        return self._table
+
+    def keys(self, days):
+        """Row positions of day numbers; every day must be covered."""
+        keys = np.asarray(days, dtype=np.int64) - self.first
+        if len(keys) and (keys.min() < 0 or keys.max() >= len(self)):
+            raise KeyError("dates outside the calendar range")
+        # int32 positions index the small attribute arrays faster
+        return keys.astype(np.int32)
+
+    def codes(self, days, columns=CODE_COLUMNS):
+        """Integer date attributes (see CODE_COLUMNS) per day number, as int64 arrays."""
+        keys = self.keys(days)
+        return {name: self._codes[name][keys] for name in columns}
+
+    def features(self, dates, columns=None):
+        """Calendar columns for every value of a datetime Series, aligned to its index."""
+        table = self.table if columns is None else self.table[list(columns)]
+        features = table.take(self.keys(day_numbers(dates)))
+        features.index = dates.index if isinstance(dates, pd.Series) else pd.RangeIndex(len(features))
+        return features
+
+
+# The calendar shared by every caller; grown (to whole years) when data falls
+# outside it, so chunks of one dataset reuse a single table
+_shared = None
+
+
+def calendar_for(days):
+    """The shared CalendarDimension, covering at least the given day numbers."""
+    global _shared
+    if not len(days):
+        return _shared if _shared is not None else CalendarDimension(0, -1)
+    first, last = int(np.min(days)), int(np.max(days))
+    if _shared is None or not _shared.covers(first, last):
+        if _shared is not None:
+            first, last = min(first, _shared.first), max(last, _shared.last)
+        # Whole calendar years, so neighbouring chunks land inside the same table
+        start_year = np.datetime64(first, 'D').astype('datetime64[Y]')
+        end_year = np.datetime64(last, 'D').astype('datetime64[Y]') + 1
+        _shared = CalendarDimension(start_year.astype('datetime64[D]').astype(np.int64),
+                                    end_year.astype('datetime64[D]').astype(np.int64) - 1)
+    return _shared
+
+
+def date_codes(dates):
+    """Integer calendar attributes of every value of a datetime Series: year,
+    month (1-12), quarter, month_index (months since 1970-01), day of month
+    and day_of_week (0 = Monday), looked up in the shared calendar."""
+    days = day_numbers(dates)
+    return calendar_for(days).codes(days)
+
+
+def date_features(dates, columns=None):
+    """Readable calendar columns (Year, Month_Name, Day_of_Week, ...) for a
+    datetime Series, joined from the shared calendar on the day number."""
+    return calendar_for(day_numbers(dates)).features(dates, columns)
@@ -0,0 +1,121 @@
+import math
+import numpy as np
+
+# How much detail a chart is drawn with: the output formats, the preview and
+# print profiles (resolution, how long series are downsampled, how many value
+# and tick labels are drawn) and the downsampling itself. Nothing here needs
+# matplotlib, so the CLI and the server can offer the choices without
+# importing it.
+
+# savefig formats a chart can be written as
+CHART_FORMATS = ('png', 'svg', 'webp')
+DEFAULT_FORMAT = 'png'
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml', 'webp': 'image/webp'}
+
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+
+class RenderProfile:
+    """Resolution and detail limits of one kind of output.
+
+    Series longer than the pixel width of their axes are downsampled with
+    the given method (minmax keeps every spike, lttb keeps the shape with
+    half the points), and at most max_labels value labels or tick labels
+    are drawn per axis.
+    """
+
+    def __init__(self, dpi, downsample, max_labels):
+        self.dpi = dpi
+        self.downsample = downsample
+        self.max_labels = max_labels
+
+    def with_dpi(self, dpi):
+        return RenderProfile(dpi, self.downsample, self.max_labels) if dpi else self
+
+    def __repr__(self):
+        # Part of the render cache key
+        return f'RenderProfile({self.dpi!r}, {self.downsample!r}, {self.max_labels!r})'
+
+
+RENDER_PROFILES = {
+    # Files for reports and print: full resolution, min/max so no peak is lost
+    'print': RenderProfile(300, 'minmax', 24),
+    # Screens and dashboards: renders in milliseconds
+    'preview': RenderProfile(100, 'lttb', 12)
+}
+DEFAULT_PROFILE = 'print'
+
+
+def minmax_indices(values, max_points):
+    """Positions of the points kept when values is cut into max_points // 2
+    equal buckets and only the minimum and maximum of each are kept, plus
+    the first and last point, in order."""
+    n = len(values)
+    buckets = max_points // 2
+    if not n or n <= max(max_points, 2) or buckets < 1:
+        return np.arange(n)
+    size = math.ceil(n / buckets)
+    buckets = math.ceil(n / size)
+    # Pad the last bucket with NaN so all of them fit in one 2D array
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    kept = np.concatenate([[0, n - 1], offsets + np.nanargmin(padded, axis=1),
+                           offsets + np.nanargmax(padded, axis=1)])
+    return np.unique(kept)
+
+
+def lttb_indices(values, max_points):
+    """Positions of the max_points points Largest-Triangle-Three-Buckets
+    keeps: the first and last point and, from each of max_points - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    point kept before it and the mean of the next bucket."""
+    n = len(values)
+    if not n or n <= max_points or max_points < 3:
+        return np.arange(n)
+    y = np.asarray(values, dtype=np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    # Mean position and value of every bucket, the last point as a final bucket
+    sums = np.concatenate([[0.0], np.cumsum(y)])
+    lows = np.append(edges[:-1], n - 1)
+    highs = np.append(edges[1:], n)
+    mean_x = (lows + highs - 1) / 2
+    mean_y = (sums[highs] - sums[lows]) / (highs - lows)
+
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        low, high = lows[bucket], highs[bucket]
+        x = np.arange(low, high)
+        next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        # Twice the triangle areas; the factor does not change the argmax
+        areas = np.abs((previous - next_x) * (y[low:high] - y[previous])
+                       - (previous - x) * (next_y - y[previous]))
+        previous = low + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample_indices(values, max_points, method='minmax'):
+    """Positions of the points of values to draw when at most about
+    max_points fit; every position when values is short enough."""
+    if method == 'lttb':
+        return lttb_indices(values, max_points)
+    if method == 'minmax':
+        return minmax_indices(values, max_points)
+    raise ValueError(f"unknown downsampling method {method!r}; use one of {DOWNSAMPLE_METHODS}")
+
+
+def label_step(count, max_labels, minimum=1):
+    """Every how many positions to label so at most max_labels of count are."""
+    return max(minimum, math.ceil(count / max(max_labels, 1)))
+
+
+def largest_positions(values, max_labels):
+    """Positions of the max_labels largest values, all of them if no more."""
+    values = np.asarray(values)
+    if len(values) <= max_labels:
+        return np.arange(len(values))
+    return np.sort(np.argsort(values, kind='stable')[len(values) - max_labels:])
@@ -0,0 +1,466 @@
+import hashlib
+import inspect
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+from matplotlib.gridspec import GridSpec
+from .calendar_dim import DAY_ORDER
+from .chart_detail import (DEFAULT_FORMAT, DEFAULT_PROFILE, RENDER_PROFILES, downsample_indices, label_step,
+                           largest_positions)
+from .instrument import record, stage
+from .report import chart_inputs
+
+# Chart rendering: each figure is a standalone task that takes only the small
+# tables it draws (pulled out of the aggregates by report.chart_inputs), so
+# the four figures can be rasterized concurrently in a process pool on the
+# Agg backend.
+# This is the only module that imports matplotlib and seaborn; import it only
+# when charts are actually needed. How much detail a figure gets (dpi,
+# downsampling of long series, label counts) comes from a RenderProfile in
+# chart_detail.py.
+
+DEFAULT_DPI = RENDER_PROFILES[DEFAULT_PROFILE].dpi
+
+# Matplotlib style sheet and seaborn palette every figure is drawn with
+CHART_STYLE = ('seaborn-v0_8-whitegrid', 'Set2')
+
+# Trend markers are drawn while points are at least this many marker widths apart
+MARKER_SPACING = 3
+
+
+def _setup_style():
+    plt.style.use(CHART_STYLE[0])
+    sns.set_palette(CHART_STYLE[1])
+
+
+def _axes_pixels(ax, dpi):
+    # Width of ax in pixels of the saved figure
+    return ax.get_position().width * ax.figure.get_figwidth() * dpi
+
+
+def _trend_points(ax, values, detail):
+    # Positions of values to draw: all of them, or as many as ax has pixels
+    pixels = _axes_pixels(ax, detail.dpi)
+    # minmax keeps two points per bucket
+    points = int(pixels) * (2 if detail.downsample == 'minmax' else 1)
+    return downsample_indices(values, points, detail.downsample)
+
+
+def _trend_ticks(ax, labels, detail, minimum=1, fmt=str):
+    # Tick labels at every how-many-th position keeps at most detail.max_labels;
+    # only those labels are formatted
+    tick_positions = range(0, len(labels), label_step(len(labels), detail.max_labels, minimum))
+    ax.set_xticks(tick_positions)
+    ax.set_xticklabels([fmt(labels[i]) for i in tick_positions], rotation=45)
+
+
+def _no_data(ax):
+    # Stands in for a panel whose date range has nothing to draw
+    ax.text(0.5, 0.5, 'No data in range', ha='center', va='center', transform=ax.transAxes,
+            fontsize=12, color='gray')
+
+
+def _annotate_peak(ax, values, unit):
+    # At a fixed distance in points, whatever the scale of the data; an
+    # empty range has no peak
+    if not len(values):
+        return
+    peak = int(np.argmax(values))
+    ax.annotate(f'Peak: {unit}{values[peak]:,.0f}',
+                xy=(peak, values[peak]),
+                xytext=(70, 10), textcoords='offset points',
+                arrowprops=dict(arrowstyle='->', color='red', lw=2),
+                fontsize=10, fontweight='bold', color='red')
+
+
+def _plot_trend(ax, values, labels, detail, color, markersize=6, unit='Rp ', fmt=str):
+    """Line and area chart of values against their positions, labelled
+    with labels.
+
+    A series with more points than ax has pixels is drawn downsampled to
+    them, markers are only drawn while they do not overlap, the peak is
+    annotated and at most detail.max_labels positions (every third at
+    least) get a tick label.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    kept = _trend_points(ax, values, detail)
+    spread = (len(kept) == len(values)
+              and len(values) * MARKER_SPACING * markersize / 72 * detail.dpi <= _axes_pixels(ax, detail.dpi))
+    ax.plot(kept, values[kept], marker='o' if spread else None, linewidth=2, markersize=markersize, color=color)
+    ax.fill_between(kept, values[kept], alpha=0.3, color=color)
+    _annotate_peak(ax, values, unit)
+    _trend_ticks(ax, labels, detail, minimum=3, fmt=fmt)
+
+
+# ============================================================================
+# VISUALIZATION 1: Dashboard Overview (4 subplots)
+# ============================================================================
+def render_dashboard_overview(monthly_sales, top_products, category_sales, detail=RENDER_PROFILES[DEFAULT_PROFILE]):
+    fig = plt.figure(figsize=(16, 10))
+    gs = GridSpec(2, 2, figure=fig, hspace=0.3, wspace=0.3)
+
+    # 1.1 Monthly Revenue Trend, with the peak annotated
+    ax1 = fig.add_subplot(gs[0, :])
+    _plot_trend(ax1, monthly_sales['Final_Price'], monthly_sales['Year_Month'].tolist(), detail, '#2E86AB')
+    ax1.set_xlabel('Month', fontsize=12, fontweight='bold')
+    ax1.set_ylabel('Revenue (Rp)', fontsize=12, fontweight='bold')
+    ax1.set_title('Monthly Revenue Trend (2023-2024)', fontsize=14, fontweight='bold', pad=20)
+    ax1.grid(True, alpha=0.3)
+
+    # 1.2 Top 10 Products
+    ax2 = fig.add_subplot(gs[1, 0])
+    colors = plt.cm.Spectral(np.linspace(0, 1, len(top_products)))
+    if len(top_products):
+        top_products.plot(kind='barh', ax=ax2, color=colors)
+    else:
+        _no_data(ax2)
+    ax2.set_xlabel('Revenue (Rp)', fontsize=11, fontweight='bold')
+    ax2.set_ylabel('Product', fontsize=11, fontweight='bold')
+    ax2.set_title('Top 10 Products by Revenue', fontsize=12, fontweight='bold', pad=15)
+    ax2.grid(axis='x', alpha=0.3)
+
+    # Add value labels, to the largest bars only if there are many
+    for i in largest_positions(top_products.values, detail.max_labels):
+        v = top_products.values[i]
+        ax2.text(v, i, f' Rp {v/1000:.0f}K', va='center', fontsize=9)
+
+    # 1.3 Category Distribution
+    ax3 = fig.add_subplot(gs[1, 1])
+    colors_pie = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8']
+    texts = autotexts = []
+    if category_sales.sum() > 0:
+        wedges, texts, autotexts = ax3.pie(category_sales.values,
+                                           labels=category_sales.index,
+                                           autopct='%1.1f%%',
+                                           startangle=90,
+                                           colors=colors_pie,
+                                           explode=[0.05 if i == 0 else 0 for i in range(len(category_sales))])
+    else:
+        _no_data(ax3)
+    ax3.set_title('Revenue by Category', fontsize=12, fontweight='bold', pad=15)
+
+    # Improve text readability
+    for text in texts:
+        text.set_fontsize(10)
+        text.set_fontweight('bold')
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontsize(9)
+        autotext.set_fontweight('bold')
+
+    fig.suptitle('Sales Performance Dashboard', fontsize=18, fontweight='bold', y=0.98)
+    return fig
+
+
+# ============================================================================
+# VISUALIZATION 2: Customer Analysis
+# ============================================================================
+def render_customer_analysis(regional_sales, day_sales, segment_data, payment_counts,
+                             detail=RENDER_PROFILES[DEFAULT_PROFILE]):
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig.suptitle('Customer Behavior Analysis', fontsize=18, fontweight='bold', y=0.995)
+
+    # 2.1 Sales by Region
+    colors_region = plt.cm.viridis(np.linspace(0, 0.8, len(regional_sales)))
+    axes[0, 0].bar(range(len(regional_sales)), regional_sales.values, color=colors_region)
+    axes[0, 0].set_xticks(range(len(regional_sales)))
+    axes[0, 0].set_xticklabels(regional_sales.index, rotation=45, ha='right')
+    axes[0, 0].set_ylabel('Revenue (Rp)', fontsize=11, fontweight='bold')
+    axes[0, 0].set_title('Revenue by Region', fontsize=12, fontweight='bold', pad=15)
+    axes[0, 0].grid(axis='y', alpha=0.3)
+
+    # Add value labels, to the largest bars only if there are many
+    for i in largest_positions(regional_sales.values, detail.max_labels):
+        v = regional_sales.values[i]
+        axes[0, 0].text(i, v, f'Rp {v/1000:.0f}K', ha='center', va='bottom', fontsize=9)
+
+    # 2.2 Sales by Day of Week
+    colors_day = ['#FF6B6B' if day in ['Saturday', 'Sunday'] else '#4ECDC4' for day in DAY_ORDER]
+    axes[0, 1].bar(range(len(day_sales)), day_sales.values, color=colors_day, alpha=0.8)
+    axes[0, 1].set_xticks(range(len(day_sales)))
+    axes[0, 1].set_xticklabels(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
+    axes[0, 1].set_ylabel('Revenue (Rp)', fontsize=11, fontweight='bold')
+    axes[0, 1].set_title('Revenue by Day of Week', fontsize=12, fontweight='bold', pad=15)
+    axes[0, 1].grid(axis='y', alpha=0.3)
+
+    # 2.3 Customer Segment Performance
+    x = np.arange(len(segment_data))
+    width = 0.35
+
+    axes[1, 0].bar(x - width/2, segment_data['Revenue'], width, label='Revenue', color='#45B7D1')
+    ax2_twin = axes[1, 0].twinx()
+    ax2_twin.bar(x + width/2, segment_data['Orders'], width, label='Orders', color='#FFA07A')
+
+    axes[1, 0].set_xlabel('Customer Segment', fontsize=11, fontweight='bold')
+    axes[1, 0].set_ylabel('Revenue (Rp)', fontsize=11, fontweight='bold', color='#45B7D1')
+    ax2_twin.set_ylabel('Number of Orders', fontsize=11, fontweight='bold', color='#FFA07A')
+    axes[1, 0].set_title('Customer Segment Analysis', fontsize=12, fontweight='bold', pad=15)
+    axes[1, 0].set_xticks(x)
+    axes[1, 0].set_xticklabels(segment_data['Segment'])
+    axes[1, 0].tick_params(axis='y', labelcolor='#45B7D1')
+    ax2_twin.tick_params(axis='y', labelcolor='#FFA07A')
+    axes[1, 0].grid(axis='y', alpha=0.3)
+
+    # Combined legend
+    lines1, labels1 = axes[1, 0].get_legend_handles_labels()
+    lines2, labels2 = ax2_twin.get_legend_handles_labels()
+    axes[1, 0].legend(lines1 + lines2, labels1 + labels2, loc='upper left')
+
+    # 2.4 Payment Method Distribution
+    colors_payment = plt.cm.Set3(np.linspace(0, 1, len(payment_counts)))
+    if payment_counts.sum() > 0:
+        axes[1, 1].pie(payment_counts.values,
+                       labels=payment_counts.index,
+                       autopct='%1.1f%%',
+                       startangle=90,
+                       colors=colors_payment)
+    else:
+        _no_data(axes[1, 1])
+    axes[1, 1].set_title('Payment Method Distribution', fontsize=12, fontweight='bold', pad=15)
+
+    fig.tight_layout()
+    return fig
+
+
+# ============================================================================
+# VISUALIZATION 3: Heatmap - Sales Pattern
+# ============================================================================
+def render_sales_heatmap(pivot_data, detail=RENDER_PROFILES[DEFAULT_PROFILE]):
+    fig, ax = plt.subplots(figsize=(14, 8))
+
+    # Cell borders are only drawn while cells are wider than them
+    cell_pixels = 14 * detail.dpi / max(len(pivot_data.columns), 1)
+    if pivot_data.notna().any().any():
+        sns.heatmap(pivot_data, annot=False, fmt='.0f', cmap='YlOrRd',
+                    cbar_kws={'label': 'Revenue (Rp)'}, ax=ax, linewidths=0.5 if cell_pixels > 4 else 0,
+                    xticklabels=label_step(len(pivot_data.columns), detail.max_labels),
+                    yticklabels=label_step(len(pivot_data.index), detail.max_labels))
+    else:
+        _no_data(ax)
+    ax.set_title('Sales Heatmap: Day of Week vs Month', fontsize=14, fontweight='bold', pad=20)
+    ax.set_xlabel('Month', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Day of Week', fontsize=12, fontweight='bold')
+
+    fig.tight_layout()
+    return fig
+
+
+# ============================================================================
+# VISUALIZATION 4: Quarterly Performance
+# ============================================================================
+def render_performance_trends(quarterly_sales, yearly_sales, yearly_orders, detail=RENDER_PROFILES[DEFAULT_PROFILE]):
+    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+    fig.suptitle('Quarterly & Yearly Performance', fontsize=16, fontweight='bold')
+
+    # 4.1 Quarterly Sales
+    colors_q = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f']
+    axes[0].bar(range(len(quarterly_sales)), quarterly_sales['Final_Price'],
+                color=colors_q[:len(quarterly_sales)], alpha=0.8)
+    axes[0].set_xticks(range(len(quarterly_sales)))
+    axes[0].set_xticklabels(quarterly_sales['Label'], rotation=45, ha='right')
+    axes[0].set_ylabel('Revenue (Rp)', fontsize=11, fontweight='bold')
+    axes[0].set_title('Quarterly Revenue Trend', fontsize=12, fontweight='bold', pad=15)
+    axes[0].grid(axis='y', alpha=0.3)
+
+    # Add value labels, to the largest bars only if there are many
+    for i in largest_positions(quarterly_sales['Final_Price'].values, detail.max_labels):
+        v = quarterly_sales['Final_Price'].values[i]
+        axes[0].text(i, v, f'Rp {v/1000:.0f}K', ha='center', va='bottom', fontsize=9)
+
+    # 4.2 Year-over-Year Comparison
+    x = np.arange(len(yearly_sales))
+    width = 0.35
+
+    axes[1].bar(x - width/2, yearly_sales.values, width, label='Revenue', color='#2E86AB')
+    ax2_twin = axes[1].twinx()
+    ax2_twin.bar(x + width/2, yearly_orders.values, width, label='Orders', color='#A23B72')
+
+    axes[1].set_xlabel('Year', fontsize=11, fontweight='bold')
+    axes[1].set_ylabel('Revenue (Rp)', fontsize=11, fontweight='bold', color='#2E86AB')
+    ax2_twin.set_ylabel('Number of Orders', fontsize=11, fontweight='bold', color='#A23B72')
+    axes[1].set_title('Year-over-Year Comparison', fontsize=12, fontweight='bold', pad=15)
+    axes[1].set_xticks(x)
+    axes[1].set_xticklabels(yearly_sales.index)
+    axes[1].tick_params(axis='y', labelcolor='#2E86AB')
+    ax2_twin.tick_params(axis='y', labelcolor='#A23B72')
+    axes[1].grid(axis='y', alpha=0.3)
+
+    # Add value labels
+    for i, (rev, orders) in enumerate(zip(yearly_sales.values, yearly_orders.values)):
+        axes[1].text(i - width/2, rev, f'Rp {rev/1000000:.1f}M',
+                     ha='center', va='bottom', fontsize=9, color='#2E86AB')
+        ax2_twin.text(i + width/2, orders, f'{orders:,}',
+                      ha='center', va='bottom', fontsize=9, color='#A23B72')
+
+    # Combined legend
+    lines1, labels1 = axes[1].get_legend_handles_labels()
+    lines2, labels2 = ax2_twin.get_legend_handles_labels()
+    axes[1].legend(lines1 + lines2, labels1 + labels2, loc='upper left')
+
+    fig.tight_layout()
+    return fig
+
+
+# ============================================================================
+# Daily series (trends command)
+# ============================================================================
+def render_daily_trends(daily, measure='Revenue', detail=RENDER_PROFILES[DEFAULT_PROFILE]):
+    """One line per column of daily (a frame of days by series, largest
+    series first), at most detail.max_labels of them."""
+    fig, ax = plt.subplots(figsize=(16, 6))
+    daily = daily.iloc[:, :detail.max_labels]
+    day_label = lambda day: day.strftime('%Y-%m-%d')
+
+    if daily.shape[1] == 1:
+        _plot_trend(ax, daily.iloc[:, 0], daily.index, detail, '#2E86AB', markersize=4,
+                    unit='Rp ' if measure == 'Revenue' else '', fmt=day_label)
+    else:
+        colors = plt.cm.tab10(np.arange(daily.shape[1]) % 10)
+        for series, color in zip(daily.columns, colors):
+            values = daily[series].to_numpy(dtype=np.float64)
+            kept = _trend_points(ax, values, detail)
+            ax.plot(kept, values[kept], linewidth=1.2, color=color, label=str(series))
+        ax.legend(loc='upper left', fontsize=9, ncol=min(daily.shape[1], 4))
+        _trend_ticks(ax, daily.index, detail, fmt=day_label)
+
+    ax.set_xlabel('Date', fontsize=12, fontweight='bold')
+    ax.set_ylabel(f'Daily {measure}', fontsize=12, fontweight='bold')
+    ax.set_title(f'Daily {measure} ({day_label(daily.index[0])} to {day_label(daily.index[-1])})', fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+# Figure name -> (output file, render function), in the order they are listed
+CHARTS = {
+    'dashboard_overview': ('dashboard_overview.png', render_dashboard_overview),
+    'customer_analysis': ('customer_analysis.png', render_customer_analysis),
+    'sales_heatmap': ('sales_heatmap.png', render_sales_heatmap),
+    'performance_trends': ('performance_trends.png', render_performance_trends)
+}
+
+
+def _hash_value(digest, value):
+    # The chart inputs are small tables, so their full contents are hashed:
+    # labels, dtypes and exact (round-trip repr) values
+    if isinstance(value, pd.Series):
+        value = value.to_frame()
+    if isinstance(value, pd.DataFrame):
+        value = (value.to_dict(orient='split'), list(value.index.names), value.dtypes.astype(str).tolist())
+    digest.update(repr(value).encode())
+
+
+def chart_filename(name, fmt=DEFAULT_FORMAT):
+    """File name of figure name saved as fmt."""
+    return f'{os.path.splitext(CHARTS[name][0])[0]}.{fmt}'
+
+
+def _detail(profile, dpi):
+    # The RenderProfile named profile, at dpi if one is given
+    return RENDER_PROFILES[profile].with_dpi(dpi)
+
+
+def chart_key(name, inputs, dpi=None, fmt=DEFAULT_FORMAT, profile=DEFAULT_PROFILE):
+    """Content hash of one figure: its input tables, render code, style,
+    output format and render profile at dpi."""
+    digest = hashlib.sha256()
+    digest.update(repr((name, _detail(profile, dpi), fmt, CHART_STYLE, matplotlib.__version__,
+                        sns.__version__)).encode())
+    digest.update(inspect.getsource(CHARTS[name][1]).encode())
+    for helper in (_plot_trend, _trend_points, _trend_ticks, _annotate_peak):
+        digest.update(inspect.getsource(helper).encode())
+    for arg in sorted(inputs):
+        digest.update(arg.encode())
+        _hash_value(digest, inputs[arg])
+    return digest.hexdigest()
+
+
+def render_chart(name, inputs, path, dpi=None, fmt=DEFAULT_FORMAT, profile=DEFAULT_PROFILE):
+    """Render one figure to path (or a binary file object) as fmt with the
+    detail of RENDER_PROFILES[profile], at dpi if given, and close it.
+    Returns the seconds taken."""
+    detail = _detail(profile, dpi)
+    start_time = time.perf_counter()
+    with stage(f'chart.{name}.draw'):
+        fig = CHARTS[name][1](**inputs, detail=detail)
+    try:
+        with stage(f'chart.{name}.savefig', dpi=detail.dpi, format=fmt) as save:
+            fig.savefig(path, dpi=detail.dpi, bbox_inches='tight', format=fmt)
+            save.set(bytes_written=path.tell() if hasattr(path, 'tell') else os.path.getsize(path))
+    finally:
+        plt.close(fig)
+    return time.perf_counter() - start_time
+
+
+def save_daily_trends(daily, path, measure='Revenue', dpi=None, profile=DEFAULT_PROFILE):
+    """Render render_daily_trends to path, in the format its extension
+    names, and close it."""
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    detail = _detail(profile, dpi)
+    _setup_style()
+    with stage('chart.daily_trends.draw', rows_in=daily.size):
+        fig = render_daily_trends(daily, measure, detail)
+    try:
+        with stage('chart.daily_trends.savefig', dpi=detail.dpi, format=fmt) as save:
+            fig.savefig(path, dpi=detail.dpi, bbox_inches='tight', format=fmt)
+            save.set(bytes_written=os.path.getsize(path))
+    finally:
+        plt.close(fig)
+
+
+def render_charts(agg, output_dir='.', dpi=None, workers=None, cache=None, force=False, fmt=DEFAULT_FORMAT,
+                  profile=DEFAULT_PROFILE):
+    """Render every figure in CHARTS from the aggregates as fmt files, with
+    the detail of RENDER_PROFILES[profile] (at dpi if given).
+
+    workers defaults to one process per figure (capped at the core count);
+    with one worker the figures are rendered in this process. With a
+    RenderCache, figures whose inputs, code, style and output are unchanged are
+    copied from the cache instead of rendered, unless force is set. Yields
+    (path, seconds) as each figure finishes, in CHARTS order; seconds is None
+    for figures taken from the cache.
+    """
+    with stage('charts.inputs'):
+        inputs = chart_inputs(agg)
+    paths = {name: os.path.join(output_dir, chart_filename(name, fmt)) for name in CHARTS}
+    keys = {name: chart_key(name, inputs[name], dpi, fmt, profile) for name in CHARTS} if cache is not None else {}
+
+    pending = []
+    for name in CHARTS:
+        if cache is not None and not force and cache.fetch(keys[name], paths[name]):
+            yield paths[name], None
+        else:
+            pending.append(name)
+    if not pending:
+        return
+
+    workers = workers or min(len(pending), os.cpu_count() or 1)
+    if workers <= 1:
+        _setup_style()
+        for name in pending:
+            with stage(f'chart.{name}') as chart:
+                seconds = render_chart(name, inputs[name], paths[name], dpi, fmt, profile)
+                chart.set(bytes_written=os.path.getsize(paths[name]))
+            if cache is not None:
+                cache.store(keys[name], paths[name])
+            yield paths[name], seconds
+        return
+
+    # Stages inside the workers are not recorded; each figure is reported
+    # with the time its worker measured
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_style) as executor:
+        futures = {name: executor.submit(render_chart, name, inputs[name], paths[name], dpi, fmt, profile)
+                   for name in pending}
+        for name, future in futures.items():
+            seconds = future.result()
+            record(f'chart.{name}', wall_seconds=seconds, worker=True,
+                   bytes_written=os.path.getsize(paths[name]))
+            if cache is not None:
+                cache.store(keys[name], paths[name])
+            yield paths[name], seconds
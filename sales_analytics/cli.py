@@ -0,0 +1,675 @@
+import argparse
+import os
+import time
+import warnings
+from .aggregation import ANALYSIS_COLUMNS, aggregate_sales, aggregate_sales_stream
+from .binary_store import DEFAULT_STORE_DIR, write_binary_store
+from .benchmark import (DEFAULT_DATA_DIR, DEFAULT_MEMORY_THRESHOLD, DEFAULT_MIN_MEMORY_MB, DEFAULT_MIN_SECONDS,
+                        DEFAULT_OUTPUT, DEFAULT_SIZES, DEFAULT_TIME_THRESHOLD, compare_results, format_size,
+                        load_results, run_benchmark as benchmark_pipeline, save_results, scaling_table)
+from .chart_detail import CHART_FORMATS, DEFAULT_FORMAT, DEFAULT_PROFILE, RENDER_PROFILES
+from .cube import CATEGORICAL_DIMENSIONS, CUBE_DIMENSIONS
+from .customers import CUSTOMER_COLUMNS, DEFAULT_RFM_BINS, MAX_RFM_BINS, build_customer_index
+from .exports import CSV_COMPRESSIONS, DEFAULT_CHUNK_ROWS, DEFAULT_CSV_COMPRESSION, EXPORT_FORMATS, export_all
+from .incremental import DEFAULT_STATE_PATH, format_refresh_summary, refresh_aggregates
+from .ingest import DEFAULT_READ_THREADS, FileCollection
+from .instrument import disable as disable_instrumentation, enable as enable_instrumentation, stage
+from .parallel import aggregate_sales_parallel
+from .render_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES, RenderCache
+from .report import export_tables, format_sketch_summary, format_summary, summary_tables
+from .schema import format_memory_report
+from .server import DEFAULT_CACHE_ENTRIES, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_TTL, serve
+from .sketches import SKETCH_COLUMNS, SalesSketches, sketch_sales
+from .storage import (DEFAULT_CONVERT_CHUNK_SIZE, DEFAULT_DATASET_DIR, DEFAULT_LOAD_CHUNK_SIZE,
+                      DEFAULT_SOURCE, convert_csv_to_dataset, iter_sales_data, load_sales_data)
+from .timeseries import (DEFAULT_HORIZON, DEFAULT_RECENT_WEEKS, DEFAULT_WINDOWS, MEASURES as SERIES_MEASURES,
+                         TIMESERIES_COLUMNS, daily_series, daily_series_stream)
+from .validation import (DEFAULT_QUARANTINE_FILE, DEFAULT_REFERENCE, DEFAULT_VALID_FROM, VALIDATION_COLUMNS,
+                         SalesValidator, append_csv, feed_layout, format_validation_report, load_reference)
+
+# Command line entry point: python -m sales_analytics {summary,charts,export,query,customers,
+# trends,approx,validate,ingest,serve,benchmark,benchmark-compare,convert}.
+# matplotlib and seaborn are only imported by the charts command and trends --chart.
+
+def _data_parser():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--data', default=DEFAULT_SOURCE,
+                        help='transaction CSV, partitioned dataset or binary store directory '
+                             '(see the convert command), or a glob or directory of CSV/Parquet files')
+    parser.add_argument('--read-threads', type=int, default=DEFAULT_READ_THREADS,
+                        help='files of a glob or directory read concurrently')
+    parser.add_argument('--start', default=None, help='first period to include, e.g. 2024 or 2024-06')
+    parser.add_argument('--end', default=None, help='last period to include, e.g. 2024 or 2024-06')
+    parser.add_argument('--exact-money', action='store_true',
+                        help='keep money columns as exact 2-place decimals instead of float32')
+    parser.add_argument('--stream', action='store_true',
+                        help='fold the data into the aggregates chunk by chunk instead of loading it whole')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_LOAD_CHUNK_SIZE,
+                        help='rows per chunk when reading the data')
+    parser.add_argument('--incremental', action='store_true',
+                        help='fold only new or changed days into the aggregate state file')
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help='aggregate state file for --incremental')
+    parser.add_argument('--refresh-day', action='append', default=[],
+                        help='with --incremental, re-aggregate this day (YYYY-MM-DD); may be repeated')
+    parser.add_argument('--rebuild-state', action='store_true',
+                        help='with --incremental, discard the state file and aggregate everything again')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes used to aggregate the loaded data (0 = one per core)')
+    return parser
+
+
+def _instrument_parser():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help='append a JSON line per pipeline stage (time, CPU, peak RSS, rows, bytes) to FILE')
+    parser.add_argument('--profile-dir', default=None,
+                        help='also write a cProfile dump per stage into this directory')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also record the tracemalloc peak of each stage (slows the run down)')
+    return parser
+
+
+def _validation_parser():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--quarantine', default=DEFAULT_QUARANTINE_FILE,
+                        help='CSV the rows failing a check are written to, with the checks they failed')
+    parser.add_argument('--repair', action='store_true',
+                        help='fix label case and spacing and recompute mismatched Discount_Amount and '
+                             'Final_Price instead of quarantining those rows')
+    parser.add_argument('--valid-from', default=DEFAULT_VALID_FROM, help='earliest valid order date')
+    parser.add_argument('--valid-to', default=None, help='latest valid order date (default: today)')
+    parser.add_argument('--reference', default=None, metavar='JSON',
+                        help='catalogue of valid segments, regions, payment methods and products per '
+                             'category (default: the generator\'s)')
+    return parser
+
+
+def make_validator(args):
+    reference = load_reference(args.reference) if args.reference else DEFAULT_REFERENCE
+    return SalesValidator(reference, args.valid_from, args.valid_to, args.quarantine, args.repair)
+
+
+def load_aggregates(args, customers=False):
+    """Aggregate the data selected by the shared data options. With
+    customers (not under --stream), also return the CustomerIndex of the
+    same (validated) rows."""
+    # Every table comes from one pass over the data; revenue is summed in
+    # exact cents, so float32 money loses nothing
+    validator = make_validator(args) if getattr(args, 'validate', False) else None
+    index = None
+    columns = ANALYSIS_COLUMNS
+    if validator is not None:
+        # The checks also need the columns the aggregates do not
+        columns = ANALYSIS_COLUMNS + [col for col in VALIDATION_COLUMNS if col not in ANALYSIS_COLUMNS]
+    if args.incremental:
+        print(f"Refreshing aggregate state {args.state}...")
+        agg, refresh_summary = refresh_aggregates(args.data, args.state, args.refresh_day, args.rebuild_state,
+                                                  chunk_size=args.chunk_size)
+        print(format_refresh_summary(refresh_summary))
+    elif args.stream:
+        # Only one chunk plus the running aggregates is in memory at a time
+        print(f"Streaming sales data in chunks of {args.chunk_size:,} rows...")
+        chunks = iter_sales_data(args.data, columns=columns, start=args.start, end=args.end,
+                                 exact_money=args.exact_money, chunk_size=args.chunk_size, validator=validator,
+                                 read_threads=args.read_threads)
+        agg = aggregate_sales_stream(chunks)
+    else:
+        # Load data (Date arrives as datetime64)
+        print("Loading sales data...")
+        df = load_sales_data(args.data, columns=columns, start=args.start, end=args.end,
+                             exact_money=args.exact_money, chunk_size=args.chunk_size, validator=validator,
+                             read_threads=args.read_threads)
+        print(format_memory_report(df.attrs['memory']['before'], df.attrs['memory']['after'], len(df)))
+        agg = aggregate_sales_parallel(df, args.workers) if args.workers != 1 else aggregate_sales(df)
+        if customers:
+            index = _customer_index(df[CUSTOMER_COLUMNS])
+    if validator is not None:
+        print(format_validation_report(validator))
+    if customers and index is None:
+        # The aggregate state holds no customer histories, so read them
+        index = _customer_index(load_sales_data(args.data, columns=CUSTOMER_COLUMNS, exact_money=args.exact_money,
+                                                chunk_size=args.chunk_size, read_threads=args.read_threads))
+    return (agg, index) if customers else agg
+
+
+def _customer_index(df):
+    with stage('customers.index', rows_in=len(df)) as indexing:
+        index = build_customer_index(df)
+        indexing.set(rows_out=len(index))
+    return index
+
+
+def _print_export(paths):
+    print("\nSaving analysis results...")
+    print("\nFiles saved:")
+    for path in paths:
+        print(f"  • {os.path.normpath(path)}")
+
+
+def run_summary(args):
+    agg = load_aggregates(args)
+    tables = summary_tables(agg)
+    with stage('summary.format'):
+        text = format_summary(agg, tables)
+    print(text)
+    if args.export:
+        _print_export(export_tables(agg, args.output_dir, tables))
+
+
+def run_export(args):
+    # Customer histories come from the same load as the aggregates, so both
+    # cover the same validated rows
+    customers = None
+    if args.customers:
+        agg, customers = load_aggregates(args, customers=True)
+    else:
+        agg = load_aggregates(args)
+    if not args.format:
+        _print_export(export_tables(agg, args.output_dir))
+        return
+
+    compression = None if args.compression == 'none' else args.compression
+    start_time = time.perf_counter()
+    paths = export_all(agg, args.output_dir, args.format, customers, compression, args.chunk_rows)
+    print(f"Exported every table as {', '.join(args.format)} in {time.perf_counter() - start_time:.2f}s")
+    _print_export(paths)
+
+
+def run_charts(args):
+    from .charts import chart_filename, render_charts
+
+    agg = load_aggregates(args)
+    print("Creating visualizations...")
+
+    # Each figure is rendered from the aggregates in its own process and closed
+    # as soon as it is saved; figures whose inputs did not change come from the cache
+    cache = None if args.no_cache else RenderCache(args.cache_dir, int(args.cache_max_mb * 2**20))
+    start_time = time.perf_counter()
+    for path, seconds in render_charts(agg, args.output_dir, args.dpi, args.render_workers, cache,
+                                       args.force_render, args.format, args.profile):
+        timing = 'cached' if seconds is None else f'{seconds:.2f}s'
+        print(f"✓ Saved: {os.path.basename(path)} ({timing})")
+    print(f"Rendered in {time.perf_counter() - start_time:.2f}s wall time")
+
+    print("\n" + "="*80)
+    print("All visualizations created successfully!")
+    print("="*80)
+    print("\nGenerated files:")
+    print(f"  1. {chart_filename('dashboard_overview', args.format)} - Main dashboard with key metrics")
+    print(f"  2. {chart_filename('customer_analysis', args.format)} - Customer behavior and segments")
+    print(f"  3. {chart_filename('sales_heatmap', args.format)} - Sales pattern heatmap")
+    print(f"  4. {chart_filename('performance_trends', args.format)} - Quarterly and yearly trends")
+    print("\nVisualization complete! 🎉")
+
+
+def _parse_where(parser, conditions):
+    # 'Region=Jakarta,Bandung' -> {'Region': ['Jakarta', 'Bandung']}
+    where = {}
+    for condition in conditions:
+        dim, _, values = condition.partition('=')
+        if dim not in CUBE_DIMENSIONS or not values:
+            parser.error(f"--where expects DIMENSION=VALUE[,VALUE...] with a cube dimension, got {condition!r}")
+        values = values.split(',')
+        if dim not in CATEGORICAL_DIMENSIONS and dim != 'Day_of_Week':
+            if not all(value.isdigit() for value in values):
+                parser.error(f"--where {dim} takes whole numbers, got {condition!r}")
+            values = [int(value) for value in values]
+        where[dim] = values
+    return where
+
+
+def run_query(args):
+    agg = load_aggregates(args)
+    start_time = time.perf_counter()
+    with stage('query', rows_in=len(agg.cube.cells)) as query:
+        result = agg.cube.query(args.by, args.where)
+        query.set(rows_out=len(result))
+    elapsed = time.perf_counter() - start_time
+    print(f"{len(result):,} groups from {len(agg.cube.cells):,} cube cells in {elapsed * 1000:.1f} ms\n")
+    print(result.to_string())
+    if args.output:
+        result.to_csv(args.output)
+        print(f"\nSaved: {args.output}")
+
+
+def run_customers(args):
+    print("Loading sales data...")
+    df = load_sales_data(args.data, columns=CUSTOMER_COLUMNS, start=args.start, end=args.end,
+                         exact_money=args.exact_money, chunk_size=args.chunk_size, read_threads=args.read_threads)
+    start_time = time.perf_counter()
+    with stage('customers.index', rows_in=len(df)) as indexing:
+        index = build_customer_index(df)
+        indexing.set(rows_out=len(index))
+    del df
+    with stage('customers.rfm'):
+        rfm = index.rfm(args.as_of, args.bins)
+    with stage('customers.retention'):
+        retention = index.retention()
+    with stage('customers.intervals'):
+        intervals = index.interval_summary()
+        histogram = index.interval_histogram(args.interval_days)
+    elapsed = time.perf_counter() - start_time
+    print(f"Indexed {len(index.days):,} transactions of {len(index):,} customers in {elapsed:.2f}s")
+
+    print("\nCustomers per RFM segment:")
+    segments = rfm.groupby('Segment').agg(Customers=('Frequency', 'size'), Revenue=('Monetary', 'sum'),
+                                          Avg_Orders=('Frequency', 'mean'))
+    print(segments.sort_values('Revenue', ascending=False).round(2).to_string())
+    print("\nMonthly cohort retention (%):")
+    print((retention * 100).round(1).to_string(na_rep=''))
+    print("\nDays between purchases:")
+    print(intervals.round(1).to_string())
+
+    if args.output_dir:
+        paths = []
+        for filename, table in (('customer_rfm.csv', rfm), ('cohort_retention.csv', retention.round(4)),
+                                ('purchase_intervals.csv', histogram)):
+            path = os.path.join(args.output_dir, filename)
+            with stage(f'export.{filename}', rows_in=len(table)) as export:
+                table.to_csv(path)
+                export.set(bytes_written=os.path.getsize(path))
+            paths.append(path)
+        _print_export(paths)
+
+
+def run_trends(args):
+    columns = TIMESERIES_COLUMNS + args.by
+    start_time = time.perf_counter()
+    if args.stream:
+        print(f"Streaming sales data in chunks of {args.chunk_size:,} rows...")
+        series = daily_series_stream(iter_sales_data(args.data, columns=columns, start=args.start, end=args.end,
+                                                     chunk_size=args.chunk_size), args.by)
+    else:
+        print("Loading sales data...")
+        df = load_sales_data(args.data, columns=columns, start=args.start, end=args.end,
+                             chunk_size=args.chunk_size)
+        series = daily_series(df, args.by)
+        del df
+    if not series.n_days:
+        print("No transactions in range.")
+        return
+    last_date = series.dates[-1].strftime('%Y-%m-%d')
+    print(f"Built {len(series):,} daily series over {series.n_days:,} days in "
+          f"{time.perf_counter() - start_time:.2f}s")
+
+    # Series are listed by their sum over the longest window
+    summary = series.summary(args.windows, args.measure)
+    top = summary.sort_values(f'Last_{max(args.windows)}d', ascending=False).head(args.top).index
+    print(f"\n{args.measure} over trailing windows up to {last_date}, with growth vs the window before (%):")
+    print(summary.loc[top].round(2).to_string())
+
+    tables = {'timeseries_summary.csv': summary}
+    if args.compare:
+        current, previous = args.compare
+        comparison = series.compare_windows(current, previous, args.measure)
+        print(f"\n{args.measure} in {current} vs {previous}:")
+        print(comparison.loc[top].round(2).to_string())
+        tables['timeseries_comparison.csv'] = comparison
+
+    if args.forecast_days and series.n_days < DEFAULT_RECENT_WEEKS * 7:
+        print(f"\nForecast skipped: it needs at least {DEFAULT_RECENT_WEEKS} weeks of history, "
+              f"the range has {series.n_days} days")
+    elif args.forecast_days:
+        forecast = series.forecast(args.forecast_days, args.measure)
+        outlook = forecast.sum().to_frame('Forecast')
+        outlook['Last_Period'] = series.trailing_totals(args.forecast_days, args.measure)
+        # The seasonality is pooled, so the change is the same for every
+        # series and is printed once, for their total
+        change = (outlook['Forecast'].sum() / outlook['Last_Period'].sum() - 1) * 100
+        print(f"\nForecast {args.measure} for the next {args.forecast_days} days vs the last {args.forecast_days} "
+              f"({change:+.2f}% for every series, from the seasonality of their total):")
+        print(outlook.loc[top].round(2).to_string())
+        tables['timeseries_forecast.csv'] = forecast
+
+    if args.chart:
+        from .charts import save_daily_trends
+
+        save_daily_trends(series.daily(args.measure)[top], args.chart, args.measure, args.dpi, args.profile)
+        print(f"\n✓ Saved: {args.chart}")
+
+    if args.output_dir:
+        paths = []
+        for filename, table in tables.items():
+            path = os.path.join(args.output_dir, filename)
+            with stage(f'export.{filename}', rows_in=len(table)) as export:
+                table.round(2).to_csv(path)
+                export.set(bytes_written=os.path.getsize(path))
+            paths.append(path)
+        _print_export(paths)
+
+
+def run_approx(args):
+    start_time = time.perf_counter()
+    if args.sketch:
+        # Summaries of separately sketched partitions, merged
+        print(f"Merging {len(args.sketch)} sketch files...")
+        sketches = SalesSketches.load(args.sketch[0])
+        for path in args.sketch[1:]:
+            sketches = sketches.merge(SalesSketches.load(path))
+    else:
+        print(f"Sketching sales data in chunks of {args.chunk_size:,} rows...")
+        chunks = iter_sales_data(args.data, columns=SKETCH_COLUMNS, start=args.start, end=args.end,
+                                 exact_money=args.exact_money, chunk_size=args.chunk_size)
+        sketches = sketch_sales(chunks)
+    print(f"Sketched {sketches.orders:,} transactions in {time.perf_counter() - start_time:.2f}s\n")
+    print(format_sketch_summary(sketches, args.top))
+    if args.save:
+        sketches.save(args.save)
+        print(f"\nSaved: {args.save}")
+
+
+def run_validate(args):
+    validator = make_validator(args)
+    print(f"Validating {args.data} in chunks of {args.chunk_size:,} rows...")
+    start_time = time.perf_counter()
+    chunks = iter_sales_data(args.data, start=args.start, end=args.end, chunk_size=args.chunk_size,
+                             validator=validator, read_threads=args.read_threads)
+    header = True
+    for chunk in chunks:
+        if args.output:
+            with stage('validate.write', rows_in=len(chunk)):
+                append_csv(feed_layout(chunk), args.output, header)
+            header = False
+    print(f"Validated in {time.perf_counter() - start_time:.2f}s")
+    print(format_validation_report(validator))
+    if args.output:
+        print(f"Valid rows saved to {args.output}")
+
+
+def run_ingest(args):
+    start_time = time.perf_counter()
+    files = FileCollection(args.data, args.read_threads, args.rescan)
+    table = files.summary()
+    print(f"{len(files.files):,} files, {files.rows:,} transactions "
+          f"({files.scanned:,} scanned, {len(files.files) - files.scanned:,} from {files.manifest_path}) "
+          f"in {time.perf_counter() - start_time:.2f}s")
+    print(f"Columns: {', '.join(files.columns)}")
+    lacking = table[table['Missing_Columns'] != '']
+    if len(lacking):
+        print(f"{len(lacking):,} files lack columns; validate to quarantine their rows:")
+        print(lacking[['File', 'Missing_Columns']].to_string(index=False))
+    if args.list:
+        print(table.drop(columns='Missing_Columns').to_string(index=False))
+
+
+def run_serve(args):
+    def ready(server):
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"Serving reports for {args.data} on http://{host}:{port}/ (Ctrl+C to stop)")
+
+    try:
+        serve(args.data, args.host, args.port, args.workers, args.ttl, args.cache_entries, args.dpi, ready)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+def run_benchmark(args):
+    def progress(result):
+        if result['stage'] == 'generate':
+            print(f"Generated {format_size(result['rows'])} rows in {result['seconds']:.2f}s")
+        else:
+            print(f"  {format_size(result['rows']):>5} {result['stage']:<36} {result['seconds']:9.3f}s "
+                  f"{result['peak_rss_mb']:9.1f} MB peak")
+
+    document = benchmark_pipeline(args.sizes, args.data_dir, args.seed, args.repeat, not args.no_render,
+                                  args.dpi, progress)
+    save_results(document, args.output)
+    print("\nSeconds per stage:")
+    print(scaling_table(document).round(3).to_string())
+    print("\nPeak RSS per stage (MB):")
+    print(scaling_table(document, 'peak_rss_mb').round(1).to_string())
+    print(f"\nSaved: {args.output}")
+
+
+def run_benchmark_compare(args):
+    comparison = compare_results(load_results(args.current), load_results(args.baseline),
+                                 args.threshold, args.memory_threshold, args.min_seconds, args.min_memory_mb)
+    comparison['rows'] = [format_size(rows) for rows in comparison['rows']]
+    print(comparison.round(3).to_string(index=False))
+    regressions = comparison[comparison['Status'] == 'regression']
+    print(f"\n{len(regressions)} regressions, "
+          f"{(comparison['Status'] == 'improved').sum()} improvements in {len(comparison)} stages")
+    if len(regressions):
+        raise SystemExit(1)
+
+
+def run_convert(args):
+    start_time = time.perf_counter()
+    if args.format == 'store':
+        output = args.output or DEFAULT_STORE_DIR
+        rows = write_binary_store(args.input, output, args.chunk_size, args.overwrite)
+    else:
+        output = args.output or DEFAULT_DATASET_DIR
+        rows = convert_csv_to_dataset(args.input, output, args.chunk_size, args.overwrite)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Converted {rows:,} transactions from {args.input} to {output} in {elapsed:.2f}s")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m sales_analytics',
+                                     description='Sales data analysis: summary, charts and exports.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    instrument = _instrument_parser()
+    data = _data_parser()
+    validation = _validation_parser()
+    # Commands that aggregate through load_aggregates can validate on the way
+    validated = argparse.ArgumentParser(add_help=False, parents=[validation])
+    validated.add_argument('--validate', action='store_true',
+                            help='check every row first and leave failing rows out (see the validate command)')
+
+    summary = commands.add_parser('summary', parents=[data, validated, instrument], help='print the executive summary')
+    summary.add_argument('--export', action='store_true', help='also save the summary CSVs')
+    summary.add_argument('--output-dir', default='.', help='directory for --export')
+    summary.set_defaults(run=run_summary)
+
+    export = commands.add_parser('export', parents=[data, validated, instrument],
+                                 help='save the summary CSVs, or every analysis table with --format')
+    export.add_argument('--output-dir', default='.', help='directory to write the files to')
+    export.add_argument('--format', nargs='+', choices=EXPORT_FORMATS, default=None,
+                        help='write every table (summary tables and per-customer metrics): xlsx as one '
+                             'workbook with a sheet per table, parquet and csv as one file per table')
+    export.add_argument('--compression', choices=[name or 'none' for name in CSV_COMPRESSIONS],
+                        default=DEFAULT_CSV_COMPRESSION, help='compression of --format csv files')
+    export.add_argument('--customers', action='store_true',
+                        help='also export the RFM, cohort retention and purchase interval tables')
+    export.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='rows handed to the writers at a time')
+    export.set_defaults(run=run_export)
+
+    charts = commands.add_parser('charts', parents=[data, validated, instrument], help='render the dashboard charts')
+    charts.add_argument('--output-dir', default='.', help='directory to write the charts to')
+    charts.add_argument('--render-workers', type=int, default=None,
+                        help='processes rendering figures concurrently (default: one per figure, up to the core count)')
+    charts.add_argument('--format', choices=CHART_FORMATS, default=DEFAULT_FORMAT, help='file format of the charts')
+    charts.add_argument('--profile', choices=list(RENDER_PROFILES), default=DEFAULT_PROFILE,
+                        help='print: 300 dpi, long series keep every peak; preview: 100 dpi, fewer points '
+                             'and labels, renders fastest')
+    charts.add_argument('--dpi', type=int, default=None, help='resolution, overriding the profile\'s')
+    charts.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='directory of previously rendered charts, keyed by a hash of their inputs')
+    charts.add_argument('--cache-max-mb', type=float, default=DEFAULT_CACHE_MAX_BYTES / 2**20,
+                        help='least recently used charts are evicted past this cache size')
+    charts.add_argument('--no-cache', action='store_true', help='neither reuse nor store rendered charts')
+    charts.add_argument('--force-render', action='store_true',
+                        help='re-render every figure even if a cached chart matches')
+    charts.set_defaults(run=run_charts)
+
+    query = commands.add_parser('query', parents=[data, validated, instrument], help='group and filter the rollup cube')
+    query.add_argument('--by', nargs='+', required=True, choices=CUBE_DIMENSIONS, help='dimensions to group by')
+    query.add_argument('--where', action='append', default=[], metavar='DIMENSION=VALUE[,VALUE...]',
+                       help='keep only these values of a dimension; may be repeated')
+    query.add_argument('--output', default=None, help='also save the result to this CSV')
+    query.set_defaults(run=run_query)
+
+    customers = commands.add_parser('customers', parents=[data, instrument],
+                                    help='RFM segments, cohort retention and purchase intervals')
+    customers.add_argument('--as-of', default=None, help='day recency is measured to (default: day after the last sale)')
+    customers.add_argument('--bins', type=int, default=DEFAULT_RFM_BINS,
+                           help=f'score bins per RFM axis (1-{MAX_RFM_BINS})')
+    customers.add_argument('--interval-days', type=int, default=7, help='bin width of the purchase interval histogram')
+    customers.add_argument('--output-dir', default=None,
+                           help='also save the RFM table, retention matrix and interval histogram here')
+    customers.set_defaults(run=run_customers)
+
+    trends = commands.add_parser('trends', parents=[data, instrument],
+                                 help='rolling windows, growth and a seasonal forecast of daily series')
+    trends.add_argument('--by', nargs='*', default=[], choices=CATEGORICAL_DIMENSIONS,
+                        help='one series per value (combination) of these dimensions; none for the total')
+    trends.add_argument('--measure', choices=list(SERIES_MEASURES), default='Revenue', help='daily measure')
+    trends.add_argument('--windows', nargs='+', type=int, default=list(DEFAULT_WINDOWS),
+                        help='trailing windows in days')
+    trends.add_argument('--compare', nargs=2, metavar=('CURRENT', 'PREVIOUS'), default=None,
+                        help='also compare two periods, e.g. 2024 2023 or 2024-06 2024-05')
+    trends.add_argument('--forecast-days', type=int, default=DEFAULT_HORIZON,
+                        help='days to forecast (0 = no forecast)')
+    trends.add_argument('--top', type=int, default=10, help='series listed, largest first')
+    trends.add_argument('--output-dir', default=None,
+                        help='also save the window summary, comparison and daily forecast of every series here')
+    trends.add_argument('--chart', default=None,
+                        help=f'also plot the listed series day by day to this file ({", ".join(CHART_FORMATS)})')
+    trends.add_argument('--profile', choices=list(RENDER_PROFILES), default=DEFAULT_PROFILE,
+                        help='detail of --chart: print keeps every peak, preview renders fastest')
+    trends.add_argument('--dpi', type=int, default=None, help='resolution of --chart, overriding the profile\'s')
+    trends.set_defaults(run=run_trends)
+
+    approx = commands.add_parser('approx', parents=[data, instrument],
+                                 help='approximate summary from mergeable sketches, with error bounds')
+    approx.add_argument('--top', type=int, default=10, help='products and customers listed by revenue')
+    approx.add_argument('--save', default=None, help='also save the sketches to this file')
+    approx.add_argument('--sketch', action='append', default=[],
+                        help='summarise these saved sketch files, merged, instead of --data; may be repeated')
+    approx.set_defaults(run=run_approx)
+
+    validate = commands.add_parser('validate', parents=[validation, instrument],
+                                   help='check every row, report the failures and quarantine the bad rows')
+    validate.add_argument('--data', default=DEFAULT_SOURCE,
+                          help='transaction CSV, partitioned dataset, binary store directory, or a glob or '
+                               'directory of CSV/Parquet files')
+    validate.add_argument('--read-threads', type=int, default=DEFAULT_READ_THREADS,
+                          help='files of a glob or directory read concurrently')
+    validate.add_argument('--start', default=None, help='first period to include, e.g. 2024 or 2024-06')
+    validate.add_argument('--end', default=None, help='last period to include, e.g. 2024 or 2024-06')
+    validate.add_argument('--chunk-size', type=int, default=DEFAULT_LOAD_CHUNK_SIZE, help='rows checked at a time')
+    validate.add_argument('--output', default=None, help='also write the valid (and repaired) rows to this CSV')
+    validate.set_defaults(run=run_validate)
+
+    ingest = commands.add_parser('ingest', parents=[instrument],
+                                 help='catalogue the files of a glob or directory: rows, dates and columns')
+    ingest.add_argument('--data', required=True, help='glob or directory of CSV/Parquet transaction files')
+    ingest.add_argument('--read-threads', type=int, default=DEFAULT_READ_THREADS,
+                        help='files scanned concurrently')
+    ingest.add_argument('--rescan', action='store_true', help='scan every file again, ignoring the manifest')
+    ingest.add_argument('--list', action='store_true', help='also list every file with its rows and dates')
+    ingest.set_defaults(run=run_ingest)
+
+    server = commands.add_parser('serve', help='serve summary metrics, tables and charts over HTTP')
+    server.add_argument('--data', default=DEFAULT_SOURCE,
+                        help='transaction CSV, partitioned dataset, binary store directory, or a glob or '
+                             'directory of CSV/Parquet files')
+    server.add_argument('--host', default=DEFAULT_HOST, help='address to listen on')
+    server.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on (0 = any free port)')
+    server.add_argument('--workers', type=int, default=0,
+                        help='processes that load, aggregate and render (0 = one per core)')
+    server.add_argument('--ttl', type=float, default=DEFAULT_TTL, help='seconds a cached result stays valid')
+    server.add_argument('--cache-entries', type=int, default=DEFAULT_CACHE_ENTRIES,
+                        help='cached results kept; the least recently used are evicted first')
+    server.add_argument('--dpi', type=int, default=None,
+                        help='chart resolution when a request sets none (default: that of the render profile)')
+    server.set_defaults(run=run_serve)
+
+    benchmark = commands.add_parser('benchmark', help='time and memory-profile every pipeline stage')
+    benchmark.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES,
+                           help='dataset sizes in rows, e.g. 10K 1M 100M')
+    benchmark.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                           help='generated datasets are kept here and reused')
+    benchmark.add_argument('--seed', type=int, default=None, help='generator seed')
+    benchmark.add_argument('--repeat', type=int, default=1, help='runs per size; the fastest run of each stage is kept')
+    benchmark.add_argument('--no-render', action='store_true', help='skip the figure stages')
+    benchmark.add_argument('--dpi', type=int, default=None, help='figure resolution (default 300)')
+    benchmark.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON file to write the results to')
+    benchmark.set_defaults(run=run_benchmark)
+
+    compare = commands.add_parser('benchmark-compare', help='flag stages slower or bigger than a baseline run')
+    compare.add_argument('current', help='benchmark JSON to check')
+    compare.add_argument('--baseline', required=True, help='benchmark JSON to compare against')
+    compare.add_argument('--threshold', type=float, default=DEFAULT_TIME_THRESHOLD,
+                         help='relative slowdown counted as a regression (0.25 = 25%%)')
+    compare.add_argument('--memory-threshold', type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                         help='relative peak memory growth counted as a regression')
+    compare.add_argument('--min-seconds', type=float, default=DEFAULT_MIN_SECONDS,
+                         help='slowdowns smaller than this many seconds are treated as noise')
+    compare.add_argument('--min-memory-mb', type=float, default=DEFAULT_MIN_MEMORY_MB,
+                         help='memory growth smaller than this many MB is treated as noise')
+    compare.set_defaults(run=run_benchmark_compare)
+
+    convert = commands.add_parser('convert', parents=[instrument],
+                                  help='convert a CSV into a partitioned Parquet dataset or a binary store')
+    convert.add_argument('--input', default=DEFAULT_SOURCE, help='transaction CSV to convert')
+    convert.add_argument('--format', choices=['parquet', 'store'], default='parquet',
+                         help='parquet: Year/Month partitioned dataset; store: memory-mapped binary '
+                              'columns that reload without reading')
+    convert.add_argument('--output', help=f'directory to write (default: {DEFAULT_DATASET_DIR} or '
+                                          f'{DEFAULT_STORE_DIR})')
+    convert.add_argument('--chunk-size', type=int, default=DEFAULT_CONVERT_CHUNK_SIZE,
+                         help='CSV rows converted per step')
+    convert.add_argument('--overwrite', action='store_true', help='replace an existing output directory')
+    convert.set_defaults(run=run_convert)
+    return parser
+
+
+def _run(parser, args):
+    # Data that cannot be loaded (a missing file, columns a collection
+    # lacks) is reported like a bad argument rather than as a traceback
+    try:
+        args.run(args)
+    except (ValueError, FileNotFoundError) as exc:
+        parser.exit(2, f'{parser.prog}: error: {exc}\n')
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'incremental', False):
+        if args.start or args.end:
+            parser.error('--incremental always covers the whole dataset; drop --start/--end')
+    if hasattr(args, 'stream') and args.workers != 1 and (args.stream or args.incremental):
+        parser.error('--workers only applies to the default in-memory mode')
+
+    if args.command in ('customers', 'approx') and (args.stream or args.incremental or args.workers != 1):
+        parser.error(f'{args.command} reads the data its own way; drop --stream/--incremental/--workers')
+    if args.command == 'export' and args.customers:
+        # The customer index holds every transaction's day and amount, which
+        # --stream exists to avoid keeping in memory
+        if args.stream:
+            parser.error('--customers needs the transactions in memory; drop --stream')
+        if not args.format:
+            parser.error('--customers only applies with --format')
+    if args.command == 'customers' and not 1 <= args.bins <= MAX_RFM_BINS:
+        parser.error(f'--bins must be between 1 and {MAX_RFM_BINS}, one digit per RFM_Score position')
+    if args.command == 'trends' and (args.incremental or args.workers != 1):
+        parser.error('trends reads the data its own way; drop --incremental/--workers')
+    if args.command == 'trends' and args.chart and \
+            os.path.splitext(args.chart)[1].lstrip('.').lower() not in CHART_FORMATS:
+        parser.error(f'--chart must end in one of .{", .".join(CHART_FORMATS)}')
+
+    if getattr(args, 'validate', False) and args.incremental:
+        parser.error('--validate only applies to the in-memory and --stream modes')
+    if args.command == 'query':
+        args.where = _parse_where(parser, args.where)
+
+    warnings.filterwarnings('ignore')
+    instrumented = getattr(args, 'trace', None) or getattr(args, 'profile_dir', None) or \
+        getattr(args, 'trace_memory', False)
+    if not instrumented:
+        _run(parser, args)
+        return
+
+    recorder = enable_instrumentation(args.trace, args.profile_dir, args.trace_memory)
+    try:
+        with stage(args.command):
+            _run(parser, args)
+    finally:
+        disable_instrumentation()
+    print(f"\nRecorded {len(recorder.records)} stages (run {recorder.run_id})"
+          + (f" to {args.trace}" if args.trace else ''))
@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+from .calendar_dim import DAY_ORDER, date_codes
+from .schema import money_cents
+
+# Rollup cube: the transactions collapsed to one cell per distinct combination
+# of the cube dimensions, holding additive measures (money in exact cents).
+# Any group-by/filter over those dimensions is answered from the cells alone,
+# which number in the thousands to hundreds of thousands however many rows
+# went in. Cubes over disjoint transactions merge by adding cells.
+
+CATEGORICAL_DIMENSIONS = ['Product', 'Category', 'Region', 'Customer_Segment', 'Payment_Method']
+CUBE_DIMENSIONS = ['Year', 'Quarter', 'Month', 'Day_of_Week', 'Region', 'Category', 'Product',
+                   'Customer_Segment', 'Payment_Method']
+
+# Dimensions stored per cell; Quarter is derived from Month at query time
+CELL_DIMENSIONS = ['Year', 'Month', 'Day_of_Week'] + CATEGORICAL_DIMENSIONS
+
+MONEY_MEASURES = ['Final_Price', 'Total_Sales', 'Discount_Amount']
+MEASURES = MONEY_MEASURES + ['Quantity', 'Orders']
+
+# Columns a frame needs for SalesCube.from_frame
+CUBE_COLUMNS = ['Date'] + CATEGORICAL_DIMENSIONS + MONEY_MEASURES + ['Quantity']
+
+def _combine_keys(columns):
+    """One int64 key per row from several integer code columns, ordered like
+    the columns (first column most significant), plus the (low, size) span of
+    each column needed to decode it."""
+    key = np.zeros(len(columns[0]) if columns else 0, dtype=np.int64)
+    spans = []
+    for codes in columns:
+        low = int(codes.min()) if len(codes) else 0
+        size = int(codes.max()) - low + 1 if len(codes) else 1
+        key = key * size + (codes - low)
+        spans.append((low, size))
+    return key, spans
+
+
+def _split_keys(keys, spans):
+    # Inverse of _combine_keys
+    columns = []
+    for low, size in reversed(spans):
+        columns.append(keys % size + low)
+        keys = keys // size
+    return columns[::-1]
+
+
+def _collapse(codes, measures):
+    # Sum the measures of rows (or cells) that share every dimension code
+    key, spans = _combine_keys([codes[dim] for dim in CELL_DIMENSIONS])
+    cell_ids, keys = pd.factorize(key)
+    cells = dict(zip(CELL_DIMENSIONS, _split_keys(keys, spans)))
+    for name, values in measures.items():
+        # float64 bincount sums of integers stay exact up to 2**53
+        cells[name] = np.bincount(cell_ids, weights=values, minlength=len(keys)).astype(np.int64)
+    return pd.DataFrame(cells)
+
+
+class SalesCube:
+    """Additive measures per combination of the cube dimensions.
+
+    cells holds one row per non-empty combination: integer codes for
+    CELL_DIMENSIONS (the calendar year, month 1-12, weekday 0-6 from Monday,
+    and positions in labels for the categorical dimensions) and the MEASURES
+    summed over its transactions, money in cents.
+    """
+
+    def __init__(self, cells, labels):
+        self.cells = cells
+        self.labels = labels  # categorical dimension -> Index of labels
+
+    @classmethod
+    def from_frame(cls, df, dates=None):
+        dates = dates if dates is not None else date_codes(df['Date'])
+        codes = {'Year': dates['year'], 'Month': dates['month'], 'Day_of_Week': dates['day_of_week']}
+        labels = {}
+        for dim in CATEGORICAL_DIMENSIONS:
+            column = df[dim]
+            if not isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.astype('category')
+            codes[dim] = column.cat.codes.to_numpy().astype(np.int64)
+            labels[dim] = pd.Index(column.cat.categories, name=dim)
+        measures = {col: money_cents(df[col]).astype(np.float64) for col in MONEY_MEASURES}
+        measures['Quantity'] = df['Quantity'].to_numpy().astype(np.float64)
+        measures['Orders'] = np.ones(len(df))
+        return cls(_collapse(codes, measures), labels)
+
+    @classmethod
+    def empty(cls):
+        """A cube over no transactions."""
+        cells = pd.DataFrame({name: np.zeros(0, dtype=np.int64) for name in CELL_DIMENSIONS + MEASURES})
+        return cls(cells, {dim: pd.Index([], dtype=object, name=dim) for dim in CATEGORICAL_DIMENSIONS})
+
+    def _combine(self, other, sign):
+        labels = {dim: self.labels[dim].union(other.labels[dim]) for dim in CATEGORICAL_DIMENSIONS}
+        parts = []
+        for cube, factor in ((self, 1), (other, sign)):
+            part = cube.cells.copy()
+            for dim in CATEGORICAL_DIMENSIONS:
+                part[dim] = labels[dim].get_indexer(cube.labels[dim])[part[dim].to_numpy()]
+            part[MEASURES] *= factor
+            parts.append(part)
+        cells = pd.concat(parts, ignore_index=True)
+        codes = {dim: cells[dim].to_numpy() for dim in CELL_DIMENSIONS}
+        cells = _collapse(codes, {name: cells[name].to_numpy().astype(np.float64) for name in MEASURES})
+        # Cells whose transactions were all subtracted away are dropped
+        return SalesCube(cells[cells['Orders'] != 0].reset_index(drop=True), labels)
+
+    def merge(self, other):
+        return self._combine(other, 1)
+
+    def subtract(self, other):
+        return self._combine(other, -1)
+
+    def _codes(self, dim):
+        # Integer codes of dim for every cell, in the order labels are sorted
+        if dim == 'Quarter':
+            return (self.cells['Month'].to_numpy() - 1) // 3 + 1
+        return self.cells[dim].to_numpy()
+
+    def _decode(self, dim, codes):
+        if dim in self.labels:
+            return self.labels[dim].take(codes)
+        if dim == 'Day_of_Week':
+            return pd.Index(np.array(DAY_ORDER, dtype=object)[codes], name=dim)
+        return pd.Index(codes, name=dim)
+
+    def _mask(self, where):
+        # A plain slice when nothing is filtered, so indexing by it is free
+        if not where:
+            return slice(None)
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, values in (where or {}).items():
+            if dim not in CUBE_DIMENSIONS:
+                raise KeyError(f"unknown cube dimension {dim!r}")
+            values = [values] if np.isscalar(values) else list(values)
+            if dim in self.labels:
+                values = self.labels[dim].get_indexer(values)
+            elif dim == 'Day_of_Week':
+                values = [DAY_ORDER.index(value) for value in values if value in DAY_ORDER]
+            mask &= np.isin(self._codes(dim), values)
+        return mask
+
+    def query(self, by, where=None):
+        """Measures grouped by the dimensions in by, over the cells matching where.
+
+        where maps dimensions to a value or a list of accepted values, e.g.
+        {'Year': 2024, 'Region': ['Jakarta', 'Bandung']}. Returns a frame
+        indexed by the by dimensions in label order, with the money measures
+        in currency units; groups without transactions are left out.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        for dim in by:
+            if dim not in CUBE_DIMENSIONS:
+                raise KeyError(f"unknown cube dimension {dim!r}")
+        mask = self._mask(where)
+        key, spans = _combine_keys([self._codes(dim)[mask] for dim in by])
+        groups = int(np.prod([size for _, size in spans]))
+        if groups <= len(key) + 65536:
+            # Few possible groups: count straight into a dense array
+            group_ids, keys = key, np.arange(groups)
+        else:
+            group_ids, keys = pd.factorize(key, sort=True)
+
+        sums = {name: np.bincount(group_ids, weights=self.cells[name].to_numpy()[mask],
+                                  minlength=len(keys)).astype(np.int64) for name in MEASURES}
+        present = np.flatnonzero(sums['Orders'])
+        index = [self._decode(dim, codes) for dim, codes in zip(by, _split_keys(keys[present], spans))]
+        index = index[0] if len(index) == 1 else pd.MultiIndex.from_arrays(index, names=by)
+        return pd.DataFrame({name: values[present] / 100 if name in MONEY_MEASURES else values[present]
+                             for name, values in sums.items()}, index=index)
+
+    def totals(self, where=None):
+        """Every measure summed over the cells matching where, as a dict."""
+        mask = self._mask(where)
+        totals = {}
+        for name in MEASURES:
+            total = int(self.cells[name].to_numpy()[mask].sum())
+            totals[name] = total / 100 if name in MONEY_MEASURES else total
+        return totals
+
+    def to_frame(self):
+        """The cells with readable labels, one row per dimension combination."""
+        frame = pd.DataFrame({dim: np.asarray(self._decode(dim, self._codes(dim)))
+                              for dim in CUBE_DIMENSIONS})
+        for name in MEASURES:
+            values = self.cells[name].to_numpy()
+            frame[name] = values / 100 if name in MONEY_MEASURES else values
+        return frame
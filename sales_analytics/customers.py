@@ -0,0 +1,200 @@
+import pandas as pd
+import numpy as np
+from .calendar_dim import calendar_for
+from .schema import money_cents
+
+# Customer-level analytics. CustomerIndex sorts the transactions by customer
+# and date once and keeps offset arrays, so every customer's history is a
+# contiguous slice; RFM scores, acquisition cohorts and inter-purchase
+# intervals are then computed with array operations over those slices, never
+# with a Python loop per customer.
+
+# Columns a frame needs for CustomerIndex.from_frame
+CUSTOMER_COLUMNS = ['Date', 'Customer_ID', 'Final_Price']
+
+DEFAULT_RFM_BINS = 5
+# RFM_Score writes each score as one digit
+MAX_RFM_BINS = 9
+
+# RFM segments by recency/frequency score (1-5), checked in order; customers
+# matching none are 'Need Attention'
+RFM_SEGMENTS = [
+    ('Champions', 4, 5, 4, 5),
+    ('Loyal Customers', 3, 5, 3, 5),
+    ('Recent Customers', 4, 5, 1, 2),
+    ('At Risk', 1, 2, 3, 5),
+    ('Hibernating', 1, 2, 1, 2)
+]
+
+
+class CustomerIndex:
+    """Transactions sorted by (customer, date) with per-customer offsets.
+
+    ids are the sorted customer IDs; the transactions of ids[i] are rows
+    offsets[i]:offsets[i + 1] of days (days since 1970-01-01) and cents
+    (Final_Price in exact cents), in date order.
+    """
+
+    def __init__(self, ids, offsets, days, cents):
+        self.ids = ids
+        self.offsets = offsets
+        self.days = days
+        self.cents = cents
+
+    @classmethod
+    def from_frame(cls, df):
+        customers = df['Customer_ID'].to_numpy()
+        labels = None
+        if not np.issubdtype(customers.dtype, np.integer):
+            customers, labels = pd.factorize(customers, sort=True)
+        customers = customers.astype(np.int64)
+        days = df['Date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        if not len(days):
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(empty, np.zeros(1, dtype=np.int64), empty, empty)
+
+        # One int64 sort key (customer major, day minor) sorts faster than lexsort
+        first_day = int(days.min())
+        span = int(days.max()) - first_day + 1
+        order = np.argsort((customers - int(customers.min())) * span + (days - first_day), kind='stable')
+        customers = customers[order]
+
+        starts = np.flatnonzero(np.concatenate([[True], customers[1:] != customers[:-1]]))
+        offsets = np.append(starts, len(customers)).astype(np.int64)
+        ids = customers[starts] if labels is None else np.asarray(labels)[customers[starts]]
+        return cls(ids, offsets, days[order], money_cents(df['Final_Price'])[order])
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def customer_codes(self):
+        """Position in ids of every sorted transaction."""
+        return np.repeat(np.arange(len(self.ids)), np.diff(self.offsets))
+
+    def history(self, customer_id):
+        """Dates and amounts of one customer's transactions."""
+        i = np.searchsorted(self.ids, customer_id)
+        if i == len(self.ids) or self.ids[i] != customer_id:
+            raise KeyError(customer_id)
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return pd.DataFrame({'Date': self.days[rows].astype('datetime64[D]'),
+                             'Final_Price': self.cents[rows] / 100})
+
+    # RFM
+
+    def rfm(self, as_of=None, bins=DEFAULT_RFM_BINS):
+        """Recency, frequency and monetary value per customer, with 1-bins scores.
+
+        Recency is counted in days up to as_of, by default the day after the
+        last transaction. Scores are percentile ranks cut into equal bins
+        (tied values share a score); a higher score is better on every axis.
+        """
+        starts, ends = self.offsets[:-1], self.offsets[1:]
+        if as_of is None:
+            as_of = int(self.days.max()) + 1 if len(self.days) else 0
+        else:
+            as_of = int(np.datetime64(pd.Timestamp(as_of).date(), 'D').astype(np.int64))
+        recency = as_of - self.days[ends - 1]
+        frequency = ends - starts
+        monetary = np.add.reduceat(self.cents, starts) if len(starts) else np.zeros(0, dtype=np.int64)
+
+        table = pd.DataFrame({
+            'Recency_Days': recency,
+            'Frequency': frequency,
+            'Monetary': monetary / 100
+        }, index=pd.Index(self.ids, name='Customer_ID'))
+        table['R_Score'] = _score(-recency, bins)
+        table['F_Score'] = _score(frequency, bins)
+        table['M_Score'] = _score(monetary, bins)
+        table['RFM_Score'] = (table['R_Score'].astype(np.int16) * 100 + table['F_Score'].astype(np.int16) * 10
+                              + table['M_Score'].astype(np.int16))
+        table['Segment'] = _rfm_segments(table['R_Score'].to_numpy(), table['F_Score'].to_numpy(), bins)
+        return table
+
+    # Cohorts
+
+    def cohort_counts(self):
+        """Active customers per acquisition month (rows) and months since
+        acquisition (columns)."""
+        months = calendar_for(self.days).codes(self.days, ['month_index'])['month_index']
+        if not len(months):
+            return pd.DataFrame(index=pd.PeriodIndex([], freq='M', name='Cohort'),
+                                columns=pd.RangeIndex(0, name='Months_Since_First'), dtype=np.float64)
+        codes = self.customer_codes
+        cohort = months[self.offsets[:-1]]
+        period = months - cohort[codes]
+
+        # Rows are sorted by customer then date, so each (customer, period)
+        # pair is one run; count each run once
+        first = np.concatenate([[True], (codes[1:] != codes[:-1]) | (period[1:] != period[:-1])])
+        first_cohort = int(cohort.min())
+        cohorts = int(cohort.max()) - first_cohort + 1
+        periods = int(period.max()) + 1
+        counts = np.bincount((cohort[codes[first]] - first_cohort) * periods + period[first],
+                             minlength=cohorts * periods).reshape(cohorts, periods)
+
+        labels = pd.PeriodIndex(np.arange(first_cohort, first_cohort + cohorts).astype('datetime64[M]'),
+                                freq='M', name='Cohort')
+        table = pd.DataFrame(counts, index=labels, columns=pd.RangeIndex(periods, name='Months_Since_First'))
+        # Periods that have not happened yet for a cohort are left empty, not 0
+        elapsed = int(months.max()) - np.arange(first_cohort, first_cohort + cohorts)
+        return table.where(np.arange(periods)[None, :] <= elapsed[:, None])
+
+    def retention(self):
+        """Share of each cohort active N months after acquisition (month 0 = 1.0)."""
+        counts = self.cohort_counts()
+        if counts.empty:
+            return counts
+        return counts.div(counts[0], axis=0)
+
+    # Inter-purchase intervals
+
+    def intervals(self):
+        """Days between consecutive transactions of the same customer."""
+        gaps = np.diff(self.days)
+        same_customer = np.ones(len(gaps), dtype=bool)
+        same_customer[self.offsets[1:-1] - 1] = False
+        return gaps[same_customer]
+
+    def interval_summary(self, percentiles=(0.25, 0.5, 0.75, 0.9, 0.99)):
+        """Count, mean and percentiles of the inter-purchase intervals, in days."""
+        gaps = self.intervals()
+        summary = {'count': len(gaps), 'mean': gaps.mean() if len(gaps) else np.nan}
+        for p in percentiles:
+            summary[f'p{p * 100:g}'] = np.percentile(gaps, p * 100) if len(gaps) else np.nan
+        summary['max'] = gaps.max() if len(gaps) else np.nan
+        return pd.Series(summary, name='Interval_Days')
+
+    def interval_histogram(self, bin_days=7, max_days=None):
+        """Number of intervals per bin of bin_days; the last bin also collects
+        everything past max_days."""
+        gaps = self.intervals()
+        max_days = max_days if max_days is not None else (int(gaps.max()) + 1 if len(gaps) else bin_days)
+        bins = -(-max_days // bin_days)
+        counts = np.bincount(np.minimum(gaps // bin_days, bins - 1), minlength=bins)
+        edges = np.arange(bins) * bin_days
+        labels = [f'{start}-{start + bin_days - 1}' for start in edges[:-1]] + [f'{edges[-1]}+']
+        return pd.Series(counts, index=pd.Index(labels, name='Interval_Days'), name='Intervals')
+
+
+def _score(values, bins):
+    # Percentile rank cut into bins: 1 (lowest) .. bins (highest)
+    if not len(values):
+        return np.zeros(0, dtype=np.int8)
+    ranks = pd.Series(values).rank(method='average', pct=True).to_numpy()
+    return np.clip(np.ceil(ranks * bins), 1, bins).astype(np.int8)
+
+
+def _rfm_segments(r_scores, f_scores, bins):
+    # Segment rules are written for 5 bins; rescale other bin counts onto them
+    r = np.ceil(r_scores * 5 / bins)
+    f = np.ceil(f_scores * 5 / bins)
+    conditions = [(r >= r_low) & (r <= r_high) & (f >= f_low) & (f <= f_high)
+                  for _, r_low, r_high, f_low, f_high in RFM_SEGMENTS]
+    return np.select(conditions, [name for name, *_ in RFM_SEGMENTS], default='Need Attention')
+
+
+def build_customer_index(df):
+    """Sort df's transactions by customer and date into a CustomerIndex."""
+    return CustomerIndex.from_frame(df)
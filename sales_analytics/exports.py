@@ -0,0 +1,178 @@
+import os
+import pandas as pd
+from .instrument import stage
+from .report import SUMMARY_SECTIONS
+
+# Bulk export of every analysis table in one go: the summary tables, the
+# per-customer metrics kept with the aggregates and, given a CustomerIndex,
+# the RFM, cohort and purchase interval tables. Each target format is
+# written by a streaming writer that takes the table DEFAULT_CHUNK_ROWS rows
+# at a time (a write-only workbook, one Parquet row group per chunk, a
+# compressed CSV appended chunk by chunk), so a table with millions of
+# customers is never converted, or held by the writer, all at once.
+
+EXPORT_FORMATS = ('xlsx', 'parquet', 'csv')
+# Compression of the csv format; None writes plain CSV
+CSV_COMPRESSIONS = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', None: ''}
+DEFAULT_CSV_COMPRESSION = 'gzip'
+DEFAULT_CHUNK_ROWS = 100_000
+WORKBOOK_FILE = 'sales_analysis.xlsx'
+
+# Rows a worksheet holds below its header; longer tables continue on
+# further sheets
+EXCEL_MAX_ROWS = 1_048_575
+EXCEL_MAX_SHEET_NAME = 31
+
+
+def _customer_metrics(agg):
+    # Orders per customer and the segment most of them were placed under
+    state = agg.customers
+    table = pd.DataFrame({'Orders': state.orders}, index=pd.Index(state.ids, name='Customer_ID'))
+    for dim, (labels, matrix) in state.label_orders.items():
+        if len(labels) and len(state.ids):
+            table[dim] = pd.Categorical.from_codes(matrix.argmax(axis=1), categories=labels)
+    return table
+
+
+def analysis_tables(agg, customers=None):
+    """Every exportable table, keyed by name: the summary tables, the
+    per-customer metrics of the aggregates and, if customers (a
+    CustomerIndex) is given, its RFM, cohort retention and interval tables."""
+    tables = {}
+    for name, section in SUMMARY_SECTIONS.items():
+        with stage(f'export.tables.{name}') as build:
+            tables[name] = section(agg)
+            build.set(rows_out=len(tables[name]))
+    with stage('export.tables.customer_metrics') as build:
+        tables['customer_metrics'] = _customer_metrics(agg)
+        build.set(rows_out=len(tables['customer_metrics']))
+    if customers is not None:
+        with stage('export.tables.customer_rfm', rows_in=len(customers)):
+            tables['customer_rfm'] = customers.rfm()
+        with stage('export.tables.cohort_retention'):
+            tables['cohort_retention'] = customers.retention()
+        with stage('export.tables.purchase_intervals'):
+            tables['purchase_intervals'] = customers.interval_histogram()
+    return tables
+
+
+def _flat(table):
+    # A table as a frame whose labels are ordinary string-named columns:
+    # a labelled index becomes the first column(s), periods become text
+    frame = table.to_frame() if isinstance(table, pd.Series) else table
+    if not isinstance(frame.index, pd.RangeIndex):
+        frame = frame.reset_index()
+    frame = frame.rename(columns=str)
+    periods = [col for col in frame.columns if isinstance(frame[col].dtype, pd.PeriodDtype)]
+    if periods:
+        frame = frame.astype({col: str for col in periods})
+    return frame
+
+
+def _chunks(frame, chunk_rows):
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def _sheet_names(name, rows):
+    # One name per EXCEL_MAX_ROWS rows, numbered from the second sheet on
+    sheets = max(1, -(-rows // EXCEL_MAX_ROWS))
+    names = [name[:EXCEL_MAX_SHEET_NAME]]
+    for number in range(2, sheets + 1):
+        suffix = f'_{number}'
+        names.append(name[:EXCEL_MAX_SHEET_NAME - len(suffix)] + suffix)
+    return names
+
+
+def _excel_rows(chunk):
+    # Plain Python values; missing values become empty cells
+    values = chunk.astype(object).where(chunk.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+def write_workbook(tables, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write every table to its own sheet of one workbook at path.
+
+    The workbook is opened in write-only mode, which streams rows to disk
+    instead of building the cell tree in memory; a table longer than a sheet
+    continues on sheets named <table>_2, <table>_3, ...
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    with stage('export.xlsx', tables=len(tables)) as export:
+        for name, table in tables.items():
+            frame = _flat(table)
+            with stage(f'export.xlsx.{name}', rows_in=len(frame)):
+                sheets = iter(_sheet_names(name, len(frame)))
+                sheet, rows = None, EXCEL_MAX_ROWS
+                for chunk in _chunks(frame, chunk_rows):
+                    for row in _excel_rows(chunk):
+                        if rows == EXCEL_MAX_ROWS:
+                            sheet, rows = workbook.create_sheet(next(sheets)), 0
+                            sheet.append(list(frame.columns))
+                        sheet.append(row)
+                        rows += 1
+                if sheet is None:
+                    workbook.create_sheet(next(sheets)).append(list(frame.columns))
+        workbook.save(path)
+        export.set(bytes_written=os.path.getsize(path))
+    return path
+
+
+def write_parquet_table(table, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write one table to a Parquet file, one row group per chunk_rows rows."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # The schema comes from the first chunk; every later chunk is cast to it
+    writer = None
+    try:
+        for chunk in _chunks(_flat(table), chunk_rows):
+            arrow_chunk = pa.Table.from_pandas(chunk, schema=writer.schema if writer else None,
+                                               preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, arrow_chunk.schema)
+            writer.write_table(arrow_chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def write_csv_table(table, path, compression=DEFAULT_CSV_COMPRESSION, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write one table to a CSV file, compressed unless compression is None,
+    formatting chunk_rows rows at a time."""
+    _flat(table).to_csv(path, index=False, compression=compression, chunksize=chunk_rows)
+    return path
+
+
+def export_all(agg, output_dir='.', formats=EXPORT_FORMATS, customers=None,
+               compression=DEFAULT_CSV_COMPRESSION, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write every table of analysis_tables(agg, customers) to output_dir in
+    each of formats: one workbook (xlsx) and one file per table for parquet
+    and csv. Returns the paths written."""
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"unknown export format(s) {unknown}; use {', '.join(EXPORT_FORMATS)}")
+    os.makedirs(output_dir, exist_ok=True)
+    tables = analysis_tables(agg, customers)
+
+    paths = []
+    for fmt in formats:
+        if fmt == 'xlsx':
+            paths.append(write_workbook(tables, os.path.join(output_dir, WORKBOOK_FILE), chunk_rows))
+            continue
+        for name, table in tables.items():
+            if fmt == 'parquet':
+                path = os.path.join(output_dir, f'{name}.parquet')
+            else:
+                path = os.path.join(output_dir, f'{name}.csv{CSV_COMPRESSIONS[compression]}')
+            with stage(f'export.{fmt}.{name}', rows_in=len(table)) as export:
+                if fmt == 'parquet':
+                    write_parquet_table(table, path, chunk_rows)
+                else:
+                    write_csv_table(table, path, compression, chunk_rows)
+                export.set(bytes_written=os.path.getsize(path))
+            paths.append(path)
+    return paths
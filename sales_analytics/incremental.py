@@ -0,0 +1,197 @@
+import pandas as pd
+import numpy as np
+import os
+import pickle
+from .aggregation import DISTINCT_DIMENSIONS, StreamingAggregator, aggregate_sales
+from .storage import DEFAULT_LOAD_CHUNK_SIZE, iter_sales_data, load_sales_data
+
+# Incremental refresh: the aggregates of everything folded so far are kept in
+# a local state file together with per-day partial aggregates for the most
+# recent days. A refresh reads only those recent days plus anything newer than
+# the Date watermark, folds new days in and re-aggregates any retained day
+# whose rows changed (new Order_IDs or a different row count). Older days are
+# only counted: when the source holds a different number of rows before the
+# retained window than the state folded (late or deleted rows), the state is
+# rebuilt. A correction older than the window that keeps the row count is not
+# seen; --rebuild-state handles those.
+
+DEFAULT_STATE_PATH = 'sales_state.pkl'
+
+# Days kept as separate partials; late or deleted rows older than this
+# trigger a full rebuild
+DEFAULT_RETAIN_DAYS = 35
+
+STATE_VERSION = 2
+
+# Columns the aggregates need, plus Order_ID for the late-row check
+INCREMENTAL_COLUMNS = ['Order_ID', 'Date', 'Customer_ID', 'Customer_Segment', 'Region', 'Category',
+                       'Product', 'Quantity', 'Total_Sales', 'Discount_Amount', 'Final_Price', 'Payment_Method']
+
+
+class IncrementalState:
+    """Aggregates of all folded transactions plus per-day partials for the
+    retained window, the Date watermark and the highest Order_ID seen."""
+
+    def __init__(self, source, total, days, watermark, max_order_id,
+                 retain_days=DEFAULT_RETAIN_DAYS, distinct_dimensions=DISTINCT_DIMENSIONS):
+        self.version = STATE_VERSION
+        self.source = source
+        self.total = total
+        self.days = days
+        self.watermark = watermark
+        self.max_order_id = max_order_id
+        self.retain_days = retain_days
+        self.distinct_dimensions = list(distinct_dimensions)
+
+    @property
+    def window_start(self):
+        return self.watermark - pd.Timedelta(days=self.retain_days - 1)
+
+    def save(self, path=DEFAULT_STATE_PATH):
+        # Write then rename, so an interrupted refresh never leaves a torn file
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path=DEFAULT_STATE_PATH):
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if getattr(state, 'version', None) != STATE_VERSION:
+            return None
+        return state
+
+
+def _split_days(df):
+    """Yield (day, rows of that day) for every day present in df."""
+    days = df['Date'].to_numpy().astype('datetime64[D]')
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.searchsorted(inverse[order], np.arange(len(unique_days) + 1))
+    for i, day in enumerate(unique_days):
+        yield pd.Timestamp(day), df.iloc[order[bounds[i]:bounds[i + 1]]]
+
+
+def _day_partials(df, distinct_dimensions):
+    return {day: aggregate_sales(rows, distinct_dimensions) for day, rows in _split_days(df)}
+
+
+def build_state(source, retain_days=DEFAULT_RETAIN_DAYS, distinct_dimensions=DISTINCT_DIMENSIONS,
+                chunk_size=DEFAULT_LOAD_CHUNK_SIZE):
+    """Aggregate the whole source from scratch, streaming it chunk by chunk."""
+    aggregator = StreamingAggregator(distinct_dimensions)
+    max_order_id = None
+    for chunk in iter_sales_data(source, columns=INCREMENTAL_COLUMNS, chunk_size=chunk_size):
+        aggregator.add(chunk)
+        chunk_max = int(chunk['Order_ID'].max())
+        max_order_id = chunk_max if max_order_id is None else max(max_order_id, chunk_max)
+    if not aggregator.rows:
+        raise ValueError(f"{source} has no transactions to aggregate")
+
+    total = aggregator.result()
+    watermark = total.end_date.normalize()
+    state = IncrementalState(os.path.abspath(source), total, {}, watermark, max_order_id,
+                             retain_days, distinct_dimensions)
+    window = load_sales_data(source, columns=INCREMENTAL_COLUMNS, start=state.window_start.strftime('%Y-%m-%d'))
+    state.days = _day_partials(window, distinct_dimensions)
+    return state
+
+
+def refresh_state(state, source, refresh_days=()):
+    """Fold new transactions into state and re-aggregate changed retained days.
+
+    refresh_days forces re-aggregation of the given days (e.g. after an
+    in-place correction that kept the row count). Returns a summary dict, or
+    None when a day outside the retained window needs refreshing and the
+    caller should rebuild.
+    """
+    refresh_days = {pd.Timestamp(day).normalize() for day in refresh_days}
+    if any(day < state.window_start for day in refresh_days):
+        return None
+
+    window = load_sales_data(source, columns=INCREMENTAL_COLUMNS,
+                             start=state.window_start.strftime('%Y-%m-%d'))
+    summary = {'new_days': [], 'refreshed_days': [], 'rows_folded': 0}
+
+    seen = set()
+    max_order_id = state.max_order_id
+    for day, rows in _split_days(window):
+        seen.add(day)
+        day_max_order = int(rows['Order_ID'].max())
+        max_order_id = max(max_order_id, day_max_order)
+        old = state.days.get(day)
+        if day > state.watermark:
+            summary['new_days'].append(day)
+        elif (old is not None and day not in refresh_days and day_max_order <= state.max_order_id
+              and old.total_orders == len(rows)):
+            continue
+        else:
+            summary['refreshed_days'].append(day)
+
+        partial = aggregate_sales(rows, state.distinct_dimensions)
+        total = state.total.subtract(old) if old is not None else state.total
+        state.total = total.merge(partial)
+        state.days[day] = partial
+        summary['rows_folded'] += len(rows)
+
+    # Retained days whose rows have all disappeared from the source
+    for day in sorted(set(state.days) - seen):
+        if day >= state.window_start:
+            state.total = state.total.subtract(state.days.pop(day))
+            summary['refreshed_days'].append(day)
+
+    state.max_order_id = max_order_id
+    if state.days:
+        state.watermark = max(state.watermark, max(state.days))
+    state.total.end_date = max(state.total.end_date, state.watermark)
+    for day in [day for day in state.days if day < state.window_start]:
+        del state.days[day]
+    return summary
+
+
+def _rows_changed_before_window(state, source, chunk_size):
+    # Rows the state folded before its window (the days it no longer keeps)
+    # against the rows the source holds there now; only Date is read
+    folded = int(state.total.total_orders) - sum(int(day.total_orders) for day in state.days.values())
+    end = (state.window_start - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    rows = sum(len(chunk) for chunk in iter_sales_data(source, columns=['Date'], end=end, chunk_size=chunk_size))
+    return rows != folded
+
+
+def refresh_aggregates(source, state_path=DEFAULT_STATE_PATH, refresh_days=(), rebuild=False,
+                       retain_days=DEFAULT_RETAIN_DAYS, chunk_size=DEFAULT_LOAD_CHUNK_SIZE):
+    """Bring the state file at state_path up to date with source.
+
+    Returns the up-to-date aggregates and a summary of what was done.
+    """
+    state = None if rebuild else IncrementalState.load(state_path)
+    if state is not None and (state.source != os.path.abspath(source) or state.retain_days != retain_days):
+        state = None
+
+    summary = None
+    reason = None
+    if state is not None and _rows_changed_before_window(state, source, chunk_size):
+        reason = f"rows before {state.window_start.strftime('%Y-%m-%d')} changed"
+        state = None
+    if state is not None:
+        summary = refresh_state(state, source, refresh_days)
+        if summary is None:
+            reason = 'a day to refresh is older than the retained window'
+    if summary is None:
+        state = build_state(source, retain_days, chunk_size=chunk_size)
+        summary = {'rebuilt': True, 'rows_folded': state.total.total_orders, 'reason': reason}
+
+    state.save(state_path)
+    return state.total, summary
+
+
+def format_refresh_summary(summary):
+    if summary.get('rebuilt'):
+        reason = f", {summary['reason']}" if summary.get('reason') else ''
+        return f"Incremental state rebuilt from scratch ({summary['rows_folded']:,} rows{reason})"
+    days = ', '.join(day.strftime('%Y-%m-%d') for day in summary['refreshed_days']) or 'none'
+    return (f"Incremental refresh: {summary['rows_folded']:,} rows folded, "
+            f"{len(summary['new_days'])} new days, re-aggregated days: {days}")
@@ -0,0 +1,310 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import numpy as np
+import pandas as pd
+from .binary_store import is_binary_store
+from .instrument import stage
+from .schema import (CATEGORICAL_COLUMNS, ID_PREFIXES, INTEGER_COLUMNS, MONEY_COLUMNS, apply_schema,
+                     concat_frames, memory_usage, parse_id_codes)
+from .storage import _date_bounds, _filter_dates, _normalize_categories, _parse_dates
+from .validation import SeenIds
+
+# Ingestion of many transaction files as one dataset: a glob such as
+# 'orders/*/2024-*.csv' or a directory of CSV and Parquet files (e.g. one per
+# region per day). Files are read by a thread pool in path order, each file's
+# columns are unioned into one schema and converted to the compact schema
+# (so an integer Order_ID in one file and 'ORD123' in another end up alike),
+# and an Order_ID delivered by several files is kept once, from the first
+# file in path order.
+#
+# What is known about each file (size, modification time, rows, columns and
+# date range) is cached in a manifest next to the files, so only new or
+# changed files are scanned again, and files outside a --start/--end range
+# are skipped without being opened.
+
+FILE_FORMATS = {'.csv': 'csv', '.parquet': 'parquet'}
+MANIFEST_FILE = '.sales_ingest.json'
+MANIFEST_VERSION = 1
+
+# Files read concurrently; parsing releases the GIL for most of its work
+DEFAULT_READ_THREADS = 4
+
+# Columns with a type in the compact schema; a file lacking one that is
+# needed cannot be typed, unless a validator quarantines its rows instead
+SCHEMA_COLUMNS = (['Order_ID', 'Date', 'Customer_ID'] + CATEGORICAL_COLUMNS + list(INTEGER_COLUMNS)
+                  + MONEY_COLUMNS)
+
+
+def _has_magic(path):
+    return any(char in path for char in '*?[')
+
+
+def _file_format(path):
+    return FILE_FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def is_file_collection(source):
+    """Whether source is a glob or a directory of flat CSV/Parquet files,
+    as opposed to a single file, a partitioned dataset or a binary store."""
+    if _has_magic(source):
+        return True
+    if not os.path.isdir(source) or is_binary_store(source):
+        return False
+    return any(entry.is_file() and _file_format(entry.name) for entry in os.scandir(source))
+
+
+def source_files(source):
+    """The CSV and Parquet files of a glob or directory, sorted by path."""
+    if os.path.isdir(source):
+        paths = [entry.path for entry in os.scandir(source) if entry.is_file()]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(path for path in paths if _file_format(path))
+
+
+def _manifest_dir(source):
+    # The directory itself, or the part of the glob before its first wildcard
+    base = source
+    while _has_magic(base):
+        base = os.path.dirname(base)
+    return base or '.'
+
+
+def _scan(path):
+    # Rows, columns and date range of one file
+    stat = os.stat(path)
+    if _file_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        columns = parquet.schema_arrow.names
+        rows = parquet.metadata.num_rows
+        dates = parquet.read(columns=['Date']).column('Date').to_pandas() if 'Date' in columns else None
+    elif stat.st_size == 0:
+        # A feed may deliver an empty file for a day without orders
+        columns, rows, dates = [], 0, None
+    else:
+        columns = list(pd.read_csv(path, nrows=0).columns)
+        dates = pd.read_csv(path, usecols=['Date'])['Date'] if 'Date' in columns else None
+        if dates is not None:
+            rows = len(dates)
+        else:
+            with open(path, 'rb') as f:
+                rows = sum(1 for _ in f) - 1
+    first = last = None
+    if dates is not None:
+        dates = pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce') \
+            if not pd.api.types.is_datetime64_any_dtype(dates.dtype) else dates
+        if dates.notna().any():
+            first, last = dates.min().strftime('%Y-%m-%d'), dates.max().strftime('%Y-%m-%d')
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'rows': rows, 'columns': columns,
+            'first_date': first, 'last_date': last}
+
+
+def _in_order(executor, func, items, ahead):
+    # executor.map, but with at most `ahead` results waiting to be consumed
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class FileCollection:
+    """The files of a glob or directory, read as one transaction dataset.
+
+    On creation the file list is resolved and every file not in the
+    manifest, or changed since (size or modification time), is scanned;
+    the others are taken from the manifest. frames() and batches() then read
+    the files concurrently with read_threads threads.
+    """
+
+    def __init__(self, source, read_threads=DEFAULT_READ_THREADS, rescan=False):
+        self.source = source
+        self.read_threads = max(1, read_threads)
+        self.files = source_files(source)
+        if not self.files:
+            raise FileNotFoundError(f"no CSV or Parquet files match {source}")
+        self._base = _manifest_dir(source)
+        self.manifest_path = os.path.join(self._base, MANIFEST_FILE)
+        self._key = {path: os.path.relpath(path, self._base) for path in self.files}
+        self.entries, self.scanned = self._catalog(rescan)
+        self.stats = {'files_read': 0, 'files_skipped': 0, 'rows_read': 0, 'bytes_read': 0, 'duplicates': 0}
+
+    def _catalog(self, rescan):
+        cached = {}
+        if not rescan and os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                cached = manifest['files']
+        entries, stale = {}, []
+        for path in self.files:
+            entry = cached.get(self._key[path])
+            stat = os.stat(path)
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                entries[path] = entry
+            else:
+                stale.append(path)
+        if stale:
+            with stage('ingest.scan', files=len(stale)), ThreadPoolExecutor(self.read_threads) as executor:
+                entries.update(zip(stale, executor.map(_scan, stale)))
+        # Other globs may share the manifest; keep their files' entries
+        # unless the files are gone
+        files = {key: entry for key, entry in cached.items()
+                 if os.path.exists(os.path.join(self._base, key))}
+        if stale or len(files) != len(cached):
+            files.update((self._key[path], entries[path]) for path in self.files)
+            self._save(files)
+        return entries, len(stale)
+
+    def _save(self, files):
+        # Write then rename, so a reader never sees half a manifest; a
+        # read-only directory just goes without one
+        tmp_path = f'{self.manifest_path}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'files': files}, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            pass
+
+    @property
+    def columns(self):
+        """Union of the columns of all files, in order of first appearance."""
+        return list(dict.fromkeys(col for path in self.files for col in self.entries[path]['columns']))
+
+    @property
+    def rows(self):
+        return sum(entry['rows'] for entry in self.entries.values())
+
+    def missing_columns(self, columns=None, paths=None):
+        """{path: schema columns it lacks} for the files (of paths, default
+        all) lacking any of columns."""
+        columns = self.columns if columns is None else columns
+        missing = {}
+        for path in self.files if paths is None else paths:
+            if not self.entries[path]['rows']:
+                continue
+            lacking = [col for col in columns if col in SCHEMA_COLUMNS and col not in self.entries[path]['columns']]
+            if lacking:
+                missing[path] = lacking
+        return missing
+
+    def _selected(self, start, end):
+        # Non-empty files whose date range overlaps start..end
+        selected = []
+        for path in self.files:
+            entry = self.entries[path]
+            if not entry['rows']:
+                continue
+            if entry['first_date'] is not None and (
+                    (start is not None and pd.Timestamp(entry['last_date']) < start) or
+                    (end is not None and pd.Timestamp(entry['first_date']) > end)):
+                continue
+            selected.append(path)
+        return selected
+
+    def _read(self, path, needed):
+        # One file with exactly the needed columns, absent ones as missing values
+        present = [col for col in needed if col in self.entries[path]['columns']]
+        if _file_format(path) == 'parquet':
+            df = pd.read_parquet(path, columns=present)
+        else:
+            df = pd.read_csv(path, usecols=present)
+        raw_bytes = memory_usage(df)
+        for col in needed:
+            if col not in df.columns:
+                df[col] = np.nan
+        return df[needed], raw_bytes
+
+    def frames(self, columns=None, start=None, end=None, compact=True, exact_money=False, validator=None):
+        """Yield one frame per file, in path order, restricted like
+        load_sales_data's arguments. Rows whose Order_ID came in an earlier
+        file (or earlier in the same file) are dropped."""
+        start, end = _date_bounds(start, end)
+        wanted = self.columns if columns is None else list(columns)
+        needed = wanted + [col for col in ('Date', 'Order_ID') if col not in wanted and col in self.columns]
+        if 'Date' not in needed:
+            raise ValueError(f"no file of {self.source} has a Date column")
+        selected = self._selected(start, end)
+        # With every file out of range, one is still read so the (empty)
+        # result has the right columns and types
+        self.stats['files_skipped'] += len(self.files) - len(selected)
+        if not selected:
+            selected = [path for path in self.files if self.entries[path]['rows']][:1]
+            if not selected:
+                raise ValueError(f"{self.source} has no transactions")
+        if validator is None:
+            missing = self.missing_columns(needed, selected)
+            if missing:
+                path, lacking = next(iter(missing.items()))
+                raise ValueError(f"{len(missing)} of {len(selected)} files lack needed columns, e.g. {path} "
+                                 f"lacks {lacking}; validate to quarantine their rows instead")
+
+        def prepare(df):
+            df['Date'] = _parse_dates(df['Date'])
+            df = _filter_dates(df, start, end)
+            return apply_schema(df, exact_money) if compact else df
+
+        def read(path):
+            df, raw_bytes = self._read(path, needed)
+            # Validation is sequential, so a validator gets the raw rows
+            return path, (prepare(df) if validator is None else df), raw_bytes
+
+        seen = SeenIds()
+        with ThreadPoolExecutor(self.read_threads) as executor:
+            for path, df, raw_bytes in _in_order(executor, read, selected, 2 * self.read_threads):
+                with stage('ingest.file', rows_in=len(df)) as ingest:
+                    if validator is not None:
+                        df = prepare(validator.check(df))
+                    if 'Order_ID' in df.columns and len(df):
+                        codes = parse_id_codes(df['Order_ID'], ID_PREFIXES['Order_ID']).to_numpy(dtype=np.int64)
+                        duplicate = seen.add(codes)
+                        if duplicate.any():
+                            df = df[~duplicate]
+                            self.stats['duplicates'] += int(np.count_nonzero(duplicate))
+                    df = df[wanted + (['Date'] if 'Date' not in wanted else [])]
+                    self.stats['files_read'] += 1
+                    self.stats['rows_read'] += len(df)
+                    self.stats['bytes_read'] += raw_bytes
+                    ingest.set(rows_out=len(df), bytes_in=raw_bytes)
+                yield df
+
+    def batches(self, chunk_size, **kwargs):
+        """Yield the rows of frames(**kwargs) regrouped into frames of
+        chunk_size rows (the last one shorter), each with its own sorted
+        categories like iter_sales_data's chunks."""
+        pending, rows = [], 0
+        for df in self.frames(**kwargs):
+            while len(df):
+                part = df.iloc[:chunk_size - rows]
+                pending.append(part)
+                rows += len(part)
+                df = df.iloc[len(part):]
+                if rows == chunk_size:
+                    yield _normalize_categories(concat_frames(pending))
+                    pending, rows = [], 0
+        if pending:
+            yield _normalize_categories(concat_frames(pending))
+
+    def load(self, **kwargs):
+        """All rows of frames(**kwargs) as one frame."""
+        frames = list(self.frames(**kwargs))
+        # A file left empty (e.g. fully quarantined for a missing column)
+        # may type its categoricals differently, so it is not concatenated
+        rows = [df for df in frames if len(df)]
+        return concat_frames(rows or frames[:1])
+
+    def summary(self):
+        """One row per file: rows, date range and schema columns it lacks."""
+        missing = self.missing_columns()
+        return pd.DataFrame([{'File': path, 'Rows': self.entries[path]['rows'],
+                              'First_Date': self.entries[path]['first_date'],
+                              'Last_Date': self.entries[path]['last_date'],
+                              'Missing_Columns': ', '.join(missing.get(path, []))} for path in self.files])
@@ -0,0 +1,239 @@
+import itertools
+import json
+import os
+import sys
+import time
+import uuid
+
+# Stage instrumentation. Library functions wrap their steps in
+# `with stage(name) as s:` and report rows and bytes through s.set(...);
+# while a Recorder is enabled every stage becomes one JSON line with its wall
+# and CPU time, peak RSS, rows in/out and bytes written, optionally with a
+# cProfile dump and tracemalloc peak. Disabled, stage() returns one shared
+# no-op context manager, so instrumented code pays one function call per
+# stage.
+
+_recorder = None
+
+
+# Memory
+
+def _status_bytes(field):
+    # A VmRSS / VmHWM line of /proc/self/status in bytes; None without /proc
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if unknown."""
+    return _status_bytes('VmRSS')
+
+
+def reset_peak_rss():
+    """Restart the peak RSS high-water mark; False where that is not possible."""
+    # Linux resets VmHWM to the current RSS when 5 is written to clear_refs
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """Peak RSS in bytes since the last reset (or since the process started)."""
+    peak = _status_bytes('VmHWM')
+    if peak is None:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == 'darwin' else 1024
+    return peak
+
+
+# Stages
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, recorder, name, fields):
+        self.recorder = recorder
+        self.name = name
+        self.fields = fields
+        self.profile = None
+
+    def set(self, **fields):
+        """Add fields (rows_out, bytes_written, ...) to this stage's record."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        recorder = self.recorder
+        recorder._checkpoint()
+        self.seq = next(recorder._seq)
+        self.outer = recorder._stack[-1] if recorder._stack else None
+        self.parent = self.outer.name if self.outer else None
+        self.depth = len(recorder._stack)
+        self.rss_peak = 0
+        self.traced_peak = 0
+        recorder._stack.append(self)
+
+        # Only one profiler can run at a time: the enclosing stage's profile is
+        # paused while this one runs, so each dump excludes nested stages
+        if recorder.profile_dir:
+            import cProfile
+
+            if self.outer is not None:
+                self.outer.profile.disable()
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.started = time.time()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_seconds = time.perf_counter() - self.wall_start
+        cpu_seconds = time.process_time() - self.cpu_start
+        recorder = self.recorder
+        profile_path = None
+        if self.profile is not None:
+            self.profile.disable()
+            profile_path = os.path.join(recorder.profile_dir, f'{self.seq:04d}-{self.name}.prof')
+            self.profile.dump_stats(profile_path)
+            if self.outer is not None:
+                self.outer.profile.enable()
+        recorder._checkpoint()
+        recorder._stack.pop()
+
+        record = {
+            'run_id': recorder.run_id,
+            'seq': self.seq,
+            'stage': self.name,
+            'parent': self.parent,
+            'depth': self.depth,
+            'started': self.started,
+            'wall_seconds': wall_seconds,
+            'cpu_seconds': cpu_seconds,
+            'peak_rss_mb': self.rss_peak / 2**20
+        }
+        if recorder.trace_memory:
+            record['traced_peak_mb'] = self.traced_peak / 2**20
+        if profile_path:
+            record['profile'] = profile_path
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        record.update(self.fields)
+        recorder._write(record)
+        return False
+
+
+class Recorder:
+    """Collects stage records for one run and appends them to a JSON lines
+    file as they complete (records is kept in memory as well)."""
+
+    def __init__(self, path=None, profile_dir=None, trace_memory=False):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.records = []
+        self._seq = itertools.count()
+        self._stack = []
+        self._file = open(path, 'a', buffering=1) if path else None
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        if trace_memory:
+            import tracemalloc
+
+            tracemalloc.start()
+
+    def _checkpoint(self):
+        # Fold the high-water marks since the last checkpoint into every open
+        # stage, then restart them, so nested stages each see their own peak
+        # and their parents still see the overall one
+        rss = peak_rss()
+        traced = 0
+        if self.trace_memory:
+            import tracemalloc
+
+            traced = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        for open_stage in self._stack:
+            open_stage.rss_peak = max(open_stage.rss_peak, rss)
+            open_stage.traced_peak = max(open_stage.traced_peak, traced)
+        reset_peak_rss()
+
+    def _write(self, record):
+        self.records.append(record)
+        if self._file:
+            self._file.write(json.dumps(record, default=str) + '\n')
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self.trace_memory:
+            import tracemalloc
+
+            tracemalloc.stop()
+
+
+def stage(name, **fields):
+    """Context manager timing one pipeline stage; fields (rows_in, ...) go
+    into its record. A no-op unless instrumentation is enabled."""
+    if _recorder is None:
+        return _NULL_STAGE
+    return _Stage(_recorder, name, fields)
+
+
+def record(name, **fields):
+    """Record a stage measured elsewhere, e.g. in a worker process; fields
+    should include its wall_seconds."""
+    if _recorder is not None:
+        _recorder._write({'run_id': _recorder.run_id, 'seq': next(_recorder._seq), 'stage': name,
+                          'parent': _recorder._stack[-1].name if _recorder._stack else None,
+                          'depth': len(_recorder._stack),
+                          'started': time.time() - fields.get('wall_seconds', 0), **fields})
+
+
+def enable(path=None, profile_dir=None, trace_memory=False):
+    """Start recording stages; returns the Recorder. path is a JSON lines
+    file records are appended to, profile_dir receives one cProfile dump per
+    stage (excluding its nested stages), trace_memory adds tracemalloc peaks."""
+    global _recorder
+    disable()
+    _recorder = Recorder(path, profile_dir, trace_memory)
+    return _recorder
+
+
+def disable():
+    """Stop recording; returns the Recorder that was active, if any."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.close()
+    return recorder
+
+
+def enabled():
+    return _recorder is not None
@@ -0,0 +1,119 @@
+import pandas as pd
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from .aggregation import CATEGORICAL_DIMENSIONS, DISTINCT_DIMENSIONS, aggregate_sales
+from .cube import MONEY_MEASURES
+from .instrument import stage
+from .schema import money_cents
+
+# Parallel aggregation: the columns the engine needs are copied once into
+# shared memory as plain arrays (day numbers, money in cents, units, customer
+# codes and categorical codes). Workers attach to those blocks by name, aggregate one
+# date range each and send back only their small partial aggregates, which
+# are merged in date order. All sums are integers, so the result is identical
+# to aggregate_sales on the whole frame.
+
+
+def _share(array, blocks):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    blocks.append(block)
+    return block.name, array.dtype.str, array.shape
+
+
+def _attach(spec, handles):
+    name, dtype, shape = spec
+    block = shared_memory.SharedMemory(name=name)
+    handles.append(block)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _aggregate_partition(specs, categories, order_spec, start, stop, distinct_dimensions):
+    handles = []
+    try:
+        arrays = {col: _attach(spec, handles) for col, spec in specs.items()}
+        rows = slice(start, stop)
+        if order_spec is not None:
+            rows = _attach(order_spec, handles)[start:stop]
+        df = pd.DataFrame({
+            'Date': arrays['Date'][rows].astype('datetime64[D]').astype('datetime64[ns]'),
+            'Quantity': arrays['Quantity'][rows],
+            'Customer_ID': arrays['Customer_ID'][rows]
+        })
+        for col in MONEY_MEASURES:
+            df[col] = arrays[col][rows] / 100
+        for col, labels in categories.items():
+            df[col] = pd.Categorical.from_codes(arrays[col][rows], labels)
+        return aggregate_sales(df, distinct_dimensions)
+    finally:
+        # Every view into the blocks must be gone before they can be closed
+        arrays = rows = df = None
+        for block in handles:
+            block.close()
+
+
+def _date_partitions(days, partitions):
+    """Row ranges [start, stop) of date-ordered rows, cut only at day boundaries."""
+    targets = np.linspace(0, len(days), partitions + 1)[1:-1].astype(np.int64)
+    cuts = np.searchsorted(days, days[targets], side='left') if len(targets) else targets
+    bounds = np.unique(np.concatenate([[0], cuts, [len(days)]]))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def aggregate_sales_parallel(df, workers=None, distinct_dimensions=DISTINCT_DIMENSIONS):
+    """aggregate_sales split over date ranges and a process pool.
+
+    workers defaults to the number of cores; with one worker this is just
+    aggregate_sales.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(df) < workers:
+        return aggregate_sales(df, distinct_dimensions)
+
+    days = df['Date'].to_numpy().astype('datetime64[D]').astype(np.int32)
+    order = None
+    if len(days) > 1 and (np.diff(days) < 0).any():
+        order = np.argsort(days, kind='stable')
+        days_sorted = days[order]
+    else:
+        days_sorted = days
+
+    customers = df['Customer_ID'].to_numpy()
+    if not np.issubdtype(customers.dtype, np.integer):
+        raise TypeError("parallel aggregation needs integer Customer_ID codes; "
+                        "load the data with the compact schema")
+
+    blocks = []
+    try:
+        specs = {
+            'Date': _share(days, blocks),
+            'Quantity': _share(df['Quantity'].to_numpy(), blocks),
+            'Customer_ID': _share(customers, blocks)
+        }
+        for col in MONEY_MEASURES:
+            specs[col] = _share(money_cents(df[col]), blocks)
+        categories = {}
+        for col in CATEGORICAL_DIMENSIONS:
+            column = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype('category')
+            specs[col] = _share(column.cat.codes.to_numpy(), blocks)
+            categories[col] = column.cat.categories
+        order_spec = _share(order, blocks) if order is not None else None
+
+        with stage('aggregate.workers', rows_in=len(df), workers=workers), \
+                ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_aggregate_partition, specs, categories, order_spec,
+                                       int(start), int(stop), distinct_dimensions)
+                       for start, stop in _date_partitions(days_sorted, workers)]
+            partials = [future.result() for future in futures]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    with stage('aggregate.merge', rows_in=len(partials)):
+        result = partials[0]
+        for partial in partials[1:]:
+            result = result.merge(partial)
+    return result
@@ -0,0 +1,56 @@
+import os
+import shutil
+
+# Content-addressed store for rendered charts. Kept apart from charts.py so the
+# CLI can set it up without importing matplotlib.
+
+# Rendered charts are kept here under the hash of everything that went into them
+DEFAULT_CACHE_DIR = '.chart_cache'
+DEFAULT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+
+class RenderCache:
+    """Content-addressed store of rendered charts, bounded to max_bytes.
+
+    Files are named by chart_key plus the extension of their format; a hit
+    is copied to the requested path and marked as recently used, and the
+    least recently used files are evicted once the directory grows past
+    max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key, path):
+        return os.path.join(self.cache_dir, key + os.path.splitext(path)[1])
+
+    def fetch(self, key, path):
+        """Copy the cached chart for key to path. Returns False on a miss."""
+        cached = self._path(key, path)
+        if not os.path.exists(cached):
+            return False
+        shutil.copyfile(cached, path)
+        os.utime(cached)
+        return True
+
+    def store(self, key, path):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Copy then rename, so a crash never leaves a truncated cache entry
+        tmp_path = f'{self._path(key, path)}.tmp'
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, self._path(key, path))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
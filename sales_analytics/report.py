@@ -0,0 +1,312 @@
+import os
+from .calendar_dim import DAY_ORDER, MONTH_NAMES
+from .instrument import stage
+
+# Executive summary and its CSV exports, plus the tables each chart draws,
+# built from a SalesAggregates. Nothing here touches matplotlib, so text-only
+# runs (and the server, which renders in worker processes) never pay for it.
+
+# File name -> (summary table, write the index)
+EXPORT_FILES = {
+    'monthly_sales_summary.csv': ('monthly_sales', False),
+    'product_performance.csv': ('product_performance', True),
+    'category_performance.csv': ('category_performance', True)
+}
+
+
+def _performance(table):
+    performance = table[['Final_Price', 'Quantity', 'Orders']].round(2)
+    performance.columns = ['Total_Revenue', 'Units_Sold', 'Orders']
+    return performance.sort_values('Total_Revenue', ascending=False)
+
+
+def _monthly_sales(agg):
+    monthly_sales = agg.cube.query(['Year', 'Month'])[['Final_Price']].reset_index()
+    monthly_sales.insert(2, 'Month_Name', [MONTH_NAMES[m - 1] for m in monthly_sales['Month']])
+    return monthly_sales
+
+
+def _day_sales(agg):
+    day_sales = agg.cube.query('Day_of_Week')[['Final_Price', 'Orders']].round(2)
+    day_sales.columns = ['sum', 'count']
+    # Days without orders in the range count as zero
+    return day_sales.reindex(DAY_ORDER, fill_value=0)
+
+
+def _segment_analysis(agg):
+    segment_analysis = agg.cube.query('Customer_Segment')[['Final_Price', 'Orders']].round(2)
+    segment_analysis.columns = ['Total_Revenue', 'Total_Orders']
+    segment_analysis['Unique_Customers'] = agg.table('Customer_Segment')['Customers']
+    segment_analysis['Avg_Order_Value'] = (segment_analysis['Total_Revenue'] / segment_analysis['Total_Orders']).round(2)
+    return segment_analysis
+
+
+# Summary table name -> function building it from a SalesAggregates. Every
+# section is a query on the rollup cube; only the distinct customer counts
+# come from the per-customer state.
+SUMMARY_SECTIONS = {
+    'monthly_sales': _monthly_sales,
+    'product_performance': lambda agg: _performance(agg.cube.query('Product')),
+    'category_performance': lambda agg: _performance(agg.cube.query('Category')),
+    'regional_sales': lambda agg: agg.cube.query('Region')['Final_Price'].sort_values(ascending=False),
+    'day_sales': _day_sales,
+    'segment_analysis': _segment_analysis,
+    'payment_analysis': lambda agg: agg.cube.query('Payment_Method')['Orders'].sort_values(ascending=False),
+    'yearly_sales': lambda agg: agg.cube.query('Year')['Final_Price']
+}
+
+
+def summary_tables(agg):
+    """The tables behind the executive summary, keyed by name."""
+    tables = {}
+    for name, section in SUMMARY_SECTIONS.items():
+        with stage(f'summary.{name}') as summary:
+            tables[name] = section(agg)
+            summary.set(rows_out=len(tables[name]))
+    return tables
+
+
+def summary_metrics(agg):
+    """The headline figures of the executive summary as plain Python values."""
+    total_orders = int(agg.total_orders)
+    return {
+        'total_revenue': round(float(agg.total_revenue), 2),
+        'total_orders': total_orders,
+        'total_units': int(agg.total_units),
+        'average_order_value': round(float(agg.total_revenue) / total_orders, 2) if total_orders else None,
+        'total_customers': int(agg.total_customers),
+        'repeat_customer_rate': round(float(agg.repeat_rate), 2),
+        'start_date': agg.start_date.strftime('%Y-%m-%d') if agg.start_date is not None else None,
+        'end_date': agg.end_date.strftime('%Y-%m-%d') if agg.end_date is not None else None
+    }
+
+
+def _top(table):
+    # First label of a ranked table, or n/a when the range had no orders
+    return table.index[0] if len(table) else 'n/a'
+
+
+def format_summary(agg, tables=None):
+    """The executive summary report as text."""
+    tables = tables if tables is not None else summary_tables(agg)
+    lines = []
+    out = lines.append
+
+    out("="*80)
+    out("SALES DATA ANALYSIS - EXECUTIVE SUMMARY")
+    out("="*80)
+
+    # 1. OVERALL STATISTICS
+    out("\n1. OVERALL PERFORMANCE")
+    out("-" * 80)
+    total_revenue = agg.total_revenue
+    total_orders = agg.total_orders
+    # A --start/--end range may hold no orders at all
+    avg_order_value = f"Rp {total_revenue / total_orders:,.2f}" if total_orders else 'n/a'
+
+    out(f"Total Revenue: Rp {total_revenue:,.2f}")
+    out(f"Total Orders: {total_orders:,}")
+    out(f"Total Items Sold: {agg.total_units:,}")
+    out(f"Average Order Value: {avg_order_value}")
+    out(f"Total Unique Customers: {agg.total_customers:,}")
+    if total_orders:
+        out(f"Period: {agg.start_date.strftime('%Y-%m-%d')} to {agg.end_date.strftime('%Y-%m-%d')}")
+    else:
+        out("Period: n/a")
+
+    # 2. MONTHLY TRENDS
+    out("\n2. MONTHLY REVENUE TRENDS")
+    out("-" * 80)
+    out("\nTop 5 Months by Revenue:")
+    for idx, row in tables['monthly_sales'].nlargest(5, 'Final_Price').iterrows():
+        out(f"  {row['Month_Name']} {int(row['Year'])}: Rp {row['Final_Price']:,.2f}")
+
+    # 3. TOP PRODUCTS
+    out("\n3. TOP PERFORMING PRODUCTS")
+    out("-" * 80)
+    product_performance = tables['product_performance']
+    out("\nTop 10 Products by Revenue:")
+    for idx, (product, row) in enumerate(product_performance.head(10).iterrows(), 1):
+        out(f"  {idx}. {product}")
+        out(f"     Revenue: Rp {row['Total_Revenue']:,.2f} | Units: {int(row['Units_Sold'])} | Orders: {int(row['Orders'])}")
+
+    # 4. CATEGORY ANALYSIS
+    out("\n4. CATEGORY PERFORMANCE")
+    out("-" * 80)
+    category_performance = tables['category_performance']
+    out("\nRevenue by Category:")
+    for category, row in category_performance.iterrows():
+        percentage = (row['Total_Revenue'] / total_revenue) * 100
+        out(f"  {category}: Rp {row['Total_Revenue']:,.2f} ({percentage:.1f}%)")
+
+    # 5. REGIONAL ANALYSIS
+    out("\n5. REGIONAL PERFORMANCE")
+    out("-" * 80)
+    regional_sales = tables['regional_sales']
+    out("\nRevenue by Region:")
+    for region, revenue in regional_sales.items():
+        percentage = (revenue / total_revenue) * 100
+        out(f"  {region}: Rp {revenue:,.2f} ({percentage:.1f}%)")
+
+    # 6. PURCHASING PATTERNS
+    out("\n6. PURCHASING PATTERNS")
+    out("-" * 80)
+    day_sales = tables['day_sales']
+    out("\nSales by Day of Week:")
+    for day, row in day_sales.iterrows():
+        out(f"  {day}: Rp {row['sum']:,.2f} ({int(row['count'])} orders)")
+
+    # Peak shopping day
+    peak_day = day_sales['sum'].idxmax() if total_orders else 'n/a'
+    out(f"\nPeak Shopping Day: {peak_day}")
+
+    # 7. CUSTOMER SEGMENT ANALYSIS
+    out("\n7. CUSTOMER SEGMENT ANALYSIS")
+    out("-" * 80)
+    out("\nPerformance by Customer Segment:")
+    for segment, row in tables['segment_analysis'].iterrows():
+        out(f"\n  {segment}:")
+        out(f"    Revenue: Rp {row['Total_Revenue']:,.2f}")
+        out(f"    Orders: {int(row['Total_Orders'])}")
+        out(f"    Customers: {int(row['Unique_Customers'])}")
+        out(f"    Avg Order Value: Rp {row['Avg_Order_Value']:,.2f}")
+
+    # 8. PAYMENT METHOD ANALYSIS
+    out("\n8. PAYMENT METHOD PREFERENCE")
+    out("-" * 80)
+    payment_analysis = tables['payment_analysis']
+    out("\nOrders by Payment Method:")
+    for method, count in payment_analysis.items():
+        percentage = (count / total_orders) * 100
+        out(f"  {method}: {count} orders ({percentage:.1f}%)")
+
+    # 9. KEY INSIGHTS
+    out("\n" + "="*80)
+    out("KEY INSIGHTS & RECOMMENDATIONS")
+    out("="*80)
+
+    out("\n📊 Business Highlights:")
+    out(f"  • Best performing category: {_top(category_performance)}")
+    out(f"  • Top selling product: {_top(product_performance)}")
+    out(f"  • Highest revenue region: {_top(regional_sales)}")
+    out(f"  • Most active shopping day: {peak_day}")
+    out(f"  • Most used payment: {_top(payment_analysis)}")
+
+    # Calculate growth (2024 vs 2023)
+    yearly_sales = tables['yearly_sales']
+    sales_2023 = yearly_sales.get(2023, 0.0)
+    sales_2024 = yearly_sales.get(2024, 0.0)
+    # Without 2023 revenue (e.g. --start 2024) there is no base to grow from
+    growth = f"{(sales_2024 - sales_2023) / sales_2023 * 100:.1f}%" if sales_2023 else 'n/a'
+
+    out(f"\n📈 Growth Metrics:")
+    out(f"  • YoY Revenue Growth (2024 vs 2023): {growth}")
+
+    # Customer behavior
+    out(f"  • Customer Repeat Rate: {agg.repeat_rate:.1f}%")
+    out(f"  • Average orders per customer: {agg.customer_orders.mean():.1f}"
+        if len(agg.customer_orders) else "  • Average orders per customer: n/a")
+
+    out("\n💡 Recommendations:")
+    out("  1. Focus marketing efforts on high-performing categories")
+    out("  2. Optimize inventory for top-selling products")
+    out(f"  3. Strengthen presence in {_top(regional_sales)} region")
+    out("  4. Run promotions on slower days to balance weekly sales")
+    out("  5. Develop loyalty programs to increase repeat customer rate")
+
+    out("\n" + "="*80)
+    out("Analysis Complete! Check visualizations folder for charts.")
+    out("="*80)
+    return '\n'.join(lines)
+
+
+def export_tables(agg, output_dir='.', tables=None):
+    """Write the summary CSVs to output_dir. Returns the paths written."""
+    tables = tables if tables is not None else summary_tables(agg)
+    paths = []
+    for filename, (name, index) in EXPORT_FILES.items():
+        path = os.path.join(output_dir, filename)
+        with stage(f'export.{filename}', rows_in=len(tables[name])) as export:
+            tables[name].to_csv(path, index=index)
+            export.set(bytes_written=os.path.getsize(path))
+        paths.append(path)
+    return paths
+
+
+def format_sketch_summary(sketches, top=10):
+    """The approximate summary of a SalesSketches as text, every estimate with its bound."""
+    lines = []
+    out = lines.append
+
+    out("="*80)
+    out("SALES DATA ANALYSIS - APPROXIMATE SUMMARY (SKETCHES)")
+    out("="*80)
+
+    out("\n1. OVERALL PERFORMANCE (exact)")
+    out("-" * 80)
+    revenue = sketches.revenue_cents / 100
+    out(f"Total Revenue: Rp {revenue:,.2f}")
+    out(f"Total Orders: {sketches.orders:,}")
+    if sketches.start_date is not None:
+        out(f"Period: {sketches.start_date.strftime('%Y-%m-%d')} to {sketches.end_date.strftime('%Y-%m-%d')}")
+
+    out("\n2. DISTINCT CUSTOMERS (HyperLogLog, 95% interval)")
+    out("-" * 80)
+    customers = sketches.distinct_customers()
+    out(f"Total Unique Customers: ~{customers['Estimate']:,.0f} "
+        f"({customers['Low']:,.0f} - {customers['High']:,.0f}, "
+        f"±{2 * sketches.customers.relative_error * 100:.1f}%)")
+    for dim, sketch in sketches.customers_by.items():
+        out(f"\nUnique Customers by {dim} (±{2 * sketch.relative_error * 100:.1f}%):")
+        for label, row in sketches.distinct_customers(dim).iterrows():
+            out(f"  {label}: ~{row['Estimate']:,.0f} ({row['Low']:,.0f} - {row['High']:,.0f})")
+
+    for title, sketch in (('PRODUCTS', sketches.top_products), ('CUSTOMERS', sketches.top_customers)):
+        out(f"\nTOP {top} {title} BY REVENUE (Misra-Gries, revenue between the bounds)")
+        out("-" * 80)
+        out(f"Maximum undercount: Rp {sketch.error_bound / 100:,.2f} "
+            f"(≤ {100 / (sketch.capacity + 1):.2f}% of revenue)")
+        for idx, (key, row) in enumerate(sketches.top(sketch, top).iterrows(), 1):
+            out(f"  {idx}. {key}: Rp {row['Lower']:,.2f} - {row['Upper']:,.2f}")
+
+    out(f"\nORDER VALUE PERCENTILES (±{sketches.order_values.relative_accuracy * 100:g}% relative)")
+    out("-" * 80)
+    for name, value in sketches.percentiles().items():
+        out(f"  {name}: Rp {value:,.2f}")
+    out("="*80)
+    return '\n'.join(lines)
+
+
+def chart_inputs(agg):
+    """The tables each figure draws, keyed by figure name."""
+    monthly_sales = agg.monthly()[['Year', 'Month', 'Revenue']].rename(columns={'Revenue': 'Final_Price'})
+    monthly_sales['Year_Month'] = monthly_sales['Year'].astype(str) + '-' + monthly_sales['Month'].astype(str).str.zfill(2)
+
+    segment_data = agg.table('Customer_Segment')[['Revenue', 'Orders']].reset_index()
+    segment_data.columns = ['Segment', 'Revenue', 'Orders']
+
+    quarterly_sales = agg.revenue('Quarter').rename('Final_Price').reset_index()
+    quarterly_sales['Label'] = 'Q' + quarterly_sales['Quarter'].astype(str) + ' ' + quarterly_sales['Year'].astype(str)
+
+    return {
+        'dashboard_overview': {
+            'monthly_sales': monthly_sales,
+            'top_products': agg.revenue('Product').nlargest(10).sort_values(),
+            'category_sales': agg.revenue('Category').sort_values(ascending=False)
+        },
+        'customer_analysis': {
+            'regional_sales': agg.revenue('Region').sort_values(ascending=False),
+            'day_sales': agg.revenue('Day_of_Week').reindex(DAY_ORDER),
+            'segment_data': segment_data,
+            'payment_counts': agg.table('Payment_Method')['Orders'].sort_values(ascending=False, kind='stable')
+        },
+        'sales_heatmap': {
+            # Since we don't have hour data, let's create a month vs day heatmap
+            'pivot_data': agg.revenue('Day_Month').unstack('Month').reindex(DAY_ORDER)
+        },
+        'performance_trends': {
+            'quarterly_sales': quarterly_sales,
+            'yearly_sales': agg.revenue('Year'),
+            'yearly_orders': agg.table('Year')['Orders']
+        }
+    }
@@ -0,0 +1,115 @@
+import pandas as pd
+import numpy as np
+
+# Explicit in-memory schema for the transaction table. Low-cardinality
+# dimensions become categoricals, prefixed IDs become integer codes, counts
+# use the narrowest integer that fits and money is float32 unless exact
+# decimal money is requested.
+CATEGORICAL_COLUMNS = ['Customer_Segment', 'Region', 'Category', 'Product', 'Payment_Method']
+ID_PREFIXES = {'Order_ID': 'ORD', 'Customer_ID': 'CUST'}
+INTEGER_COLUMNS = {'Quantity': 'int16', 'Discount_Percent': 'int8'}
+MONEY_COLUMNS = ['Unit_Price', 'Total_Sales', 'Discount_Amount', 'Final_Price']
+MONEY_DTYPE = 'float32'
+
+# Exact mode keeps money as fixed-point decimals with 2 places (Arrow decimal128)
+MONEY_PRECISION = 18
+MONEY_SCALE = 2
+
+
+def exact_money_dtype():
+    import pyarrow as pa
+
+    return pd.ArrowDtype(pa.decimal128(MONEY_PRECISION, MONEY_SCALE))
+
+
+def to_exact_money(values):
+    """Quantize money values to 2-place decimals without going through Python objects."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    dtype = exact_money_dtype()
+    if values.dtype == dtype:
+        return values
+    array = pc.round(pa.array(values.to_numpy(dtype='float64')), MONEY_SCALE)
+    return pd.Series(pd.arrays.ArrowExtensionArray(array.cast(dtype.pyarrow_dtype)),
+                     index=values.index, name=values.name)
+
+
+def money_cents(values):
+    """Exact int64 cents for a money column of any of the schema's money dtypes.
+
+    float32 keeps about 7 significant digits, which is enough to recover the
+    cents of every single amount but not of a sum, so totals should be
+    accumulated from these cents rather than from the float32 values.
+    """
+    if isinstance(values.dtype, pd.ArrowDtype):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        scaled = pc.multiply(pa.array(values.array), pa.scalar(10 ** MONEY_SCALE, pa.int64()))
+        return np.asarray(pc.cast(scaled, pa.int64()))
+    return np.rint(values.to_numpy(dtype='float64') * 10 ** MONEY_SCALE).astype(np.int64)
+
+
+def to_money64(values):
+    """float64 copy of a money column, rounded back to whole cents."""
+    return pd.Series(money_cents(values) / 10 ** MONEY_SCALE, index=values.index, name=values.name)
+
+
+def parse_id_codes(values, prefix):
+    """Turn IDs such as 'CUST1234' into the integer code 1234."""
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values
+    digits = values.astype(str).str.slice(len(prefix))
+    codes = pd.to_numeric(digits, errors='coerce')
+    bad = codes.isna() | ~values.astype(str).str.startswith(prefix)
+    if bad.any():
+        raise ValueError(f"{values.name}: {int(bad.sum())} values do not look like {prefix}<number>, "
+                         f"e.g. {values[bad].iloc[0]!r}")
+    return pd.to_numeric(codes.astype('int64'), downcast='integer')
+
+
+def apply_schema(df, exact_money=False):
+    """Convert a loaded transaction frame to the compact schema in place.
+
+    Columns missing from df are skipped, so projected frames work too.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col, prefix in ID_PREFIXES.items():
+        if col in df.columns:
+            df[col] = parse_id_codes(df[col], prefix)
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    for col in MONEY_COLUMNS:
+        if col in df.columns:
+            if exact_money:
+                df[col] = to_exact_money(df[col])
+            else:
+                df[col] = df[col].astype(MONEY_DTYPE)
+    return df
+
+
+def concat_frames(frames):
+    """Concatenate chunks, unioning categoricals instead of falling back to object."""
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    df = pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            df[col] = pd.api.types.union_categoricals([frame[col] for frame in frames],
+                                                      sort_categories=True)
+    return df
+
+
+def memory_usage(df):
+    """Bytes used by df, counting the contents of string objects."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def format_memory_report(before, after, rows):
+    ratio = before / after if after else np.inf
+    return (f"Memory: {before / 1e6:,.1f} MB -> {after / 1e6:,.1f} MB "
+            f"({ratio:.1f}x smaller, {after / max(rows, 1):.0f} bytes/row)")
@@ -0,0 +1,326 @@
+import asyncio
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+from .aggregation import ANALYSIS_COLUMNS, aggregate_sales
+from .binary_store import METADATA_FILE, is_binary_store
+from .chart_detail import CHART_FORMATS, CONTENT_TYPES, RENDER_PROFILES
+from .ingest import is_file_collection, source_files
+from .report import SUMMARY_SECTIONS, chart_inputs, summary_metrics
+from .storage import DEFAULT_SOURCE, _date_bounds, load_sales_data
+
+# Local report service: an asyncio HTTP server that answers dashboard
+# requests (summary metrics, summary tables as JSON or CSV, charts as PNG,
+# SVG or WebP)
+# from aggregates kept in memory. Loading, aggregating and rendering run in
+# a process pool, so the event loop keeps answering while they work; tables
+# and chart inputs are cut from cached aggregates on a thread, and a render
+# task gets only its chart's inputs. Results are cached with a TTL
+# and LRU eviction, and the whole cache is dropped as soon as the data
+# source changes on disk. Concurrent requests for the same missing result
+# share one computation.
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+DEFAULT_TTL = 300
+DEFAULT_CACHE_ENTRIES = 128
+# Charts are drawn for screens unless asked otherwise; the charts command
+# renders for print
+DEFAULT_SERVE_PROFILE = 'preview'
+
+# The keys of charts.CHARTS, listed here so the server never imports matplotlib
+CHART_NAMES = ['dashboard_overview', 'customer_analysis', 'sales_heatmap', 'performance_trends']
+
+_STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                500: 'Internal Server Error'}
+
+
+class TTLCache:
+    """At most max_entries values, each valid for ttl seconds after it was
+    stored; past max_entries the least recently used one is dropped."""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """The value stored under key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def data_version(source):
+    """(modification time, size) identifying the current contents of source.
+
+    For a binary store this is its header, which is rewritten last; for a
+    dataset directory the newest file and the total size of all of them, and
+    likewise for the files of a glob or directory of files.
+    """
+    if is_file_collection(source):
+        stats = [os.stat(path) for path in source_files(source)]
+        return max((stat.st_mtime_ns for stat in stats), default=0), sum(stat.st_size for stat in stats)
+    if is_binary_store(source):
+        source = os.path.join(source, METADATA_FILE)
+    if not os.path.isdir(source):
+        stat = os.stat(source)
+        return stat.st_mtime_ns, stat.st_size
+    newest = size = 0
+    for root, _, names in os.walk(source):
+        for name in names:
+            stat = os.stat(os.path.join(root, name))
+            newest = max(newest, stat.st_mtime_ns)
+            size += stat.st_size
+    return newest, size
+
+
+# Worker tasks; they run in the process pool
+
+def _aggregate(source, start, end):
+    df = load_sales_data(source, columns=ANALYSIS_COLUMNS, start=start, end=end)
+    return aggregate_sales(df)
+
+
+def _render(name, inputs, dpi, fmt, profile):
+    # Only the chart's own small tables are sent over, not the aggregates
+    from .charts import _setup_style, render_chart
+
+    _setup_style()
+    buffer = io.BytesIO()
+    render_chart(name, inputs, buffer, dpi, fmt, profile)
+    return buffer.getvalue()
+
+
+def _table(agg, name, fmt):
+    table = SUMMARY_SECTIONS[name](agg)
+    frame = table.to_frame() if isinstance(table, pd.Series) else table
+    # Tables indexed by a dimension keep it as their first column
+    labelled = not isinstance(frame.index, pd.RangeIndex)
+    if fmt == 'csv':
+        return frame.to_csv(index=labelled).encode()
+    rows = (frame.reset_index() if labelled else frame).to_dict(orient='records')
+    return json.dumps({'table': name, 'rows': rows}, default=str).encode()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ReportService:
+    """Cached report results for one data source, served over HTTP.
+
+    Every result is cached under its request parameters; a change of
+    data_version(source) clears the cache before the next lookup.
+    """
+
+    def __init__(self, source=DEFAULT_SOURCE, workers=None, ttl=DEFAULT_TTL,
+                 max_entries=DEFAULT_CACHE_ENTRIES, dpi=None):
+        self.source = source
+        self.dpi = dpi
+        self.cache = TTLCache(max_entries, ttl)
+        self.executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self._version = None
+        self._pending = {}
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    async def _check_source(self):
+        # Stat calls over a large dataset would stall the event loop
+        version = await self._in_thread(data_version, self.source)
+        if version != self._version:
+            self.cache.clear()
+            self._version = version
+        return version
+
+    async def _cached(self, key, compute):
+        # One computation per missing key; later requests for the key await it
+        version = await self._check_source()
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        if key not in self._pending:
+            self._pending[key] = asyncio.ensure_future(compute())
+            self._pending[key].add_done_callback(lambda _: self._pending.pop(key, None))
+        # shield: a client going away must not cancel the shared computation
+        value = await asyncio.shield(self._pending[key])
+        # A result computed from data that changed meanwhile is not kept
+        if self._version == version:
+            self.cache.put(key, value)
+        return value
+
+    async def _in_pool(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def aggregates(self, start=None, end=None):
+        return await self._cached(('aggregates', start, end),
+                                  lambda: self._in_pool(_aggregate, self.source, start, end))
+
+    async def summary(self, start=None, end=None):
+        async def compute():
+            return json.dumps(summary_metrics(await self.aggregates(start, end))).encode()
+        return await self._cached(('summary', start, end), compute)
+
+    async def table(self, name, start=None, end=None, fmt='json'):
+        async def compute():
+            return await self._in_thread(_table, await self.aggregates(start, end), name, fmt)
+        return await self._cached(('table', name, fmt, start, end), compute)
+
+    async def chart_inputs(self, start=None, end=None):
+        async def compute():
+            return await self._in_thread(chart_inputs, await self.aggregates(start, end))
+        return await self._cached(('chart_inputs', start, end), compute)
+
+    async def chart(self, name, start=None, end=None, dpi=None, fmt='png', profile=DEFAULT_SERVE_PROFILE):
+        dpi = dpi or self.dpi
+
+        async def compute():
+            inputs = await self.chart_inputs(start, end)
+            return await self._in_pool(_render, name, inputs[name], dpi, fmt, profile)
+        return await self._cached(('chart', name, dpi, fmt, profile, start, end), compute)
+
+    # HTTP
+
+    def _index(self):
+        return {
+            'source': self.source,
+            'endpoints': {
+                '/summary': 'executive summary metrics',
+                '/tables/<name>': 'summary table as JSON (?format=csv for CSV)',
+                '/charts/<name>.<png|svg|webp>': 'chart (?dpi=N, ?profile=print for full detail)',
+                '/health': 'cache statistics'
+            },
+            'tables': list(SUMMARY_SECTIONS),
+            'charts': CHART_NAMES,
+            'parameters': {'start': 'first period, e.g. 2024-06', 'end': 'last period'}
+        }
+
+    async def route(self, path, params):
+        """(content type, body) for a GET of path with query parameters params."""
+        start, end = params.get('start'), params.get('end')
+        try:
+            _date_bounds(start, end)
+        except ValueError:
+            raise HTTPError(400, f"invalid start/end period: {start!r}, {end!r}")
+        parts = [part for part in path.split('/') if part]
+
+        if not parts:
+            return 'application/json', json.dumps(self._index()).encode()
+        if parts == ['health']:
+            await self._check_source()
+            return 'application/json', json.dumps({
+                'status': 'ok', 'cached': len(self.cache), 'hits': self.cache.hits,
+                'misses': self.cache.misses, 'computing': len(self._pending)
+            }).encode()
+        if parts == ['summary']:
+            return 'application/json', await self.summary(start, end)
+        if len(parts) == 2 and parts[0] == 'tables':
+            if parts[1] not in SUMMARY_SECTIONS:
+                raise HTTPError(404, f"unknown table {parts[1]!r}")
+            fmt = params.get('format', 'json')
+            if fmt not in ('json', 'csv'):
+                raise HTTPError(400, "format must be json or csv")
+            content_type = 'text/csv' if fmt == 'csv' else 'application/json'
+            return content_type, await self.table(parts[1], start, end, fmt)
+        if len(parts) == 2 and parts[0] == 'charts':
+            name, _, fmt = parts[1].partition('.')
+            if name not in CHART_NAMES:
+                raise HTTPError(404, f"unknown chart {parts[1]!r}")
+            fmt = fmt or 'png'
+            if fmt not in CHART_FORMATS:
+                raise HTTPError(404, f"charts are served as {', '.join(CHART_FORMATS)}, not {fmt!r}")
+            profile = params.get('profile', DEFAULT_SERVE_PROFILE)
+            if profile not in RENDER_PROFILES:
+                raise HTTPError(400, f"profile must be one of {', '.join(RENDER_PROFILES)}")
+            dpi = params.get('dpi')
+            if dpi is not None and not (dpi.isdigit() and 10 <= int(dpi) <= 600):
+                raise HTTPError(400, "dpi must be a whole number from 10 to 600")
+            return CONTENT_TYPES[fmt], await self.chart(name, start, end, int(dpi) if dpi else None, fmt, profile)
+        raise HTTPError(404, f"no such endpoint: {path}")
+
+    async def handle(self, reader, writer):
+        """Answer one HTTP/1.1 request on a connection, then close it."""
+        method = 'GET'
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass    # headers are not needed
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            if method not in ('GET', 'HEAD'):
+                raise HTTPError(405, f"{method} is not supported")
+            url = urlsplit(target)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            status = 200
+            content_type, body = await self.route(url.path, params)
+        except HTTPError as error:
+            status, content_type = error.status, 'application/json'
+            body = json.dumps({'error': str(error)}).encode()
+        except (ValueError, UnicodeDecodeError):
+            status, content_type = 400, 'application/json'
+            body = json.dumps({'error': 'malformed request'}).encode()
+        except Exception as error:
+            status, content_type = 500, 'application/json'
+            body = json.dumps({'error': f'{type(error).__name__}: {error}'}).encode()
+
+        head = (f"HTTP/1.1 {status} {_STATUS_TEXT[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n")
+        try:
+            writer.write(head.encode('latin-1') + (body if method != 'HEAD' else b''))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(service, host, port, ready=None):
+    server = await asyncio.start_server(service.handle, host, port)
+    if ready:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+
+def serve(source=DEFAULT_SOURCE, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, ttl=DEFAULT_TTL,
+          max_entries=DEFAULT_CACHE_ENTRIES, dpi=None, ready=None):
+    """Run the report service until interrupted. ready, if given, is called
+    with the asyncio server once it is listening."""
+    service = ReportService(source, workers, ttl, max_entries, dpi)
+    try:
+        asyncio.run(_serve(service, host, port, ready))
+    finally:
+        service.close()
@@ -0,0 +1,375 @@
+import pandas as pd
+import numpy as np
+import os
+import pickle
+from .instrument import stage
+from .schema import money_cents
+
+# Approximate analytics: fixed-size sketches instead of per-customer state.
+# Every sketch is built chunk by chunk with array operations, merges with
+# another sketch of the same parameters (so partitions can be summarised
+# separately and combined) and pickles to a few hundred KB however many rows
+# went in. The error bounds below are what each estimate carries.
+#
+#   HyperLogLog     distinct counts; relative standard error 1.04 / sqrt(2**precision)
+#                   (0.81% at the default precision 14), i.e. within two
+#                   standard errors about 95% of the time
+#   HeavyHitters    weighted Misra-Gries top-K; every kept weight is a lower
+#                   bound, at most error_bound below the true weight, and
+#                   error_bound <= total weight / (capacity + 1). Any key
+#                   heavier than error_bound is guaranteed to be kept.
+#   QuantileSketch  log-bucketed quantiles (DDSketch); a returned quantile is
+#                   within relative_accuracy (1%) of the true value at that rank
+
+DEFAULT_HLL_PRECISION = 14
+DEFAULT_GROUP_HLL_PRECISION = 12
+DEFAULT_HEAVY_HITTERS_CAPACITY = 1000
+DEFAULT_QUANTILE_ACCURACY = 0.01
+
+# Dimensions distinct customers are estimated for
+SKETCH_DIMENSIONS = ['Customer_Segment', 'Region']
+
+# Columns a frame needs for SalesSketches.add
+SKETCH_COLUMNS = ['Date', 'Customer_ID', 'Product', 'Final_Price'] + SKETCH_DIMENSIONS
+
+DEFAULT_PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+SKETCH_VERSION = 1
+
+
+def hash_values(values):
+    """Deterministic 64-bit hashes of an array of IDs or labels."""
+    return pd.util.hash_array(np.asarray(values))
+
+
+def _codes(values):
+    # Integer codes and their labels, straight from a categorical's codes
+    if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        values = pd.Categorical(values)
+        return values.codes.astype(np.int64), pd.Index(np.asarray(values.categories))
+    codes, labels = pd.factorize(np.asarray(values))
+    return codes, pd.Index(labels)
+
+
+def _register_updates(hashes, precision):
+    # Register index from the top precision bits, rank = leading zeros of the
+    # remaining bits + 1, counted with a branch-free binary search
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes << np.uint64(precision)
+    zeros = np.zeros(len(hashes), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        empty = (rest >> np.uint64(64 - shift)) == 0
+        zeros += empty * shift
+        rest = np.where(empty, rest << np.uint64(shift), rest)
+    rank = np.minimum(zeros, 64 - precision) + 1
+    return index, rank.astype(np.uint8)
+
+
+def _hll_estimate(registers):
+    # Standard HyperLogLog estimate along the last axis, with linear counting
+    # for small cardinalities; 64-bit hashes need no large-range correction
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=-1)
+    empty = np.count_nonzero(registers == 0, axis=-1)
+    linear = m * np.log(m / np.maximum(empty, 1))
+    return np.where((raw <= 2.5 * m) & (empty > 0), linear, raw)
+
+
+class HyperLogLog:
+    """Distinct count estimate over 2**precision one-byte registers."""
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        """Relative standard error of estimate()."""
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def add_hashes(self, hashes):
+        index, rank = _register_updates(hashes, self.precision)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def add(self, values):
+        return self.add_hashes(hash_values(values))
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog sketches of different precision cannot be merged")
+        merged = HyperLogLog(self.precision)
+        merged.registers = np.maximum(self.registers, other.registers)
+        return merged
+
+    def estimate(self):
+        return float(_hll_estimate(self.registers))
+
+
+class GroupedHyperLogLog:
+    """One HyperLogLog per label of a dimension, kept as a labels x registers
+    matrix so a chunk updates every group in one pass."""
+
+    def __init__(self, labels, precision=DEFAULT_GROUP_HLL_PRECISION, registers=None):
+        self.labels = pd.Index(labels)
+        self.precision = precision
+        self.registers = (registers if registers is not None else
+                          np.zeros((len(self.labels), 1 << precision), dtype=np.uint8))
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(self.registers.shape[1])
+
+    def _aligned(self, labels):
+        # Registers re-laid out for a superset of this sketch's labels
+        registers = np.zeros((len(labels), self.registers.shape[1]), dtype=np.uint8)
+        registers[labels.get_indexer(self.labels)] = self.registers
+        return registers
+
+    def add_hashes(self, hashes, codes, labels):
+        """Fold hashes whose group is labels[codes] into the sketch."""
+        labels = pd.Index(labels, name=self.labels.name)
+        if not labels.isin(self.labels).all():
+            union = self.labels.append(labels).unique()
+            self.registers, self.labels = self._aligned(union), union
+        rows = self.labels.get_indexer(labels)[codes]
+        index, rank = _register_updates(hashes, self.precision)
+        flat = self.registers.reshape(-1)
+        np.maximum.at(flat, rows * self.registers.shape[1] + index, rank)
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog sketches of different precision cannot be merged")
+        labels = self.labels.append(other.labels).unique()
+        return GroupedHyperLogLog(labels, self.precision,
+                                  np.maximum(self._aligned(labels), other._aligned(labels)))
+
+    def estimates(self):
+        """Estimated distinct count per label."""
+        return pd.Series(_hll_estimate(self.registers), index=self.labels, name='Distinct')
+
+
+class HeavyHitters:
+    """Weighted Misra-Gries summary keeping at most capacity keys.
+
+    weights hold a lower bound on each kept key's total weight;
+    error_bound is the most any of them (or any dropped key) can be short.
+    """
+
+    def __init__(self, capacity=DEFAULT_HEAVY_HITTERS_CAPACITY):
+        self.capacity = capacity
+        self.weights = pd.Series(dtype=np.int64)
+        self.error_bound = 0
+        self.total = 0
+
+    def _fold(self, weights):
+        # Add the counters, then if more than capacity keys remain subtract
+        # the (capacity + 1)-th largest weight from all and drop what is left
+        # at zero or below; merged summaries keep the same guarantee
+        weights = self.weights.add(weights, fill_value=0).astype(np.int64)
+        if len(weights) > self.capacity:
+            cut = int(np.partition(weights.to_numpy(), len(weights) - self.capacity - 1)
+                      [len(weights) - self.capacity - 1])
+            weights = weights[weights > cut] - cut
+            self.error_bound += cut
+        self.weights = weights
+
+    def add(self, keys, weights=None):
+        """Count keys, each with its weight (default 1)."""
+        codes, labels = _codes(keys)
+        weights = np.ones(len(codes)) if weights is None else np.asarray(weights, dtype=np.float64)
+        # float64 bincount sums of integers stay exact up to 2**53
+        sums = np.bincount(codes, weights=weights, minlength=len(labels)).astype(np.int64)
+        present = np.flatnonzero(sums)
+        chunk = pd.Series(sums[present], index=labels.take(present))
+        self.total += int(chunk.sum())
+        self._fold(chunk)
+        return self
+
+    def merge(self, other):
+        merged = HeavyHitters(max(self.capacity, other.capacity))
+        merged.weights = self.weights
+        merged.error_bound = self.error_bound + other.error_bound
+        merged.total = self.total + other.total
+        merged._fold(other.weights)
+        return merged
+
+    def top(self, n=10):
+        """The n heaviest keys with lower and upper bounds on their weight."""
+        weights = self.weights.nlargest(n)
+        return pd.DataFrame({'Lower': weights, 'Upper': weights + self.error_bound})
+
+
+class QuantileSketch:
+    """Counts of positive values in logarithmic buckets of relative width
+    2 * relative_accuracy; values <= 0 are counted in a separate bucket."""
+
+    def __init__(self, relative_accuracy=DEFAULT_QUANTILE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.offset = 0  # bucket key of counts[0]
+        self.non_positive = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return int(self.counts.sum()) + self.non_positive
+
+    def _add_counts(self, counts, offset):
+        if not len(counts):
+            return
+        if not len(self.counts):
+            self.counts, self.offset = counts.copy(), offset
+            return
+        low = min(self.offset, offset)
+        high = max(self.offset + len(self.counts), offset + len(counts))
+        grown = np.zeros(high - low, dtype=np.int64)
+        grown[self.offset - low:self.offset - low + len(self.counts)] += self.counts
+        grown[offset - low:offset - low + len(counts)] += counts
+        self.counts, self.offset = grown, low
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return self
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        self.non_positive += len(values) - len(positive)
+        if len(positive):
+            keys = np.ceil(np.log(positive) / np.log(self.gamma)).astype(np.int64)
+            offset = int(keys.min())
+            self._add_counts(np.bincount(keys - offset), offset)
+        return self
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("quantile sketches of different accuracy cannot be merged")
+        merged = QuantileSketch(self.relative_accuracy)
+        merged._add_counts(self.counts, self.offset)
+        merged._add_counts(other.counts, other.offset)
+        merged.non_positive = self.non_positive + other.non_positive
+        merged.min, merged.max = min(self.min, other.min), max(self.max, other.max)
+        return merged
+
+    def quantiles(self, qs):
+        """Approximate values at the quantiles qs (0-1)."""
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        total = self.count
+        if not total:
+            return np.full(len(qs), np.nan)
+        ranks = qs * (total - 1)
+        cumulative = self.non_positive + np.cumsum(self.counts)
+        buckets = np.searchsorted(cumulative, ranks, side='right')
+        values = 2 * self.gamma ** (self.offset + np.minimum(buckets, len(self.counts) - 1)) / (self.gamma + 1)
+        values = np.where(ranks < self.non_positive, 0.0, values)
+        return np.clip(values, self.min, self.max)
+
+
+class SalesSketches:
+    """Approximate report figures: distinct customers overall and per
+    SKETCH_DIMENSIONS label, the heaviest products and customers by revenue,
+    and order value quantiles. Order and revenue totals are exact."""
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION, group_precision=DEFAULT_GROUP_HLL_PRECISION,
+                 capacity=DEFAULT_HEAVY_HITTERS_CAPACITY, relative_accuracy=DEFAULT_QUANTILE_ACCURACY,
+                 dimensions=SKETCH_DIMENSIONS):
+        self.version = SKETCH_VERSION
+        self.customers = HyperLogLog(precision)
+        self.customers_by = {dim: GroupedHyperLogLog(pd.Index([], name=dim), group_precision)
+                             for dim in dimensions}
+        self.top_products = HeavyHitters(capacity)
+        self.top_customers = HeavyHitters(capacity)
+        self.order_values = QuantileSketch(relative_accuracy)
+        self.orders = 0
+        self.revenue_cents = 0
+        self.start_date = None
+        self.end_date = None
+
+    def add(self, df):
+        if not len(df):
+            return self
+        with stage('sketch.chunk', rows_in=len(df)):
+            return self._add(df)
+
+    def _add(self, df):
+        hashes = hash_values(df['Customer_ID'].to_numpy())
+        self.customers.add_hashes(hashes)
+        for dim, sketch in self.customers_by.items():
+            sketch.add_hashes(hashes, *_codes(df[dim]))
+
+        cents = money_cents(df['Final_Price'])
+        self.top_products.add(df['Product'], cents)
+        self.top_customers.add(df['Customer_ID'].to_numpy(), cents)
+        self.order_values.add(cents / 100)
+        self.orders += len(df)
+        self.revenue_cents += int(cents.sum())
+
+        start, end = df['Date'].min(), df['Date'].max()
+        self.start_date = start if self.start_date is None else min(self.start_date, start)
+        self.end_date = end if self.end_date is None else max(self.end_date, end)
+        return self
+
+    def merge(self, other):
+        """Sketches of the union of two disjoint sets of transactions."""
+        merged = SalesSketches.__new__(SalesSketches)
+        merged.version = SKETCH_VERSION
+        merged.customers = self.customers.merge(other.customers)
+        merged.customers_by = {dim: sketch.merge(other.customers_by[dim])
+                               for dim, sketch in self.customers_by.items()}
+        merged.top_products = self.top_products.merge(other.top_products)
+        merged.top_customers = self.top_customers.merge(other.top_customers)
+        merged.order_values = self.order_values.merge(other.order_values)
+        merged.orders = self.orders + other.orders
+        merged.revenue_cents = self.revenue_cents + other.revenue_cents
+        dates = [d for d in (self.start_date, other.start_date) if d is not None]
+        merged.start_date = min(dates) if dates else None
+        dates = [d for d in (self.end_date, other.end_date) if d is not None]
+        merged.end_date = max(dates) if dates else None
+        return merged
+
+    def distinct_customers(self, dim=None):
+        """Estimated distinct customers, overall or per label of dim, with a
+        95% interval (two standard errors)."""
+        sketch = self.customers if dim is None else self.customers_by[dim]
+        estimate = sketch.estimate() if dim is None else sketch.estimates()
+        margin = 2 * sketch.relative_error
+        if dim is None:
+            return {'Estimate': estimate, 'Low': estimate * (1 - margin), 'High': estimate * (1 + margin)}
+        return pd.DataFrame({'Estimate': estimate, 'Low': estimate * (1 - margin),
+                             'High': estimate * (1 + margin)}).sort_index()
+
+    def top(self, sketch, n=10):
+        """Top n of top_products or top_customers, revenue bounds in currency units."""
+        return sketch.top(n) / 100
+
+    def percentiles(self, qs=DEFAULT_PERCENTILES):
+        return pd.Series(self.order_values.quantiles(qs), index=[f'p{q * 100:g}' for q in qs],
+                         name='Order_Value')
+
+    def save(self, path):
+        # Write then rename, like the incremental state file
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            sketches = pickle.load(f)
+        if getattr(sketches, 'version', None) != SKETCH_VERSION:
+            raise ValueError(f"{path} is not a sketch file of version {SKETCH_VERSION}")
+        return sketches
+
+
+def sketch_sales(chunks, **options):
+    """SalesSketches of an iterable of frames, folded one chunk at a time."""
+    sketches = SalesSketches(**options)
+    for chunk in chunks:
+        sketches.add(chunk)
+    return sketches
@@ -0,0 +1,297 @@
+import pandas as pd
+import os
+import shutil
+from .instrument import stage
+from .schema import CATEGORICAL_COLUMNS, MONEY_COLUMNS, apply_schema, concat_frames, memory_usage, to_exact_money
+
+# Default transaction file written by generate_sales_data.py
+DEFAULT_SOURCE = 'sales_data.csv'
+
+# Default location of the columnar copy built by convert_csv_to_dataset
+DEFAULT_DATASET_DIR = 'sales_dataset'
+
+# Rows read from the CSV per conversion step
+DEFAULT_CONVERT_CHUNK_SIZE = 1_000_000
+
+# Rows read from the CSV per load step; each chunk is compacted before the next
+# is read, so the raw string columns never exist for the whole file at once
+DEFAULT_LOAD_CHUNK_SIZE = 1_000_000
+
+# Storage types of the columns not covered by the categorical/money lists
+INTEGER_COLUMNS = ['Quantity', 'Discount_Percent']
+PARTITION_COLUMNS = ['Year', 'Month']
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    fields = [pa.field('Order_ID', pa.string()),
+              pa.field('Date', pa.timestamp('ms')),
+              pa.field('Customer_ID', pa.string())]
+    fields += [pa.field(col, pa.dictionary(pa.int32(), pa.string())) for col in CATEGORICAL_COLUMNS]
+    fields += [pa.field(col, pa.int32()) for col in INTEGER_COLUMNS]
+    fields += [pa.field(col, pa.float64()) for col in MONEY_COLUMNS]
+    fields += [pa.field(col, pa.int16()) for col in PARTITION_COLUMNS]
+    return pa.schema(fields)
+
+
+def _csv_dtypes():
+    dtypes = {col: 'category' for col in CATEGORICAL_COLUMNS}
+    dtypes.update({'Order_ID': str, 'Customer_ID': str})
+    dtypes.update({col: 'int32' for col in INTEGER_COLUMNS})
+    dtypes.update({col: 'float64' for col in MONEY_COLUMNS})
+    return dtypes
+
+
+def _parse_dates(values):
+    return pd.to_datetime(values, format='%Y-%m-%d')
+
+
+def _staged_chunks(chunks, name):
+    # Each read of the next chunk as its own stage; the last one finds the end
+    chunks = iter(chunks)
+    while True:
+        with stage(name) as read:
+            chunk = next(chunks, None)
+            read.set(rows_out=0 if chunk is None else len(chunk))
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def convert_csv_to_dataset(csv_path=DEFAULT_SOURCE, dataset_dir=DEFAULT_DATASET_DIR,
+                           chunk_size=DEFAULT_CONVERT_CHUNK_SIZE, overwrite=False):
+    """Convert a transaction CSV into a Year/Month partitioned Parquet dataset.
+
+    The CSV is streamed in chunks, so memory use is bounded by chunk_size.
+    Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if os.path.exists(dataset_dir):
+        if not overwrite:
+            raise FileExistsError(f"{dataset_dir} already exists; pass overwrite=True to replace it")
+        shutil.rmtree(dataset_dir)
+
+    schema = _arrow_schema()
+    rows = 0
+    with stage('convert.dataset', source=csv_path) as convert:
+        reader = _staged_chunks(pd.read_csv(csv_path, dtype=_csv_dtypes(), chunksize=chunk_size),
+                                'convert.read_csv')
+        for i, chunk in enumerate(reader):
+            chunk['Date'] = _parse_dates(chunk['Date'])
+            chunk['Year'] = chunk['Date'].dt.year.astype('int16')
+            chunk['Month'] = chunk['Date'].dt.month.astype('int16')
+            with stage('convert.write_parquet', rows_in=len(chunk)):
+                table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                pq.write_to_dataset(table, dataset_dir, partition_cols=PARTITION_COLUMNS,
+                                    basename_template=f'chunk{i:05d}-{{i}}.parquet')
+            rows += len(chunk)
+        convert.set(rows_out=rows, bytes_written=_directory_bytes(dataset_dir) if rows else 0)
+    return rows
+
+
+def _date_bounds(start, end):
+    # Bounds accept any period string: '2024', '2024-06' or '2024-06-15';
+    # bounds already resolved pass through
+    if start is not None and not isinstance(start, pd.Timestamp):
+        start = pd.Period(start).start_time
+    if end is not None and not isinstance(end, pd.Timestamp):
+        end = pd.Period(end).end_time
+    return start, end
+
+
+def _partition_filters(start, end):
+    # One conjunction per (Year, Month) partition in range, so pyarrow only
+    # opens the files of those months; the Date bounds trim partial months.
+    date_filters = []
+    if start is not None:
+        date_filters.append(('Date', '>=', start))
+    if end is not None:
+        date_filters.append(('Date', '<=', end))
+    if start is None and end is None:
+        return None
+    if start is None:
+        return [[('Year', '<', end.year)] + date_filters,
+                [('Year', '=', end.year), ('Month', '<=', end.month)] + date_filters]
+    if end is None:
+        return [[('Year', '>', start.year)] + date_filters,
+                [('Year', '=', start.year), ('Month', '>=', start.month)] + date_filters]
+    months = pd.period_range(start.to_period('M'), end.to_period('M'), freq='M')
+    return [[('Year', '=', month.year), ('Month', '=', month.month)] + date_filters
+            for month in months]
+
+
+def _normalize_categories(df):
+    # Categories come back in dictionary order and may include values that were
+    # filtered out; sort and trim them so groupby output matches plain strings.
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = df[col].cat.remove_unused_categories()
+            df[col] = categories.cat.reorder_categories(sorted(categories.cat.categories))
+    return df
+
+
+def _exact_money(df):
+    df = df.copy(deep=False)
+    for col in MONEY_COLUMNS:
+        if col in df.columns:
+            df[col] = to_exact_money(df[col])
+    return df
+
+
+def _filter_dates(df, start, end):
+    if start is None and end is None:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['Date'] >= start
+    if end is not None:
+        mask &= df['Date'] <= end
+    return df[mask].copy()
+
+
+def load_sales_data(source=DEFAULT_SOURCE, columns=None, start=None, end=None,
+                    compact=True, exact_money=False, chunk_size=DEFAULT_LOAD_CHUNK_SIZE,
+                    validator=None, read_threads=None):
+    """Load transactions from a CSV file, a partitioned Parquet dataset, a
+    binary store (see binary_store.py) or many CSV/Parquet files given as a
+    glob or directory (see ingest.py, read by read_threads threads).
+
+    columns projects the read down to the listed columns; start and end
+    (inclusive, e.g. '2024-06') restrict the rows by Date. On a dataset
+    directory only the partitions of the requested months are read; a binary
+    store is mapped rather than read and is always in the compact schema.
+    Date is always returned as datetime64.
+
+    With compact=True the frame is converted to the schema in schema.py
+    (categoricals, integer ID codes, narrow ints, float32 or, with
+    exact_money=True, decimal money). The bytes used before and after are
+    left in df.attrs['memory'] for format_memory_report.
+
+    A validator (a SalesValidator, see validation.py) checks the rows as they
+    are read, before they are parsed into the schema, and only the rows it
+    keeps are returned.
+    """
+    start, end = _date_bounds(start, end)
+    if columns is not None and 'Date' not in columns:
+        columns = ['Date'] + list(columns)
+
+    from .binary_store import _open_store, is_binary_store
+    from .ingest import DEFAULT_READ_THREADS, FileCollection, is_file_collection
+
+    with stage('load', source=source) as load:
+        before = 0
+        mapped = is_binary_store(source)
+        if is_file_collection(source):
+            files = FileCollection(source, read_threads or DEFAULT_READ_THREADS)
+            df = files.load(columns=columns, start=start, end=end, compact=compact, exact_money=exact_money,
+                            validator=validator)
+            before = files.stats['bytes_read']
+        elif mapped:
+            with stage('load.open_store') as read:
+                df = _open_store(source, columns, start, end)
+                read.set(rows_out=len(df))
+            if validator is not None:
+                df = validator.check(df)
+            if exact_money:
+                df = _exact_money(df)
+            before = memory_usage(df)
+        elif os.path.isdir(source):
+            with stage('load.read_parquet') as read:
+                df = pd.read_parquet(source, columns=columns, filters=_partition_filters(start, end))
+                read.set(rows_out=len(df))
+            if validator is not None:
+                df = validator.check(df)
+            df = df.drop(columns=[col for col in PARTITION_COLUMNS if col in df.columns and
+                                  (columns is None or col not in columns)])
+            before = memory_usage(df)
+            if compact:
+                with stage('load.compact_schema', rows_in=len(df)):
+                    df = apply_schema(df, exact_money)
+        else:
+            frames = []
+            for chunk in _staged_chunks(pd.read_csv(source, usecols=columns, chunksize=chunk_size),
+                                        'load.read_csv'):
+                before += memory_usage(chunk)
+                if validator is not None:
+                    chunk = validator.check(chunk)
+                with stage('load.parse_dates', rows_in=len(chunk)):
+                    chunk['Date'] = _parse_dates(chunk['Date'])
+                chunk = _filter_dates(chunk, start, end)
+                if compact:
+                    with stage('load.compact_schema', rows_in=len(chunk)):
+                        chunk = apply_schema(chunk, exact_money)
+                frames.append(chunk)
+            with stage('load.concat', rows_in=sum(len(frame) for frame in frames)):
+                df = concat_frames(frames)
+
+        if not mapped:
+            # The store's dictionaries are already sorted and trimmed, and
+            # recoding would copy the mapped codes
+            df = _normalize_categories(df)
+        df.attrs['memory'] = {'before': before, 'after': memory_usage(df)}
+        load.set(rows_out=len(df), bytes_in_memory=df.attrs['memory']['after'])
+    return df
+
+
+def iter_sales_data(source=DEFAULT_SOURCE, columns=None, start=None, end=None,
+                    exact_money=False, chunk_size=DEFAULT_LOAD_CHUNK_SIZE, validator=None, read_threads=None):
+    """Yield the transactions as compact-schema frames of at most chunk_size rows.
+
+    Takes the same arguments as load_sales_data, but only one chunk is in
+    memory at a time. Categories are per chunk, so consumers must align
+    chunks by label rather than by categorical code.
+    """
+    from .binary_store import _open_store, is_binary_store
+    from .ingest import DEFAULT_READ_THREADS, FileCollection, is_file_collection
+
+    if columns is not None and 'Date' not in columns:
+        columns = ['Date'] + list(columns)
+
+    if is_file_collection(source):
+        # The files are read a whole file at a time and regrouped into chunks
+        files = FileCollection(source, read_threads or DEFAULT_READ_THREADS)
+        yield from files.batches(chunk_size, columns=columns, start=start, end=end, exact_money=exact_money,
+                                 validator=validator)
+        return
+    start, end = _date_bounds(start, end)
+    if is_binary_store(source):
+        # Slices of the mapped frame are views, and every chunk shares the
+        # store's dictionaries
+        df = _open_store(source, columns, start, end)
+        for offset in range(0, len(df), chunk_size):
+            chunk = df.iloc[offset:offset + chunk_size]
+            if validator is not None:
+                chunk = validator.check(chunk)
+            yield _exact_money(chunk) if exact_money else chunk
+    elif os.path.isdir(source):
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        dataset = ds.dataset(source, format='parquet', partitioning='hive')
+        filters = _partition_filters(start, end)
+        batches = dataset.to_batches(columns=columns, batch_size=chunk_size,
+                                     filter=pq.filters_to_expression(filters) if filters else None)
+        for batch in batches:
+            if batch.num_rows:
+                chunk = batch.to_pandas()
+                chunk = chunk.drop(columns=[col for col in PARTITION_COLUMNS if col in chunk.columns and
+                                            (columns is None or col not in columns)])
+                if validator is not None:
+                    chunk = validator.check(chunk)
+                yield _normalize_categories(apply_schema(chunk, exact_money))
+    else:
+        for chunk in pd.read_csv(source, usecols=columns, chunksize=chunk_size):
+            if validator is not None:
+                chunk = validator.check(chunk)
+            chunk['Date'] = _parse_dates(chunk['Date'])
+            chunk = _filter_dates(chunk, start, end)
+            if len(chunk):
+                yield _normalize_categories(apply_schema(chunk, exact_money))
+
@@ -0,0 +1,296 @@
+import pandas as pd
+import numpy as np
+from .calendar_dim import day_numbers
+from .cube import _combine_keys, _split_keys
+from .instrument import stage
+from .schema import money_cents
+from .storage import _date_bounds
+
+# Daily time-series engine: transactions are binned into dense 2D arrays of
+# one row per series (a value, or combination of values, of the chosen
+# dimensions) and one column per calendar day, days without sales included.
+# Every window statistic is a difference of cumulative sums along the day
+# axis, so rolling sums, moving averages, period-over-period growth and
+# totals over arbitrary date ranges cost the same for thousands of series as
+# for one, without a Python loop per series.
+
+# Measure -> column it is summed from (None counts transactions)
+MEASURES = {'Revenue': 'Final_Price', 'Orders': None, 'Units': 'Quantity'}
+DEFAULT_WINDOWS = (7, 30, 90)
+DEFAULT_HORIZON = 28
+DEFAULT_RECENT_WEEKS = 4
+# A year of whole weeks, so a day and its year-ago day share the weekday
+YEAR_DAYS = 364
+
+# Revenue is held in cents and returned in currency units
+_SCALE = {'Revenue': 100}
+
+
+def _series_codes(df, dimensions):
+    # Series position of every row and the labels of the series, sorted
+    if not dimensions:
+        return np.zeros(len(df), dtype=np.int64), pd.Index(['Total'], name='Series')
+    codes, levels = [], []
+    for dim in dimensions:
+        column = df[dim] if isinstance(df[dim].dtype, pd.CategoricalDtype) else df[dim].astype('category')
+        codes.append(column.cat.codes.to_numpy().astype(np.int64))
+        levels.append(column.cat.categories)
+    key, spans = _combine_keys(codes)
+    ids, keys = pd.factorize(key, sort=True)
+    parts = _split_keys(keys, spans)
+    if len(dimensions) == 1:
+        return ids, pd.Index(levels[0][parts[0]], name=dimensions[0])
+    return ids, pd.MultiIndex.from_arrays([level[part] for level, part in zip(levels, parts)], names=dimensions)
+
+
+class DailySeries:
+    """Dense daily measures per series.
+
+    values maps each of MEASURES to an int64 array of shape (series, days):
+    row i belongs to labels[i], column j to day first_day + j (days since
+    1970-01-01). Revenue is in cents. Series over disjoint transactions merge
+    by adding their arrays.
+    """
+
+    def __init__(self, labels, first_day, values):
+        self.labels = labels
+        self.first_day = int(first_day)
+        self.values = values
+        self._cumsums = {}
+
+    @classmethod
+    def from_frame(cls, df, dimensions=()):
+        dimensions = list(dimensions)
+        days = day_numbers(df['Date'])
+        series, labels = _series_codes(df, dimensions)
+        if not len(days):
+            return cls(labels[:0], 0, {measure: np.zeros((0, 0), dtype=np.int64) for measure in MEASURES})
+        first_day = int(days.min())
+        n_days = int(days.max()) - first_day + 1
+
+        # One bincount per measure over the flattened (series, day) grid
+        cell = series * n_days + (days - first_day)
+        size = len(labels) * n_days
+        values = {}
+        for measure, column in MEASURES.items():
+            if column is None:
+                weights = None
+            elif measure == 'Revenue':
+                weights = money_cents(df[column])
+            else:
+                weights = df[column].to_numpy()
+            counts = np.bincount(cell, weights=weights, minlength=size)
+            values[measure] = counts.astype(np.int64).reshape(len(labels), n_days)
+        return cls(labels, first_day, values)
+
+    def merge(self, other):
+        """Series of the union of two disjoint sets of transactions."""
+        if not self.n_days:
+            return other
+        if not other.n_days:
+            return self
+        labels = self.labels.append(other.labels).unique().sort_values()
+        first_day = min(self.first_day, other.first_day)
+        last_day = max(self.last_day, other.last_day)
+        values = {}
+        for measure in MEASURES:
+            merged = np.zeros((len(labels), last_day - first_day + 1), dtype=np.int64)
+            for part in (self, other):
+                rows = labels.get_indexer(part.labels)
+                start = part.first_day - first_day
+                merged[rows, start:start + part.n_days] += part.values[measure]
+            values[measure] = merged
+        return DailySeries(labels, first_day, values)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def n_days(self):
+        return self.values['Revenue'].shape[1]
+
+    @property
+    def last_day(self):
+        return self.first_day + self.n_days - 1
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(np.arange(self.first_day, self.first_day + self.n_days).astype('datetime64[D]'),
+                                name='Date')
+
+    def _frame(self, array, measure):
+        # (series, days) array -> frame of dates x series in currency units
+        array = array / _SCALE.get(measure, 1)
+        return pd.DataFrame(array.T, index=self.dates, columns=self.labels)
+
+    def daily(self, measure='Revenue'):
+        """The measure per day (rows) and series (columns)."""
+        return self._frame(self.values[measure], measure)
+
+    # Window sums
+
+    def _cumsum(self, measure):
+        # Cumulative sums with a leading zero column: the sum over days
+        # [a, b) of series i is c[i, b] - c[i, a]
+        if measure not in self._cumsums:
+            values = self.values[measure]
+            cumsum = np.zeros((values.shape[0], values.shape[1] + 1), dtype=np.int64)
+            np.cumsum(values, axis=1, out=cumsum[:, 1:])
+            self._cumsums[measure] = cumsum
+        return self._cumsums[measure]
+
+    def _trailing(self, measure, window, lag=0):
+        # Sum over the window days ending lag days before each day, float64
+        # with NaN where the window reaches before the first day
+        cumsum = self._cumsum(measure)
+        ends = np.arange(1, self.n_days + 1) - lag
+        starts = ends - window
+        sums = (cumsum[:, np.clip(ends, 0, None)] - cumsum[:, np.clip(starts, 0, None)]).astype(np.float64)
+        sums[:, starts < 0] = np.nan
+        return sums
+
+    def rolling_sum(self, window, measure='Revenue'):
+        """Sum of the trailing window days at every day (NaN until a full window)."""
+        with stage('timeseries.rolling', series=len(self), window=window):
+            return self._frame(self._trailing(measure, window), measure)
+
+    def moving_average(self, window, measure='Revenue'):
+        """Daily mean over the trailing window days (NaN until a full window)."""
+        with stage('timeseries.rolling', series=len(self), window=window):
+            return self._frame(self._trailing(measure, window) / window, measure)
+
+    def growth(self, window, measure='Revenue', lag=None):
+        """Percentage change of the trailing window sum against the same
+        window lag days earlier (by default the window right before it)."""
+        lag = window if lag is None else lag
+        with stage('timeseries.growth', series=len(self), window=window):
+            current = self._trailing(measure, window)
+            previous = self._trailing(measure, window, lag)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                change = np.where(previous > 0, (current - previous) / previous * 100, np.nan)
+        return pd.DataFrame(change.T, index=self.dates, columns=self.labels)
+
+    def _day_bounds(self, start, end):
+        # Column range [a, b) of the days in [start, end], clipped to the data
+        start, end = _date_bounds(start, end)
+        a = self.first_day if start is None else int(np.datetime64(start.date(), 'D').astype(np.int64))
+        b = self.last_day if end is None else int(np.datetime64(end.date(), 'D').astype(np.int64))
+        a = min(max(a - self.first_day, 0), self.n_days)
+        b = min(max(b - self.first_day + 1, a), self.n_days)
+        return a, b
+
+    def window_totals(self, start=None, end=None, measure='Revenue'):
+        """The measure summed over [start, end] (periods such as '2024' or
+        '2024-03', inclusive) for every series."""
+        a, b = self._day_bounds(start, end)
+        cumsum = self._cumsum(measure)
+        return pd.Series((cumsum[:, b] - cumsum[:, a]) / _SCALE.get(measure, 1), index=self.labels, name=measure)
+
+    def trailing_totals(self, days, measure='Revenue'):
+        """The measure summed over the last days days of the data, per series."""
+        cumsum = self._cumsum(measure)
+        totals = cumsum[:, -1] - cumsum[:, max(self.n_days - days, 0)]
+        return pd.Series(totals / _SCALE.get(measure, 1), index=self.labels, name=measure)
+
+    def compare_windows(self, current, previous, measure='Revenue'):
+        """Totals of two date windows, each a period or a (start, end) pair,
+        and the growth from previous to current, per series."""
+        current = current if isinstance(current, tuple) else (current, current)
+        previous = previous if isinstance(previous, tuple) else (previous, previous)
+        table = pd.DataFrame({'Current': self.window_totals(*current, measure),
+                              'Previous': self.window_totals(*previous, measure)})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table['Growth_Pct'] = np.where(table['Previous'] > 0,
+                                           (table['Current'] / table['Previous'] - 1) * 100, np.nan)
+        return table
+
+    def summary(self, windows=DEFAULT_WINDOWS, measure='Revenue'):
+        """Per series, the trailing sum of each window at the last day and its
+        growth against the window before it."""
+        table = pd.DataFrame(index=self.labels)
+        for window in windows:
+            current = self._trailing(measure, window)[:, -1]
+            previous = self._trailing(measure, window, window)[:, -1]
+            table[f'Last_{window}d'] = current / _SCALE.get(measure, 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                table[f'Growth_{window}d_Pct'] = np.where(previous > 0, (current - previous) / previous * 100,
+                                                          np.nan)
+        return table
+
+    # Forecast
+
+    def forecast(self, horizon=DEFAULT_HORIZON, measure='Revenue', recent_weeks=DEFAULT_RECENT_WEEKS, pooled=True):
+        """Seasonal forecast of the next horizon days for every series.
+
+        Three vectorized factors: the daily level of each series over the
+        last recent_weeks weeks; the yearly season, as the ratio of each
+        coming week to those recent weeks one year (52 weeks) earlier, once
+        there is that much history; and the weekday profile of up to the last
+        year. With pooled=True both seasonal factors come from the sum of all
+        series, so sparse series borrow the shape of the total instead of
+        their own noise; every series then changes by the same percentage
+        against its recent level, and only the level tells series apart.
+        Returns a frame of future dates x series.
+        """
+        with stage('timeseries.forecast', series=len(self), horizon=horizon):
+            values = self.values[measure].astype(np.float64)
+            n_days = self.n_days
+            window = recent_weeks * 7
+            if n_days < window:
+                raise ValueError(f"forecasting needs at least {recent_weeks} weeks of history")
+            level = values[:, n_days - window:].mean(axis=1)
+            seasonal = values.sum(axis=0, keepdims=True) if pooled else values
+
+            # Week k ahead relative to the recent weeks, as they were last year
+            weeks = -(-horizon // 7)
+            ahead = np.arange(horizon)
+            yearly = np.ones((len(seasonal), weeks))
+            if n_days >= YEAR_DAYS + window:
+                year_ago = n_days - YEAR_DAYS
+                base = seasonal[:, year_ago - window:year_ago].mean(axis=1, keepdims=True)
+                coming = seasonal[:, year_ago:year_ago + weeks * 7]
+                coming = np.pad(coming, ((0, 0), (0, weeks * 7 - coming.shape[1])), mode='edge')
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    yearly = np.where(base > 0, coming.reshape(len(seasonal), weeks, 7).mean(axis=2) / base, 1)
+
+            # Share of each weekday, scaled to average 1; day h ahead falls on
+            # the weekday of day n_days + h, i.e. position h % 7 of the history
+            history = min(YEAR_DAYS, n_days // 7 * 7)
+            by_weekday = seasonal[:, n_days - history:].reshape(len(seasonal), history // 7, 7).sum(axis=1)
+            total = by_weekday.sum(axis=1, keepdims=True)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                profile = np.where(total > 0, by_weekday / total * 7, 1)
+
+            forecast = level[:, None] * yearly[:, ahead // 7] * profile[:, ahead % 7]
+
+        dates = pd.DatetimeIndex(np.arange(self.last_day + 1, self.last_day + 1 + horizon).astype('datetime64[D]'),
+                                 name='Date')
+        return pd.DataFrame(forecast.T / _SCALE.get(measure, 1), index=dates, columns=self.labels)
+
+
+# Columns a frame needs for DailySeries.from_frame, besides the dimensions
+TIMESERIES_COLUMNS = ['Date', 'Final_Price', 'Quantity']
+
+
+def daily_series(df, dimensions=()):
+    """DailySeries of df's transactions per combination of dimensions (one
+    'Total' series without dimensions)."""
+    with stage('timeseries.build', rows_in=len(df)) as build:
+        series = DailySeries.from_frame(df, dimensions)
+        build.set(rows_out=len(series), days=series.n_days)
+    return series
+
+
+def daily_series_stream(chunks, dimensions=()):
+    """daily_series over an iterable of frames, merging one chunk at a time."""
+    result = None
+    for chunk in chunks:
+        series = daily_series(chunk, dimensions)
+        result = series if result is None else result.merge(series)
+    if result is None:
+        # No chunk at all; the same empty series as daily_series on an empty frame
+        dimensions = list(dimensions)
+        labels = pd.Index([], name=dimensions[0] if dimensions else 'Series') if len(dimensions) < 2 else \
+            pd.MultiIndex.from_arrays([[]] * len(dimensions), names=dimensions)
+        result = DailySeries(labels, 0, {measure: np.zeros((0, 0), dtype=np.int64) for measure in MEASURES})
+    return result
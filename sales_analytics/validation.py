@@ -0,0 +1,411 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from .instrument import stage
+from .schema import ID_PREFIXES, MONEY_SCALE, to_exact_money
+
+# Validation and repair of transaction feeds before they are aggregated. Every
+# check is a vectorized mask over whole columns: money is compared in integer
+# cents, labels are looked up once per distinct label (a categorical's
+# categories) and broadcast to the rows through the codes, and duplicate
+# Order_IDs are found with a bitmap of the ID codes seen so far. A chunk thus
+# costs a few passes over its columns and no Python work per row. Rows failing
+# a check are appended to a quarantine CSV, as they appeared in the feed plus a
+# Violations column, and left out of the analysis.
+
+# The catalogue generate_sales_data.py draws from; a real feed passes its own
+# (see load_reference)
+DEFAULT_REFERENCE = {
+    'Customer_Segment': ['Regular', 'Premium', 'VIP'],
+    'Region': ['Jakarta', 'Surabaya', 'Bandung', 'Medan', 'Semarang', 'Makassar'],
+    'Payment_Method': ['Credit Card', 'Debit Card', 'E-Wallet', 'Bank Transfer', 'Cash'],
+    'Products': {
+        'Electronics': ['Laptop', 'Smartphone', 'Tablet', 'Smartwatch', 'Headphones', 'Camera'],
+        'Clothing': ['T-Shirt', 'Jeans', 'Jacket', 'Dress', 'Sneakers', 'Backpack'],
+        'Home & Living': ['Coffee Maker', 'Blender', 'Vacuum Cleaner', 'Bedding Set', 'Lamp', 'Cookware Set'],
+        'Books': ['Fiction Novel', 'Business Book', 'Cookbook', 'Self-Help Book', 'Biography', 'Magazine'],
+        'Sports': ['Yoga Mat', 'Dumbbells', 'Running Shoes', 'Bicycle', 'Tennis Racket', 'Sports Bottle']
+    }
+}
+
+# Orders dated before this, or after the day validation runs, are out of range
+DEFAULT_VALID_FROM = '2000-01-01'
+DEFAULT_QUARANTINE_FILE = 'quarantine.csv'
+
+# Amounts rounded to cents may end up one cent off their recomputed value
+TOLERANCE_CENTS = 1
+
+# Every check in report order; a row's violations are a bit mask over them.
+# Checks whose columns a frame lacks are skipped.
+CHECKS = ['missing_value', 'malformed_value', 'malformed_id', 'date_out_of_range', 'duplicate_order_id',
+          'unknown_segment', 'unknown_region', 'unknown_category', 'unknown_product',
+          'product_not_in_category', 'unknown_payment_method', 'invalid_quantity', 'invalid_price',
+          'invalid_discount_percent', 'total_sales_mismatch', 'discount_amount_mismatch',
+          'final_price_mismatch']
+_BITS = {name: np.int64(1) << bit for bit, name in enumerate(CHECKS)}
+
+# What repair=True fixes instead of quarantining
+_REPAIRABLE = _BITS['discount_amount_mismatch'] | _BITS['final_price_mismatch']
+
+LABEL_CHECKS = {'Customer_Segment': 'unknown_segment', 'Region': 'unknown_region',
+                'Category': 'unknown_category', 'Product': 'unknown_product',
+                'Payment_Method': 'unknown_payment_method'}
+_MONEY = ['Unit_Price', 'Total_Sales', 'Discount_Amount', 'Final_Price']
+_NUMBERS = _MONEY + ['Quantity', 'Discount_Percent']
+
+# Columns the checks read
+VALIDATION_COLUMNS = ['Order_ID', 'Date', 'Customer_ID', 'Customer_Segment', 'Region', 'Category', 'Product',
+                      'Quantity', 'Unit_Price', 'Total_Sales', 'Discount_Percent', 'Discount_Amount',
+                      'Final_Price', 'Payment_Method']
+
+# The seen-Order_ID bitmap covers at most this many codes; IDs spread wider
+# are kept in a sorted array instead
+MAX_BITMAP_CODES = 1 << 31
+
+
+def load_reference(path):
+    """A reference catalogue from a JSON file shaped like DEFAULT_REFERENCE."""
+    with open(path) as f:
+        reference = json.load(f)
+    missing = [key for key in DEFAULT_REFERENCE if key not in reference]
+    if missing:
+        raise ValueError(f"{path}: reference catalogue lacks {missing}")
+    return reference
+
+
+def _label_key(label):
+    # Labels that only differ in case or spacing are the same label
+    return ' '.join(str(label).split()).casefold()
+
+
+def _numbers(values):
+    # float64 values of a numeric column, NaN where missing or unparseable
+    if isinstance(values.dtype, pd.ArrowDtype):
+        return values.astype('float64').to_numpy(na_value=np.nan)
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        values = pd.to_numeric(values, errors='coerce')
+    return values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _id_codes(values, prefix):
+    # int64 codes of an ID column (-1 where malformed) and the malformed mask.
+    # Arrow's string kernels match and convert the text about ten times
+    # faster than pd.to_numeric.
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.to_numpy(dtype=np.int64), np.zeros(len(values), dtype=bool)
+    if pd.api.types.is_float_dtype(values.dtype):
+        # An integer ID column with a blank in it is read as floats
+        numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        bad = ~(numbers == np.floor(numbers)) | (np.abs(numbers) >= 2.0 ** 63)
+        return np.where(bad, -1, np.nan_to_num(numbers)).astype(np.int64), bad
+    text = pa.array(values if pd.api.types.is_string_dtype(values.dtype) else values.astype(str),
+                    type=pa.string(), from_pandas=True)
+    valid = pc.fill_null(pc.match_substring_regex(text, f'^{prefix}[0-9]{{1,18}}$'), False)
+    digits = pc.if_else(valid, pc.utf8_slice_codeunits(text, len(prefix)), '-1')
+    codes = pc.cast(digits, pa.int64()).to_numpy(zero_copy_only=False)
+    return codes, ~valid.to_numpy(zero_copy_only=False)
+
+
+def _dates(values):
+    # Dates as datetime64[D], NaT where missing or unparseable
+    if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+        values = pd.to_datetime(values, format='%Y-%m-%d', errors='coerce')
+    return values.to_numpy().astype('datetime64[D]')
+
+
+def feed_layout(df):
+    """A copy of df with IDs and dates written as in the CSV feed."""
+    df = df.copy()
+    for col, prefix in ID_PREFIXES.items():
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col].dtype):
+            df[col] = prefix + df[col].astype(str)
+    if 'Date' in df.columns and pd.api.types.is_datetime64_any_dtype(df['Date'].dtype):
+        df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+    return df
+
+
+def append_csv(df, path, header):
+    """Write df to path, or append it below the rows already there."""
+    df.to_csv(path, mode='w' if header else 'a', header=header, index=False,
+              float_format=f'%.{MONEY_SCALE}f')
+
+
+class SeenIds:
+    """The set of integer IDs seen so far: a bitmap over their range while
+    that stays under MAX_BITMAP_CODES codes, a sorted array beyond that."""
+
+    def __init__(self):
+        self.low = 0
+        self.bitmap = np.zeros(0, dtype=bool)
+        self.sorted = None
+
+    def _cover(self, low, high):
+        # Grow the bitmap to cover low..high, doubling so that a steadily
+        # growing ID range is reallocated only a few times
+        if not len(self.bitmap):
+            self.low = low
+        new_low = min(self.low, low)
+        new_high = max(self.low + len(self.bitmap) - 1, high)
+        if new_high - new_low + 1 > MAX_BITMAP_CODES:
+            self.sorted = np.flatnonzero(self.bitmap) + self.low
+            self.bitmap = None
+        elif new_low < self.low or new_high >= self.low + len(self.bitmap):
+            size = max(new_high - new_low + 1, min(2 * len(self.bitmap), MAX_BITMAP_CODES))
+            grown = np.zeros(size, dtype=bool)
+            grown[self.low - new_low:self.low - new_low + len(self.bitmap)] = self.bitmap
+            self.low, self.bitmap = new_low, grown
+
+    def add(self, ids):
+        """Add ids; returns the mask of those already seen, in an earlier
+        call or earlier in ids."""
+        if not len(ids):
+            return np.zeros(0, dtype=bool)
+        if self.sorted is None:
+            self._cover(int(ids.min()), int(ids.max()))
+        # Repeats within ids: every occurrence but the first
+        _, first = np.unique(ids, return_index=True)
+        seen = np.ones(len(ids), dtype=bool)
+        seen[first] = False
+        if self.sorted is None:
+            offsets = ids - self.low
+            seen |= self.bitmap[offsets]
+            self.bitmap[offsets] = True
+        else:
+            if len(self.sorted):
+                positions = np.minimum(np.searchsorted(self.sorted, ids), len(self.sorted) - 1)
+                seen |= self.sorted[positions] == ids
+            self.sorted = np.union1d(self.sorted, ids)
+        return seen
+
+
+class SalesValidator:
+    """Checks, repairs and filters transaction frames one chunk at a time.
+
+    check(df) returns the rows of df that pass every check and appends the
+    others to the quarantine CSV (unless quarantine_path is None), each with
+    the checks it failed. Frames may be raw (as read from CSV, where a bad
+    number or date is just text) or in the compact schema. Order_IDs are
+    remembered across calls, so a repeat of an order from an earlier chunk
+    is caught too; the first valid copy of an order is kept.
+
+    With repair=True, labels that differ from the catalogue only in case or
+    spacing take the catalogue's spelling, and a Discount_Amount or
+    Final_Price that does not add up is recomputed from Total_Sales and
+    Discount_Percent when nothing else is wrong with the row.
+    """
+
+    def __init__(self, reference=DEFAULT_REFERENCE, valid_from=DEFAULT_VALID_FROM, valid_to=None,
+                 quarantine_path=DEFAULT_QUARANTINE_FILE, repair=False):
+        self.valid_from = np.datetime64(pd.Timestamp(valid_from).date(), 'D')
+        self.valid_to = np.datetime64(pd.Timestamp(valid_to or pd.Timestamp.today()).date(), 'D')
+        self.quarantine_path = quarantine_path
+        self.repair = repair
+        categories = list(reference['Products'])
+        self.allowed = {'Customer_Segment': list(reference['Customer_Segment']),
+                        'Region': list(reference['Region']), 'Category': categories,
+                        'Product': [product for products in reference['Products'].values()
+                                    for product in products],
+                        'Payment_Method': list(reference['Payment_Method'])}
+        # Position in allowed['Category'] of every product's category
+        self.product_category = np.array([position for position, products in
+                                          enumerate(reference['Products'].values()) for product in products])
+        self.order_ids = SeenIds()
+        self.rows = 0
+        self.kept = 0
+        self.counts = dict.fromkeys(CHECKS, 0)
+        self.repaired = {'relabelled': 0, 'amounts_recomputed': 0}
+        self._header = True
+        # A quarantine file left by an earlier run would be mistaken for this one's
+        if quarantine_path and os.path.exists(quarantine_path):
+            os.remove(quarantine_path)
+
+    def _reference_codes(self, values, col):
+        # Position of every row's label in allowed[col], -1 for unknown
+        # labels and -2 for missing ones, plus the mask of rows whose label
+        # is spelled differently from its catalogue entry. Looked up once
+        # per distinct label.
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype('category')
+        labels = values.cat.categories
+        exact = {label: position for position, label in enumerate(self.allowed[col])}
+        loose = {_label_key(label): position for position, label in enumerate(self.allowed[col])} \
+            if self.repair else {}
+        lookup = np.array([exact.get(label, loose.get(_label_key(label), -1)) for label in labels] + [-2])
+        respelled = np.array([label not in exact for label in labels] + [False])
+        codes = values.cat.codes.to_numpy()
+        reference = lookup[codes]
+        return reference, respelled[codes] & (reference >= 0)
+
+    def _check_labels(self, df, flags, missing):
+        positions = {}
+        for col, check in LABEL_CHECKS.items():
+            if col in df.columns:
+                reference, respelled = self._reference_codes(df[col], col)
+                missing |= reference == -2
+                flags[reference == -1] |= _BITS[check]
+                positions[col] = (reference, respelled)
+        if 'Category' in positions and 'Product' in positions:
+            category, product = positions['Category'][0], positions['Product'][0]
+            known = (category >= 0) & (product >= 0)
+            mismatch = known & (self.product_category[np.maximum(product, 0)] != category)
+            flags[mismatch] |= _BITS['product_not_in_category']
+        return positions
+
+    def _check_numbers(self, df, flags, missing):
+        values = {col: _numbers(df[col]) for col in _NUMBERS if col in df.columns}
+        malformed = np.zeros(len(df), dtype=bool)
+        for col, column in values.items():
+            # NaN where the feed has a value is a value that did not parse
+            absent = df[col].isna().to_numpy()
+            missing |= absent
+            malformed |= np.isnan(column) & ~absent
+        flags[malformed] |= _BITS['malformed_value']
+        cents = {col: np.rint(np.nan_to_num(values[col]) * 10 ** MONEY_SCALE).astype(np.int64)
+                 for col in _MONEY if col in values}
+        if 'Quantity' in values:
+            quantity = values['Quantity']
+            flags[(quantity < 1) | (quantity > np.floor(quantity))] |= _BITS['invalid_quantity']
+        if 'Unit_Price' in values:
+            flags[values['Unit_Price'] < 0] |= _BITS['invalid_price']
+        if 'Discount_Percent' in values:
+            percent = values['Discount_Percent']
+            flags[(percent < 0) | (percent > 100)] |= _BITS['invalid_discount_percent']
+
+        def mismatch(check, actual, expected):
+            # Rows missing one of the amounts are already flagged as such
+            flags[(np.abs(actual - expected) > TOLERANCE_CENTS) & ~missing & ~malformed] |= _BITS[check]
+
+        if {'Unit_Price', 'Quantity', 'Total_Sales'} <= values.keys():
+            quantity = np.nan_to_num(values['Quantity']).astype(np.int64)
+            mismatch('total_sales_mismatch', cents['Total_Sales'], cents['Unit_Price'] * quantity)
+        if {'Total_Sales', 'Discount_Percent', 'Discount_Amount'} <= values.keys():
+            discount = np.rint(cents['Total_Sales'] * np.nan_to_num(values['Discount_Percent']) / 100)
+            mismatch('discount_amount_mismatch', cents['Discount_Amount'], discount.astype(np.int64))
+        if {'Total_Sales', 'Discount_Amount', 'Final_Price'} <= values.keys():
+            mismatch('final_price_mismatch', cents['Final_Price'], cents['Total_Sales'] - cents['Discount_Amount'])
+        return values, cents
+
+    def _violations(self, df):
+        # Violation bits of every row, and what repairing the rows needs
+        flags = np.zeros(len(df), dtype=np.int64)
+        missing = np.zeros(len(df), dtype=bool)
+        order_ids = None
+        for col, prefix in ID_PREFIXES.items():
+            if col in df.columns:
+                absent = df[col].isna().to_numpy()
+                codes, bad = _id_codes(df[col], prefix)
+                missing |= absent
+                flags[bad & ~absent] |= _BITS['malformed_id']
+                if col == 'Order_ID':
+                    order_ids = (codes, bad)
+        dates = None
+        if 'Date' in df.columns:
+            dates = _dates(df['Date'])
+            absent = df['Date'].isna().to_numpy()
+            missing |= absent
+            flags[np.isnat(dates) & ~absent] |= _BITS['malformed_value']
+            flags[(dates < self.valid_from) | (dates > self.valid_to)] |= _BITS['date_out_of_range']
+        labels = self._check_labels(df, flags, missing)
+        values, cents = self._check_numbers(df, flags, missing)
+        flags[missing] |= _BITS['missing_value']
+
+        # Only orders that pass everything else claim their ID, so a broken
+        # first copy does not push a good later one into quarantine
+        if order_ids is not None:
+            codes, bad = order_ids
+            claims = np.flatnonzero(~bad & (flags & ~self._repairable == 0))
+            flags[claims[self.order_ids.add(codes[claims])]] |= _BITS['duplicate_order_id']
+        return flags, dates, labels, values, cents
+
+    @property
+    def _repairable(self):
+        return _REPAIRABLE if self.repair else np.int64(0)
+
+    def _quarantine(self, rows, flags):
+        # Bad rows as they came in, plus the names of the checks they failed
+        combos, inverse = np.unique(flags, return_inverse=True)
+        names = np.array([';'.join(name for name in CHECKS if combo & _BITS[name]) for combo in combos],
+                         dtype=object)
+        rows = feed_layout(rows)
+        rows['Violations'] = names[inverse]
+        append_csv(rows, self.quarantine_path, self._header)
+        self._header = False
+
+    def _repair(self, df, keep, dates, labels, values, cents, flags):
+        # Rewrite the kept rows: catalogue spellings, recomputed amounts and,
+        # in a raw frame, the parsed numbers and dates
+        if self.repair:
+            for col, (reference, respelled) in labels.items():
+                if respelled[keep].any():
+                    # Sorted and trimmed like the categories the loaders return
+                    spelled = pd.Categorical.from_codes(reference[keep], categories=self.allowed[col])
+                    spelled = spelled.remove_unused_categories()
+                    df[col] = spelled.reorder_categories(sorted(spelled.categories))
+                    self.repaired['relabelled'] += int(np.count_nonzero(respelled[keep]))
+            recompute = (flags[keep] & _REPAIRABLE) != 0
+            if recompute.any():
+                total = cents['Total_Sales'][keep][recompute]
+                discount = np.rint(total * values['Discount_Percent'][keep][recompute] / 100)
+                rows = np.flatnonzero(recompute)
+                for col, amount in (('Discount_Amount', discount), ('Final_Price', total - discount)):
+                    column = values[col][keep]
+                    column[rows] = amount / 10 ** MONEY_SCALE
+                    if isinstance(df[col].dtype, pd.ArrowDtype):
+                        df[col] = to_exact_money(pd.Series(column, index=df.index, name=col))
+                    else:
+                        df[col] = column.astype(df[col].dtype) if pd.api.types.is_float_dtype(df[col].dtype) \
+                            else column
+                self.repaired['amounts_recomputed'] += len(rows)
+        for col, column in values.items():
+            if df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype):
+                df[col] = column[keep]
+        if dates is not None and not pd.api.types.is_datetime64_any_dtype(df['Date'].dtype):
+            df['Date'] = dates[keep].astype('datetime64[s]')
+        return df
+
+    def check(self, df):
+        """The rows of df that pass every check, repaired if repair=True;
+        the others go to the quarantine file."""
+        with stage('validate.check', rows_in=len(df)) as validate:
+            flags, dates, labels, values, cents = self._violations(df)
+            for name in CHECKS:
+                self.counts[name] += int(np.count_nonzero(flags & _BITS[name]))
+            keep = (flags & ~self._repairable) == 0
+            quarantined = len(keep) - int(np.count_nonzero(keep))
+            if quarantined and self.quarantine_path:
+                self._quarantine(df[~keep], flags[~keep])
+            df = self._repair(df[keep].copy() if quarantined else df.copy(deep=False), keep,
+                              dates, labels, values, cents, flags)
+            self.rows += len(keep)
+            self.kept += len(df)
+            validate.set(rows_out=len(df), quarantined=quarantined)
+        return df
+
+    @property
+    def quarantined(self):
+        return self.rows - self.kept
+
+    def report(self):
+        """Rows failing each check, over every frame checked so far."""
+        return pd.Series(self.counts, name='Rows').rename_axis('Check')
+
+
+def format_validation_report(validator):
+    lines = [f"Rows checked:     {validator.rows:,}",
+             f"Rows kept:        {validator.kept:,}",
+             f"Rows quarantined: {validator.quarantined:,}"]
+    if validator.quarantined and validator.quarantine_path:
+        lines.append(f"Quarantine file:  {validator.quarantine_path}")
+    if validator.repair:
+        lines.append(f"Labels respelled: {validator.repaired['relabelled']:,}")
+        lines.append(f"Amounts repaired: {validator.repaired['amounts_recomputed']:,}")
+    lines.append("")
+    lines.append("Rows failing each check:")
+    width = max(len(name) for name in CHECKS)
+    for name, count in validator.counts.items():
+        lines.append(f"  {name:<{width}}  {count:>12,}")
+    return "\n".join(lines)
@@ -0,0 +1,30 @@
+import os
+import numpy as np
+import pandas as pd
+from sales_analytics.aggregation import ANALYSIS_COLUMNS, aggregate_sales, aggregate_sales_stream
+from sales_analytics.report import format_summary, summary_tables
+from sales_analytics.storage import iter_sales_data, load_sales_data
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sales_data.csv')
+
+
+def test_stream_matches_in_memory_on_an_empty_range():
+    in_memory = aggregate_sales(load_sales_data(SAMPLE, columns=ANALYSIS_COLUMNS, start='2030'))
+    streamed = aggregate_sales_stream(iter_sales_data(SAMPLE, columns=ANALYSIS_COLUMNS, start='2030'))
+
+    assert streamed.total_orders == in_memory.total_orders == 0
+    assert streamed.total_customers == in_memory.total_customers == 0
+    for name, table in summary_tables(in_memory).items():
+        pd.testing.assert_frame_equal(pd.DataFrame(summary_tables(streamed)[name]), pd.DataFrame(table),
+                                      check_dtype=False, check_index_type=False, obj=name)
+    assert format_summary(streamed) == format_summary(in_memory)
+
+
+def test_stream_customer_state_grows_with_customers_not_ids():
+    df = load_sales_data(SAMPLE, columns=ANALYSIS_COLUMNS)
+    df['Customer_ID'] = df['Customer_ID'].astype(np.int64)
+    df.loc[0, 'Customer_ID'] = 900_000_000
+    streamed = aggregate_sales_stream(df.iloc[start:start + 500] for start in range(0, len(df), 500))
+
+    assert len(streamed.customers.orders) == df['Customer_ID'].nunique()
+    pd.testing.assert_series_equal(streamed.customer_orders, aggregate_sales(df).customer_orders)
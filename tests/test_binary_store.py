@@ -0,0 +1,37 @@
+import os
+import numpy as np
+import pandas as pd
+from sales_analytics.binary_store import open_binary_store, write_binary_store
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sales_data.csv')
+
+
+def _is_mapped(values):
+    # Walk .base down to the np.memmap the store was opened with
+    while values is not None and not isinstance(values, np.memmap):
+        values = values.base
+    return values is not None
+
+
+def test_columns_are_views_of_the_mapped_files(tmp_path):
+    store = tmp_path / 'store'
+    write_binary_store(SAMPLE, str(store))
+    df = open_binary_store(str(store))
+
+    for col in df.columns:
+        values = df[col].array.codes if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].to_numpy()
+        assert _is_mapped(values), col
+
+    # A date range on the date-ordered store is a slice, still mapped
+    june = open_binary_store(str(store), columns=['Date', 'Region'], start='2024-06', end='2024-06')
+    assert _is_mapped(june['Date'].to_numpy())
+
+
+def test_roundtrip_matches_csv(tmp_path):
+    store = tmp_path / 'store'
+    write_binary_store(SAMPLE, str(store))
+    df = open_binary_store(str(store))
+    sales = pd.read_csv(SAMPLE)
+    for col in ('Region', 'Category', 'Product', 'Customer_Segment', 'Payment_Method'):
+        if col in df.columns:
+            assert df[col].astype(str).tolist() == sales[col].astype(str).tolist()
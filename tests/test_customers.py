@@ -0,0 +1,13 @@
+import os
+from sales_analytics.customers import CUSTOMER_COLUMNS, build_customer_index
+from sales_analytics.storage import load_sales_data
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sales_data.csv')
+
+
+def test_empty_range_gives_empty_tables():
+    index = build_customer_index(load_sales_data(SAMPLE, columns=CUSTOMER_COLUMNS, start='2030'))
+
+    assert len(index.rfm()) == 0
+    assert index.retention().empty
+    assert index.interval_histogram().sum() == 0
@@ -0,0 +1,23 @@
+import os
+import pandas as pd
+from sales_analytics.cli import main
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sales_data.csv')
+
+
+def test_missing_column_is_quarantined_with_validate(tmp_path, capsys):
+    # One file lacks Payment_Method: its rows go to quarantine, the other
+    # file's rows are summarised
+    sales = pd.read_csv(SAMPLE)
+    source = tmp_path / 'orders'
+    source.mkdir()
+    sales.iloc[:500].drop(columns=['Payment_Method']).to_csv(source / 'a.csv', index=False)
+    sales.iloc[500:].to_csv(source / 'b.csv', index=False)
+    quarantine = tmp_path / 'quarantine.csv'
+
+    main(['summary', '--data', str(source), '--validate', '--quarantine', str(quarantine)])
+
+    out = capsys.readouterr().out
+    assert f'Rows kept:        {len(sales) - 500:,}' in out
+    assert 'EXECUTIVE SUMMARY' in out
+    assert len(pd.read_csv(quarantine)) == 500
@@ -0,0 +1,32 @@
+import os
+import numpy as np
+import pandas as pd
+from sales_analytics.validation import SalesValidator
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sales_data.csv')
+
+
+def _failing(validator):
+    return {name: count for name, count in validator.counts.items() if count}
+
+
+def test_unparseable_values_are_malformed_not_missing():
+    sales = pd.read_csv(SAMPLE, nrows=6, dtype={'Quantity': object})
+    sales.loc[0, 'Quantity'] = 'x'
+    sales.loc[1, 'Date'] = '2023-13-45'
+    sales.loc[2, 'Unit_Price'] = np.nan
+    validator = SalesValidator(quarantine_path=None)
+
+    assert len(validator.check(sales)) == 3
+    assert _failing(validator) == {'missing_value': 1, 'malformed_value': 2}
+
+
+def test_float_order_ids_are_read_as_integers():
+    # An integer Order_ID column with a blank in it is read as floats
+    sales = pd.read_csv(SAMPLE, nrows=6)
+    sales['Order_ID'] = sales['Order_ID'].str[len('ORD'):].astype(float)
+    sales.loc[3, 'Order_ID'] = np.nan
+    validator = SalesValidator(quarantine_path=None)
+
+    assert len(validator.check(sales)) == 5
+    assert _failing(validator) == {'missing_value': 1}